@@ -0,0 +1,16 @@
+"""
+Directorio raíz de los archivos que comparten los procesos del dashboard.
+
+Cada módulo guarda lo suyo en un subdirectorio (configurable con su propia variable de entorno):
+    <REPORTES_DIR>/trabajos.sqlite3   trabajos_reporte
+    <REPORTES_DIR>/cache/             cache_reportes
+    <REPORTES_DIR>/dataset/           dataset_compartido
+    <REPORTES_DIR>/historial/         historial
+    <REPORTES_DIR>/normalizacion/     normalizacion
+    <REPORTES_DIR>/metricas/          metricas
+    <REPORTES_DIR>/perfiles/          perfilado
+"""
+import os
+import tempfile
+
+REPORTES_DIR = os.environ.get('REPORTES_DIR', os.path.join(tempfile.gettempdir(), 'dashboard360_reportes'))
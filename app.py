@@ -1,285 +1,118 @@
 import dash
 from dash import dcc, html, Input, Output, State, dash_table
-import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import gc
 import os
+import pandas as pd
 import plotly.graph_objs as go
 import urllib.parse
-import unicodedata
+import time
 import dash_bootstrap_components as dbc  # <-- 1. IMPORTAR BOOTSTRAP
 from dash.exceptions import PreventUpdate
+from flask import Response, abort, request, send_file
+import almacenamiento  # Directorio compartido de archivos generados
 import utils_reporte  # Módulo de reportes
+import trabajos_reporte  # Cola de trabajos de reporte
+import cache_reportes  # Caché de reportes generados
+import datos_evaluacion  # Carga de datos y puntajes
+import dataset_compartido  # Dataset memory-mapped compartido entre procesos
+import jerarquia  # Departamentos y divisiones (opcional)
+import historial  # Ciclos de evaluación anteriores
+import escenarios  # Barrido de ponderaciones (qué pasaría si)
+import metricas  # Latencias y aciertos de caché (Prometheus)
+import perfilado  # Perfilado bajo demanda
 
 # --- Configuración y Carga de Datos ---
-# (Todo tu código de lógica de datos va aquí, no necesita cambios)
-
-# Configuración por defecto
-DEFAULT_SHEET_ID = "16wSqQKJiYZBbmgBNg4Wzi1mvCx5laEncsL5npXzH1Po"
-SHEET_NAME_TEXT = "Respuestas de formulario 1"
-SHEET_NAME_NUM = "Respuestas de formulario 1"
-
-SHEET_ID = os.environ.get('SHEET_ID', DEFAULT_SHEET_ID)
-SHEET_GID = os.environ.get('SHEET_GID')
-
-# Mapeo de respuestas textuales a escala numérica (1-5)
-LIKERT_MAP = {
-    'muy en desacuerdo': 1,
-    'en desacuerdo': 2,
-    'neutral': 3,
-    'de acuerdo': 4,
-    'totalmente de acuerdo': 5,
-}
-
-
-# Utilidad: normalizar texto
-def normalize_text(s):
-    if s is None:
-        return ''
-    s = str(s)
-    s = s.strip().lower()
-    # quitar tildes
-    s = ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
-    return s
-
-
-# Función para cargar una pestaña de la hoja
-def cargar_hoja_google(sheet_id=SHEET_ID, sheet_name=None, sheet_gid=None, creds_path='credentials.json'):
-    # Intentar usar credenciales si existen
-    if os.path.exists(creds_path):
-        try:
-            scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-            credentials = ServiceAccountCredentials.from_json_keyfile_name(creds_path, scope)
-            client = gspread.authorize(credentials)
-            sh = client.open_by_key(sheet_id)
-            if sheet_gid:
-                gid_int = int(sheet_gid)
-                worksheet = None
-                for w in sh.worksheets():
-                    props = w._properties if hasattr(w, '_properties') else {}
-                    if props.get('sheetId') == gid_int:
-                        worksheet = w
-                        break
-                if worksheet is None:
-                    worksheet = sh.worksheet(sheet_name)
-            else:
-                worksheet = sh.worksheet(sheet_name)
-            data = pd.DataFrame(worksheet.get_all_records())
-            print(f"Cargada con credenciales: {sheet_name}")
-            return data
-        except Exception as e:
-            print("Aviso: no se pudieron usar credenciales (o falló gspread):", e)
-            # seguir a intentar lectura pública
-
-    # Leer versión pública como CSV
-    try:
-        if sheet_gid:
-            csv_url = f'https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={sheet_gid}'
-        else:
-            # codificar el nombre de la hoja para evitar espacios o caracteres especiales
-            sheet_name_enc = urllib.parse.quote(sheet_name, safe='')
-            csv_url = f'https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name_enc}'
-        df = pd.read_csv(csv_url)
-        # limpiar nombres de columnas (quitar espacios extra)
-        df.columns = [c.strip() if isinstance(c, str) else c for c in df.columns]
-        print(f"Cargada públicamente: {sheet_name}")
-        return df
-    except Exception as e:
-        raise RuntimeError(f"No se pudo cargar la hoja '{sheet_name}' (credenciales o pública). Error: {e}")
-
-
-# Función que convierte respuestas textuales a números usando LIKERT_MAP
-def convertir_likert(df):
-    df_conv = df.copy()
-    for col in df_conv.columns:
-        # intentar mapear valores textuales
-        if df_conv[col].dtype == object:
-            def map_val(v):
-                if pd.isna(v):
-                    return v
-                s = str(v).strip()
-                # normalizar texto (quitar tildes y pasar a minúsculas)
-                s_norm = ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c)).lower()
-                # intentar mapear texto Likert
-                mapped = LIKERT_MAP.get(s_norm)
-                if mapped is not None:
-                    return mapped
-                # intentar convertir a número si es posible
-                try:
-                    num = float(s)
-                    return num
-                except Exception:
-                    return s
-
-            df_conv[col] = df_conv[col].map(map_val)
-    # intentar convertir columnas a numéricas donde tenga sentido
-    for col in df_conv.columns:
-        try:
-            numeric = pd.to_numeric(df_conv[col], errors='coerce')
-            # si la conversión produjo al menos algún valor numérico, usarlo
-            if numeric.notna().sum() > 0:
-                df_conv[col] = numeric
-        except Exception:
-            pass
-    return df_conv
-
-
-# Función para extraer solo las columnas de competencias (numéricas)
-def columnas_competencias(df, exclude_cols):
-    cols = [c for c in df.columns if c not in exclude_cols]
-    numeric_cols = []
-    for c in cols:
-        # intentar convertir a numeric (sin modificar df)
-        try:
-            series = pd.to_numeric(df[c], errors='coerce')
-            # si no todo es NaN, consideramos la columna como numérica
-            if series.notna().sum() > 0:
-                numeric_cols.append(c)
-        except Exception:
-            pass
-    return numeric_cols
-
-
-# --- Ejecución de Carga y Preparación de Datos ---
-
-# Carga inicial de las dos pestañas
-try:
-    df_text = cargar_hoja_google(sheet_name=SHEET_NAME_TEXT)
-except Exception as e:
-    print('No pudo cargarse la pestaña de respuestas textuales:', e)
-    df_text = pd.DataFrame()
-
-try:
-    df_num = cargar_hoja_google(sheet_name=SHEET_NAME_NUM)
-except Exception as e:
-    print('No pudo cargarse la pestaña numérica:', e)
-    df_num = pd.DataFrame()
-
-# Si la primera pestaana tiene texto, convertirlo
-if not df_text.empty:
-    df_text = convertir_likert(df_text)
-
-# Si la segunda ya tiene números, usarla tal cual; si está vacía, intentaremos usar la primera
-if df_num.empty and not df_text.empty:
-    df = df_text
+# La carga, conversión y cálculo de puntajes viven en datos_evaluacion (sin Dash ni Plotly).
+# El dataset se publica en disco y se lee memory-mapped (ver dataset_compartido): los workers
+# web, los trabajadores de reportes y otros hosts con el mismo volumen comparten una sola copia.
+PONDERACIONES_DEFAULT = datos_evaluacion.PONDERACIONES_DEFAULT
+colores_categorias = datos_evaluacion.colores_categorias
+
+
+def _montar_dataset(nuevo):
+    """Reemplaza el dataset del módulo (y los nombres derivados que usan callbacks y scripts)."""
+    global dataset, df, COL_EVALUADO, COL_RELACION, comp_cols, categorias_comp, VERSION_DATOS, evaluados_options
+    dataset = nuevo
+    df = nuevo.df
+    COL_EVALUADO, COL_RELACION = nuevo.col_evaluado, nuevo.col_relacion
+    comp_cols = nuevo.comp_cols
+    categorias_comp = nuevo.categorias_comp
+    VERSION_DATOS = nuevo.version
+    evaluados_options = [{'label': n, 'value': n} for n in nuevo.evaluados]
+
+
+def sincronizar_dataset():
+    """Cambia a la versión vigente del dataset si otro proceso publicó una nueva."""
+    if not isinstance(dataset, dataset_compartido.DatasetMapeado):
+        return
+    nuevo = dataset_compartido.vigente()
+    if nuevo is not dataset:
+        _montar_dataset(nuevo)
+        print(f"Dataset actualizado a la versión {nuevo.version}")
+
+
+# Si las respuestas no cambiaron desde la última publicación, se reutiliza esa versión sin reprocesarla
+_dataset_cargado = dataset_compartido.actualizar()
+if _dataset_cargado.col_evaluado and _dataset_cargado.col_relacion:
+    _montar_dataset(dataset_compartido.vigente())
 else:
-    # preferir df_num (ya numerizado en la hoja 'Base de Datos Limpia') pero aplicar conversión también por si
-    df = df_num if not df_num.empty else df_text
-    df = convertir_likert(df)
-
-# Normalizar nombres de columnas y encontrar columnas clave
-cols_map = {normalize_text(c): c for c in df.columns}
-# candidatos para buscar
-candidatos = {
-    'evaluado': ['nombre del colaborador evaluado', 'evaluado', 'nombre colaborador evaluado'],
-    'relacion': ['cual es tu relacion con el evaluado', 'cual es tu relacion con el evaluado?',
-                 'relacion con el evaluado', 'relacion'],
-    'timestamp': ['marca temporal', 'timestamp', 'fecha']
-}
-
-COL_EVALUADO = None
-COL_RELACION = None
-COL_TIMESTAMP = None
-for key, variants in candidatos.items():
-    for v in variants:
-        norm = normalize_text(v)
-        if norm in cols_map:
-            if key == 'evaluado':
-                COL_EVALUADO = cols_map[norm]
-            elif key == 'relacion':
-                COL_RELACION = cols_map[norm]
-            elif key == 'timestamp':
-                COL_TIMESTAMP = cols_map[norm]
-            break
-
-# Si no encontramos, intentar heurística por búsqueda parcial
-if COL_EVALUADO is None:
-    for k_norm, orig in cols_map.items():
-        if 'evaluado' in k_norm or 'colaborador evaluado' in k_norm:
-            COL_EVALUADO = orig
-            break
-if COL_RELACION is None:
-    for k_norm, orig in cols_map.items():
-        if 'relacion' in k_norm or 'relaci' in k_norm:
-            COL_RELACION = orig
-            break
-if COL_TIMESTAMP is None:
-    for k_norm, orig in cols_map.items():
-        if 'marca' in k_norm or 'timestamp' in k_norm or 'fecha' in k_norm:
-            COL_TIMESTAMP = orig
-            break
-
-# Preparar lista de columnas a excluir (metadatos)
-exclude_list = [COL_TIMESTAMP, 'Nombre Completo:', COL_EVALUADO,
-                '¿Cuáles son las 2 o 3 principales fortalezas que observas en este colaborador?',
-                '¿Cuáles son las 2 o 3 principales áreas de oportunidad (a mejorar) que sugieres para este colaborador?',
-                'Comentarios adicionales (opcional)', COL_RELACION]
-# algunos de esos nombres pueden no existir en df; filtrarlos
-exclude_list = [c for c in exclude_list if c is not None and c in df.columns]
-
-# Determinar columnas de competencia
-comp_cols = columnas_competencias(df, exclude_list)
-
-# --- CATEGORIZACIÓN MEJORADA DE COMPETENCIAS ---
-def categorizar_competencias_detallado(competencias):
-    """
-    Agrupa las competencias en categorías específicas de habilidades
-    """
-    categorias = {
-        'Trabajo en Equipo': [],
-        'Comunicación': [],
-        'Liderazgo': [],
-        'Toma de Decisiones': [],
-        'Planeación': [],
-        'Manejo de Recursos': [],
-        'Capacidad de Negociación': [],
-        'Innovación y Creatividad': [],
-        'Gestión del Tiempo': [],
-        'Calidad y Resultados': []
-    }
-
-    for comp in competencias:
-        comp_lower = comp.lower()
-
-        # Clasificación por palabras clave
-        if any(palabra in comp_lower for palabra in ['equipo', 'colabora', 'trabajo en equipo']):
-            categorias['Trabajo en Equipo'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['comunica', 'escucha', 'claridad', 'respeto']):
-            categorias['Comunicación'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['liderazgo', 'manejo de', 'gestiona', 'subordin']):
-            categorias['Liderazgo'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['decisiones', 'toma de']):
-            categorias['Toma de Decisiones'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['planeación', 'planea', 'junta', 'seguimiento']):
-            categorias['Planeación'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['recursos', 'manejo de', 'material']):
-            categorias['Manejo de Recursos'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['negociación', 'negocia', 'flexibilidad', 'retroalimentación']):
-            categorias['Capacidad de Negociación'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['innovadora', 'creatividad', 'idea', 'investiga', 'tendencia']):
-            categorias['Innovación y Creatividad'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['tiempo', 'cumple', 'programa', 'forma']):
-            categorias['Gestión del Tiempo'].append(comp)
-        elif any(palabra in comp_lower for palabra in ['calidad', 'valor', 'resultado', 'estándar', 'mejora']):
-            categorias['Calidad y Resultados'].append(comp)
-        else:
-            # Si no encaja, ponerla en la más genérica
-            categorias['Calidad y Resultados'].append(comp)
-
-    # Filtrar categorías vacías
-    return {k: v for k, v in categorias.items() if v}
-
-categorias_comp = categorizar_competencias_detallado(comp_cols)
+    # Sin columnas clave no hay dashboard que servir; se conservan los datos en memoria
+    _montar_dataset(_dataset_cargado)
+del _dataset_cargado
 
 # --- 2. INICIALIZAR APP CON TEMA BOOTSTRAP ---
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
-
-# Opciones de evaluados
-if COL_EVALUADO and COL_EVALUADO in df.columns:
-    evaluados_options = [{'label': n, 'value': n} for n in sorted(df[COL_EVALUADO].dropna().unique())]
-else:
-    evaluados_options = []
+cola_reportes = trabajos_reporte.ColaTrabajos()
+cache = cache_reportes.CacheReportes(os.path.join(almacenamiento.REPORTES_DIR, 'cache'))
+
+
+# Descarga de reportes directamente desde disco (sin pasar los bytes por el JSON del callback).
+# send_file agrega Content-Length, ETag/Last-Modified y soporte de peticiones Range.
+@server.route('/reportes/<nombre>')
+def servir_reporte(nombre):
+    ruta = cache.archivo(nombre)
+    if ruta is None:
+        abort(404)
+    extension = nombre.rsplit('.', 1)[1]
+    formato = next(f for f, (_, ext) in utils_reporte.FORMATOS_REPORTE.items() if ext == extension)
+    evaluado = request.args.get('evaluado', 'evaluado')
+    # El contenido de una clave nunca cambia: el navegador puede reutilizarlo mientras viva en la caché
+    respuesta = send_file(ruta, as_attachment=True, conditional=True, max_age=int(cache.max_edad),
+                          download_name=utils_reporte.nombre_archivo_reporte(evaluado, formato))
+    respuesta.cache_control.public = False
+    respuesta.cache_control.private = True
+    return respuesta
+
+
+def descarga_reporte(ruta, evaluado):
+    """Datos para el Store 'url-descarga': URL del reporte en caché (y marca de tiempo para repetir descargas)."""
+    url = app.get_relative_path(f"/reportes/{os.path.basename(ruta)}") + '?' + urllib.parse.urlencode({'evaluado': evaluado})
+    return {'url': url, 'solicitado': time.time()}
+
+
+# Métricas de todos los procesos (workers web y trabajadores de reportes) para Prometheus
+@server.route('/metrics')
+def exportar_metricas():
+    return Response(metricas.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@server.before_request
+def _revisar_dataset():
+    sincronizar_dataset()
+
+
+# ?perfilar=<PERFILADO_TOKEN> activa el perfilado de este navegador (cookie que viaja en los callbacks);
+# ?perfilar=0 lo desactiva. Sin PERFILADO_TOKEN configurado el parámetro se ignora.
+@server.after_request
+def _cookie_perfilado(respuesta):
+    valor = request.args.get(perfilado.PARAMETRO)
+    if valor is not None and perfilado.PERFILADO_TOKEN:
+        if perfilado.token_valido(valor):
+            respuesta.set_cookie(perfilado.PARAMETRO, valor, httponly=True, samesite='Lax', max_age=3600)
+        else:
+            respuesta.delete_cookie(perfilado.PARAMETRO)
+    return respuesta
 
 
 # Opciones de competencias
@@ -292,191 +125,239 @@ def short_label(col):
 
 comp_options = [{'label': short_label(c), 'value': c} for c in comp_cols]
 
-# --- 3. NUEVO LAYOUT CON BOOTSTRAP ---
-app.layout = dbc.Container([
-    # Header - Responsivo
-    dbc.Row([
-        dbc.Col([
+# Vista de organización: filas por página de la tabla (y del mapa de calor)
+FILAS_ORGANIZACION = 25
+
+
+def columnas_organizacion():
+    """Columnas de la tabla de ranking (las categorías dependen del dataset vigente)."""
+    numero = {'type': 'numeric', 'format': {'specifier': '.2f'}}
+    return [
+        {'name': '#', 'id': 'posicion', 'type': 'numeric'},
+        {'name': 'Evaluado', 'id': 'evaluado'},
+        {'name': 'Calificación', 'id': 'calificacion_final', **numero},
+        {'name': 'Potencial', 'id': 'potencial', **numero},
+        {'name': 'Cuadrante', 'id': 'cuadrante'},
+        {'name': 'Percentil', 'id': 'percentil', 'type': 'numeric', 'format': {'specifier': '.0f'}},
+        {'name': 'Evaluaciones', 'id': 'evaluadores', 'type': 'numeric'},
+    ] + [{'name': categoria, 'id': categoria, **numero} for categoria in categorias_comp]
+
+
+def opciones_areas():
+    """Opciones del selector de área (empresa, divisiones y departamentos); vacío sin jerarquía."""
+    agregados = jerarquia.agregados(dataset, *PONDERACIONES_DEFAULT.values())
+    if agregados is None:
+        return []
+    sangria = {nivel: '\u00a0' * 4 * i for i, nivel in enumerate(jerarquia.NIVELES)}
+    return [{'label': f"{sangria[nodo.nivel]}{nodo.nombre} ({nodo.personas})", 'value': f"{nodo.nivel}|{nodo.nombre}"}
+            for nodo in agregados.recorrido()]
+
+
+def panel_organizacion():
+    """Mapa de calor evaluado x categoría y ranking de toda la empresa (paginados en el servidor)."""
+    areas = opciones_areas()
+    return dbc.Card([
+        dbc.CardBody([
+            html.H5("Organización", className="card-title text-primary mb-1"),
+            # Selector de área (solo con JERARQUIA_CSV): filtra el ranking y muestra las áreas que la componen
             html.Div([
-                html.H2('Dashboard 360° - Evaluación de Desempeño',
-                       className="text-dark fw-bold mb-2",
-                       style={'fontSize': 'clamp(1.25rem, 4vw, 2rem)'}),  # Tamaño de fuente adaptable
-                html.P('Análisis integral de competencias y habilidades',
-                      className="text-secondary",
-                      style={'fontSize': 'clamp(0.875rem, 2vw, 1rem)'})
-            ], className="text-center", style={
-                'backgroundColor': '#f8f9fa',
-                'padding': 'clamp(15px, 4vw, 30px)',  # Padding adaptable
-                'borderRadius': '10px',
-                'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'
-            })
-        ], xs=12, className="mb-3 mb-md-4")  # Margen adaptable
-    ]),
-
-    # Panel de Control - Adaptable
-    dbc.Row([
-        # Sidebar - Full width en móvil, lateral en desktop
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Configuración", className="card-title text-primary mb-3",
-                           style={'fontSize': 'clamp(1rem, 3vw, 1.25rem)'}),
-
-                    # Selector de evaluado
-                    html.Label('Evaluado:', className="fw-bold mb-2 small"),
-                    dcc.Dropdown(
-                        id='evaluado-dropdown',
-                        options=evaluados_options,
-                        value=evaluados_options[0]['value'] if evaluados_options else None,
-                        className="mb-3",
-                        style={'fontSize': 'clamp(0.75rem, 2vw, 1rem)'}
-                    ),
-
-                    html.Hr(),
-
-                    # Ponderaciones compactas - Grid responsivo
-                    html.Label('Ponderaciones (%):', className="fw-bold mb-2 small"),
-                    html.Small('Se normalizan automáticamente', className="text-muted d-block mb-2"),
-
-                    dbc.Row([
-                        dbc.Col([
-                            dbc.Label('Auto', className="small", style={'fontSize': 'clamp(0.7rem, 1.5vw, 0.875rem)'}),
-                            dbc.Input(id='w-auto', type='number', value=5, min=0, max=100, step=1, size="sm")
-                        ], xs=6, sm=3, className="mb-2 mb-sm-0"),  # 2 columnas en móvil, 4 en tablet+
-                        dbc.Col([
-                            dbc.Label('Jefe', className="small", style={'fontSize': 'clamp(0.7rem, 1.5vw, 0.875rem)'}),
-                            dbc.Input(id='w-jefe', type='number', value=18, min=0, max=100, step=1, size="sm")
-                        ], xs=6, sm=3, className="mb-2 mb-sm-0"),
-                        dbc.Col([
-                            dbc.Label('Colegas', className="small", style={'fontSize': 'clamp(0.7rem, 1.5vw, 0.875rem)'}),
-                            dbc.Input(id='w-colegas', type='number', value=30, min=0, max=100, step=1, size="sm")
-                        ], xs=6, sm=3),
-                        dbc.Col([
-                            dbc.Label('Subord.', className="small", style={'fontSize': 'clamp(0.7rem, 1.5vw, 0.875rem)'}),
-                            dbc.Input(id='w-sub', type='number', value=47, min=0, max=100, step=1, size="sm")
-                        ], xs=6, sm=3)
-                    ])
-                ], className="p-3")  # Padding fijo reducido para móviles
-            ], className="shadow-sm mb-3"),
-
-            # Tarjeta de calificación final
-            dbc.Card([
-                dbc.CardBody(html.Div(id='resultado-global'), className="p-3")
-            ], className="shadow-sm mb-3"),
-
-            # Botones de Descarga
-            dbc.Card([
-                dbc.CardBody([
-                    html.H6("Exportar Reporte", className="card-title text-muted mb-3"),
-                    dcc.Loading(
-                        id="loading-download",
-                        type="default",
-                        children=[
-                            dbc.Row([
-                                dbc.Col(
-                                    dbc.Button([html.I(className="fas fa-file-pdf me-2"), "PDF"], 
-                                             id="btn-pdf", color="danger", outline=True, className="w-100"),
-                                    width=6
-                                ),
-                                dbc.Col(
-                                    dbc.Button([html.I(className="fas fa-file-word me-2"), "Word"], 
-                                             id="btn-word", color="primary", outline=True, className="w-100"),
-                                    width=6
-                                )
-                            ]),
-                            dcc.Download(id="download-component")
-                        ]
-                    )
-                ], className="p-3")
-            ], className="shadow-sm")
-        ], xs=12, sm=12, md=12, lg=3, xl=3, className="mb-3 mb-lg-0"),  # Full width en móvil/tablet, sidebar en desktop
-
-        # Área de visualización - Adaptable
-        dbc.Col([
-            # Grid de gráficas de pastel por categoría
-            html.Div(id='graficas-categorias')
-        ], xs=12, sm=12, md=12, lg=9, xl=9)  # Full width en móvil/tablet, 9 cols en desktop
-    ])
-], fluid=True, className="bg-light p-2 p-sm-3 p-md-4", style={'minHeight': '100vh'})
-
-
-# --- Mapeo de Relaciones ---
-def relacion_a_grupo(relacion):
-    r = str(relacion).lower()
-    if 'auto' in r or 'autoevalu' in r:
-        return 'Autoevaluación'
-    if 'jefe' in r or 'supervisor' in r:
-        return 'Jefe Inmediato'
-    if 'subordin' in r:
-        return 'Subordinados'
-    # tratar 'par' y 'cliente' como colegas por defecto
-    if 'par' in r or 'compa' in r or 'cliente' in r:
-        return 'Colegas'
-    # fallback
-    return 'Otros'
-
-# Colores profesionales y armoniosos para las categorías
-colores_categorias = {
-    'Trabajo en Equipo': '#667eea',
-    'Comunicación': '#36d1dc',
-    'Liderazgo': '#f093fb',
-    'Toma de Decisiones': '#fa709a',
-    'Planeación': '#a8edea',
-    'Manejo de Recursos': '#ffd166',
-    'Capacidad de Negociación': '#9795f0',
-    'Innovación y Creatividad': '#fbc2eb',
-    'Gestión del Tiempo': '#38ef7d',
-    'Calidad y Resultados': '#4facfe'
-}
+                dcc.Dropdown(id='area-organizacion', options=areas, value=areas[0]['value'] if areas else None,
+                             clearable=False, className="mb-2"),
+                dcc.Graph(id='mapa-areas', config={'displayModeBar': False}),
+            ], style={} if areas else {'display': 'none'}),
+            html.Small(id='resumen-organizacion', className="text-muted d-block mb-2"),
+            dcc.Graph(id='mapa-organizacion', config={'displayModeBar': False}),
+            dash_table.DataTable(
+                id='tabla-organizacion',
+                columns=columnas_organizacion(),
+                page_action='custom', page_current=0, page_size=FILAS_ORGANIZACION,
+                sort_action='custom', sort_mode='single',
+                sort_by=[{'column_id': 'posicion', 'direction': 'asc'}],
+                style_table={'overflowX': 'auto'},
+                style_cell={'fontSize': '0.8rem', 'padding': '4px', 'textAlign': 'center'},
+                style_cell_conditional=[{'if': {'column_id': 'evaluado'}, 'textAlign': 'left'}],
+                style_header={'fontWeight': 'bold', 'whiteSpace': 'normal', 'height': 'auto'},
+            )
+        ])
+    ], className="shadow-sm")
+
+
+# Pasos de la rejilla de ponderaciones que se ofrecen en la pestaña de escenarios
+PASOS_ESCENARIOS = {paso: len(escenarios.rejilla(paso)) for paso in (10, 5, 2)}
+
+
+def panel_escenarios():
+    """Sensibilidad del ranking y del cuadrante 9-Box a las ponderaciones (barrido de una rejilla)."""
+    numero = {'type': 'numeric', 'format': {'specifier': '.1f'}}
+    return dbc.Card([
+        dbc.CardBody([
+            html.H5("Escenarios de ponderación", className="card-title text-primary mb-1"),
+            html.Small("Ranking y cuadrante con las ponderaciones actuales frente a todas las combinaciones "
+                       "de la rejilla.", className="text-muted d-block mb-2"),
+            dcc.Dropdown(id='paso-escenarios', value=5, clearable=False, className="mb-2",
+                         options=[{'label': f"Pasos de {paso}% ({n} escenarios)", 'value': paso}
+                                  for paso, n in PASOS_ESCENARIOS.items()]),
+            html.Small(id='resumen-escenarios', className="text-muted d-block mb-2"),
+            dcc.Graph(id='grafica-escenarios', config={'displayModeBar': False}),
+            dash_table.DataTable(
+                id='tabla-escenarios',
+                columns=[
+                    {'name': 'Evaluado', 'id': 'evaluado'},
+                    {'name': 'Posición actual', 'id': 'posicion_base', 'type': 'numeric'},
+                    {'name': 'Mejor', 'id': 'mejor_posicion', 'type': 'numeric'},
+                    {'name': 'Peor', 'id': 'peor_posicion', 'type': 'numeric'},
+                    {'name': 'Desv. posición', 'id': 'desviacion_posicion', **numero},
+                    {'name': 'Cuadrante actual', 'id': 'cuadrante_base'},
+                    {'name': '% escenarios con otro cuadrante', 'id': 'cambios_cuadrante', **numero},
+                    {'name': 'Cuadrantes posibles', 'id': 'cuadrantes'},
+                ],
+                page_action='native', page_size=FILAS_ORGANIZACION, sort_action='native',
+                style_table={'overflowX': 'auto'},
+                style_cell={'fontSize': '0.8rem', 'padding': '4px', 'textAlign': 'center'},
+                style_cell_conditional=[{'if': {'column_id': c}, 'textAlign': 'left'} for c in ('evaluado', 'cuadrantes')],
+                style_header={'fontWeight': 'bold', 'whiteSpace': 'normal', 'height': 'auto'},
+            )
+        ])
+    ], className="shadow-sm")
 
-# --- 4. LÓGICA DE CÁLCULO (Refactorizado) ---
-def calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub):
-    if evaluado is None:
-        return None
-
-    # Ponderaciones
-    weights = {
-        'Autoevaluación': float(w_auto or 0),
-        'Jefe Inmediato': float(w_jefe or 0),
-        'Colegas': float(w_colegas or 0),
-        'Subordinados': float(w_sub or 0)
-    }
-    total = sum(weights.values())
-    if total <= 0:
-        return {'error': 'Ponderaciones deben sumar > 0'}
 
-    weights_norm = {k: v / total for k, v in weights.items()}
+# --- 3. NUEVO LAYOUT CON BOOTSTRAP ---
+def construir_layout():
+    """Layout del dashboard (se construye en cada carga de página con la versión vigente del dataset)."""
+    return dbc.Container([
+        # Header - Responsivo
+        dbc.Row([
+            dbc.Col([
+                html.Div([
+                    html.H2('Dashboard 360° - Evaluación de Desempeño',
+                           className="text-dark fw-bold mb-2",
+                           style={'fontSize': 'clamp(1.25rem, 4vw, 2rem)'}),  # Tamaño de fuente adaptable
+                    html.P('Análisis integral de competencias y habilidades',
+                          className="text-secondary",
+                          style={'fontSize': 'clamp(0.875rem, 2vw, 1rem)'})
+                ], className="text-center", style={
+                    'backgroundColor': '#f8f9fa',
+                    'padding': 'clamp(15px, 4vw, 30px)',  # Padding adaptable
+                    'borderRadius': '10px',
+                    'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'
+                })
+            ], xs=12, className="mb-3 mb-md-4")  # Margen adaptable
+        ]),
+
+        # Panel de Control - Adaptable
+        dbc.Row([
+            # Sidebar - Full width en móvil, lateral en desktop
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Configuración", className="card-title text-primary mb-3",
+                               style={'fontSize': 'clamp(1rem, 3vw, 1.25rem)'}),
+
+                        # Selector de evaluado
+                        html.Label('Evaluado:', className="fw-bold mb-2 small"),
+                        dcc.Dropdown(
+                            id='evaluado-dropdown',
+                            options=evaluados_options,
+                            value=evaluados_options[0]['value'] if evaluados_options else None,
+                            className="mb-3",
+                            style={'fontSize': 'clamp(0.75rem, 2vw, 1rem)'}
+                        ),
+
+                        html.Hr(),
+
+                        # Ponderaciones compactas - Grid responsivo
+                        html.Label('Ponderaciones (%):', className="fw-bold mb-2 small"),
+                        html.Small('Se normalizan automáticamente', className="text-muted d-block mb-2"),
+
+                        dbc.Row([
+                            dbc.Col([
+                                dbc.Label('Auto', className="small", style={'fontSize': 'clamp(0.7rem, 1.5vw, 0.875rem)'}),
+                                dbc.Input(id='w-auto', type='number', value=PONDERACIONES_DEFAULT['Autoevaluación'], min=0, max=100, step=1, size="sm")
+                            ], xs=6, sm=3, className="mb-2 mb-sm-0"),  # 2 columnas en móvil, 4 en tablet+
+                            dbc.Col([
+                                dbc.Label('Jefe', className="small", style={'fontSize': 'clamp(0.7rem, 1.5vw, 0.875rem)'}),
+                                dbc.Input(id='w-jefe', type='number', value=PONDERACIONES_DEFAULT['Jefe Inmediato'], min=0, max=100, step=1, size="sm")
+                            ], xs=6, sm=3, className="mb-2 mb-sm-0"),
+                            dbc.Col([
+                                dbc.Label('Colegas', className="small", style={'fontSize': 'clamp(0.7rem, 1.5vw, 0.875rem)'}),
+                                dbc.Input(id='w-colegas', type='number', value=PONDERACIONES_DEFAULT['Colegas'], min=0, max=100, step=1, size="sm")
+                            ], xs=6, sm=3),
+                            dbc.Col([
+                                dbc.Label('Subord.', className="small", style={'fontSize': 'clamp(0.7rem, 1.5vw, 0.875rem)'}),
+                                dbc.Input(id='w-sub', type='number', value=PONDERACIONES_DEFAULT['Subordinados'], min=0, max=100, step=1, size="sm")
+                            ], xs=6, sm=3)
+                        ])
+                    ], className="p-3")  # Padding fijo reducido para móviles
+                ], className="shadow-sm mb-3"),
 
-    # Filtrar datos del evaluado
-    df_eval = df[df[COL_EVALUADO] == evaluado]
-    if df_eval.empty:
-        return {'error': 'Sin datos'}
+                # Tarjeta de calificación final
+                dbc.Card([
+                    dbc.CardBody(html.Div(id='resultado-global'), className="p-3")
+                ], className="shadow-sm mb-3"),
 
-    df_eval = df_eval.copy()
-    df_eval['grupo_ponderacion'] = df_eval[COL_RELACION].map(relacion_a_grupo)
+                # Botones de Descarga
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H6("Exportar Reporte", className="card-title text-muted mb-3"),
+                        dbc.Row([
+                            dbc.Col(
+                                dbc.Button([html.I(className="fas fa-file-pdf me-2"), "PDF"], 
+                                         id="btn-pdf", color="danger", outline=True, className="w-100"),
+                                width=6
+                            ),
+                            dbc.Col(
+                                dbc.Button([html.I(className="fas fa-file-word me-2"), "Word"], 
+                                         id="btn-word", color="primary", outline=True, className="w-100"),
+                                width=6
+                            )
+                        ]),
+                        # Enlace al reporte listo; un callback de cliente inicia la descarga al recibir la URL
+                        html.A("Descargar reporte", id="enlace-descarga", href=None,
+                               className="small d-block mt-2", style={'display': 'none'}),
+                        dcc.Store(id="url-descarga"),
+                        # Progreso del trabajo de reporte en segundo plano
+                        dbc.Progress(id="progreso-reporte", value=0, striped=True, animated=True,
+                                     className="mt-3", style={'display': 'none'}),
+                        html.Small(id="estado-reporte", className="text-muted d-block mt-1"),
+                        dcc.Store(id="trabajo-reporte"),
+                        dcc.Interval(id="intervalo-reporte", interval=1000, disabled=True)
+                    ], className="p-3")
+                ], className="shadow-sm")
+            ], xs=12, sm=12, md=12, lg=3, xl=3, className="mb-3 mb-lg-0"),  # Full width en móvil/tablet, sidebar en desktop
+
+            # Área de visualización - Adaptable
+            dbc.Col([
+                dbc.Tabs([
+                    # Grid de gráficas de pastel por categoría
+                    dbc.Tab(html.Div(id='graficas-categorias', className="pt-3"), label="Evaluado", tab_id='evaluado'),
+                    dbc.Tab(html.Div(panel_organizacion(), className="pt-3"), label="Organización",
+                            tab_id='organizacion'),
+                    dbc.Tab(html.Div(panel_escenarios(), className="pt-3"), label="Escenarios", tab_id='escenarios'),
+                ], id='pestanas', active_tab='evaluado')
+            ], xs=12, sm=12, md=12, lg=9, xl=9)  # Full width en móvil/tablet, 9 cols en desktop
+        ])
+    ], fluid=True, className="bg-light p-2 p-sm-3 p-md-4", style={'minHeight': '100vh'})
 
-    # Calcular promedios por grupo
-    grupos = df_eval.groupby('grupo_ponderacion')[comp_cols].mean()
 
-    # Conteo de evaluadores
-    conteo_evaluadores = df_eval['grupo_ponderacion'].value_counts().to_dict()
-    total_evaluadores = len(df_eval)
+app.layout = construir_layout
 
-    # Calcular puntaje final por competencia
-    final_por_comp = pd.Series(0.0, index=comp_cols)
-    for grupo, peso in weights_norm.items():
-        if grupo in grupos.index:
-            final_por_comp = final_por_comp + grupos.loc[grupo].astype(float).fillna(0) * peso
 
-    calificacion_final = final_por_comp.mean()
+# --- 4. LÓGICA DE CÁLCULO (Refactorizado) ---
+def calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub):
+    """Puntajes del evaluado (datos_evaluacion.score) más las figuras Plotly del dashboard."""
+    datos = datos_evaluacion.score(dataset, evaluado, w_auto, w_jefe, w_colegas, w_sub)
+    if datos is None or 'error' in datos:
+        return datos
 
-    # Promedios por categoría
-    promedios_categorias = {}
-    for categoria, comps_cat in categorias_comp.items():
-        if comps_cat:
-            promedios_categorias[categoria] = final_por_comp[comps_cat].mean()
+    raw = datos['data_raw']
+    promedios_categorias = raw['promedios_categorias']
+    promedios_empresa_cat = raw['promedios_empresa_cat']
+    potencial = datos['kpis']['potencial']
+    desempeno = datos['kpis']['calificacion_final']
+    color_cuadrante = datos['textos']['color_cuadrante']
 
     # --- GENERACIÓN DE FIGURAS ---
+    inicio_figuras = time.perf_counter()
     
     # 1. Radar General
     fig_radar_general = go.Figure()
@@ -517,13 +398,6 @@ def calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub):
         ))
         
         # Promedio Empresa
-        promedios_empresa_cat = []
-        for categoria, comps_cat in categorias_comp.items():
-            if comps_cat:
-                # Calcular promedio global de la empresa para estas competencias (scalar)
-                prom = df[comps_cat].mean().mean()
-                promedios_empresa_cat.append(prom)
-        
         if promedios_empresa_cat:
             prom_empresa_radar = promedios_empresa_cat + [promedios_empresa_cat[0]]
             fig_radar_avanzado.add_trace(go.Scatterpolar(
@@ -542,38 +416,7 @@ def calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub):
             showlegend=True, height=500, margin=dict(t=40, b=40, l=40, r=180)
         )
 
-    # 3. Matriz 9-Box
-    # 3. Matriz 9-Box
-    categorias_potencial = ['Liderazgo', 'Innovación y Creatividad', 'Toma de Decisiones']
-    cats_presentes = [c for c in categorias_potencial if c in promedios_categorias]
-    if cats_presentes:
-        potencial = sum([promedios_categorias.get(cat, 0) for cat in cats_presentes]) / len(cats_presentes)
-    else:
-        potencial = 0
-    desempeno = calificacion_final
-
-    # Determinar cuadrante
-    if desempeno >= 4.0 and potencial >= 4.0:
-        cuadrante = "ESTRELLA"
-        color_cuadrante = "#28a745"
-        descripcion_cuadrante = "Alto desempeño y alto potencial - Talento clave"
-        accion_rh = "Acción: Retener, desarrollar para posiciones de liderazgo senior"
-    elif desempeno >= 4.0 and potencial < 4.0:
-        cuadrante = "CONTRIBUIDOR SÓLIDO"
-        color_cuadrante = "#17a2b8"
-        descripcion_cuadrante = "Alto desempeño, potencial moderado - Experto técnico"
-        accion_rh = "Acción: Reconocer expertise, considerar roles especializados"
-    elif desempeno < 4.0 and potencial >= 4.0:
-        cuadrante = "TALENTO EMERGENTE"
-        color_cuadrante = "#ffc107"
-        descripcion_cuadrante = "Potencial alto, desempeño en desarrollo"
-        accion_rh = "Acción: Mentoring intensivo, asignar proyectos retadores"
-    else:
-        cuadrante = "EN DESARROLLO"
-        color_cuadrante = "#dc3545"
-        descripcion_cuadrante = "Requiere apoyo en desempeño y desarrollo"
-        accion_rh = "Acción: Plan de mejora de 90 días con seguimiento semanal"
-
+    # 3. Matriz 9-Box (cuadrante calculado en datos_evaluacion.score)
     fig_matriz = go.Figure()
     fig_matriz.add_hline(y=4.0, line_dash="dash", line_color="gray", opacity=0.5)
     fig_matriz.add_vline(x=4.0, line_dash="dash", line_color="gray", opacity=0.5)
@@ -594,15 +437,7 @@ def calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub):
     fig_comparacion = go.Figure()
     colores_grupos = {'Autoevaluación': '#17a2b8', 'Jefe Inmediato': '#dc3545', 'Colegas': '#ffc107', 'Subordinados': '#28a745'}
     
-    for grupo in grupos.index:
-        promedios_grupo_cat = []
-        for categoria, comps_cat in categorias_comp.items():
-            if comps_cat:
-                prom = grupos.loc[grupo][comps_cat].mean()
-                promedios_grupo_cat.append(prom)
-            else:
-                promedios_grupo_cat.append(0)
-        
+    for grupo, promedios_grupo_cat in raw['promedios_por_grupo'].items():
         fig_comparacion.add_trace(go.Bar(
             name=grupo, x=categorias_list, y=promedios_grupo_cat,
             marker_color=colores_grupos.get(grupo, '#6c757d')
@@ -612,9 +447,7 @@ def calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub):
 
     # 5. Gráficas de Pastel (Donas) por Categoría
     figs_categorias = {}
-    for categoria, comps_cat in categorias_comp.items():
-        if not comps_cat: continue
-        promedio_cat = final_por_comp[comps_cat].mean()
+    for categoria, promedio_cat in promedios_categorias.items():
         porcentaje = (promedio_cat / 5.0) * 100
         
         fig_pastel = go.Figure(data=[go.Pie(
@@ -627,85 +460,40 @@ def calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub):
         
         figs_categorias[f'cat_{categoria}'] = fig_pastel
 
-    # Textos y KPIs
-    categorias_bajas = [cat for cat, val in promedios_categorias.items() if val < 3.0]
-    categorias_criticas = [cat for cat, val in promedios_categorias.items() if val < 2.5]
-    
-    if calificacion_final >= 4.5:
-        estado_aptitud = "SOBRESALIENTE"
-        color_aptitud = "#28a745"
-        mensaje_aptitud = "Desempeño excepcional en todas las competencias"
-        recomendacion_rh = "Talento clave - Considerar para roles de liderazgo estratégico"
-    elif calificacion_final >= 4.0 and not categorias_bajas:
-        estado_aptitud = "ALTO DESEMPEÑO"
-        color_aptitud = "#28a745"
-        mensaje_aptitud = "Cumple ampliamente con los estándares del puesto"
-        recomendacion_rh = "Excelente desempeño - Considerar para promoción"
-    elif calificacion_final >= 3.5 and not categorias_criticas:
-        estado_aptitud = "CUMPLE EXPECTATIVAS"
-        color_aptitud = "#17a2b8"
-        mensaje_aptitud = "Desempeño satisfactorio acorde al puesto"
-        recomendacion_rh = "Mantener nivel actual - Oportunidades de desarrollo"
-    elif calificacion_final >= 2.5:
-        estado_aptitud = "EN DESARROLLO"
-        color_aptitud = "#ffc107"
-        mensaje_aptitud = f"Oportunidades de crecimiento en: {', '.join(categorias_bajas[:2])}"
-        recomendacion_rh = "Plan de desarrollo personalizado"
-    else:
-        estado_aptitud = "REQUIERE APOYO"
-        color_aptitud = "#ff6b6b"
-        mensaje_aptitud = f"Requiere apoyo inmediato en: {', '.join(categorias_criticas[:2])}"
-        recomendacion_rh = "Plan de acción intensivo"
-
-    # KPIs adicionales
-    consistencia = max(0, min(5, 5 - (final_por_comp.std() * 2)))
-    brecha_mejora = 5.0 - calificacion_final
-    percentil = (df.groupby(COL_EVALUADO)[comp_cols].mean().mean(axis=1) < calificacion_final).mean() * 100
-    nivel_cumplimiento = min(100, ((calificacion_final - 3.5) / 1.5) * 100) if calificacion_final >= 3.5 else (calificacion_final / 3.5) * 100
-
-    return {
-        'meta': {
-            'evaluado': evaluado,
-            'total_evaluadores': total_evaluadores,
-            'conteo_evaluadores': conteo_evaluadores
-        },
-        'kpis': {
-            'calificacion_final': calificacion_final,
-            'consistencia': consistencia,
-            'brecha_mejora': brecha_mejora,
-            'percentil': percentil,
-            'nivel_cumplimiento': nivel_cumplimiento
-        },
-        'figuras': {
-            'radar_general': fig_radar_general,
-            'radar_avanzado': fig_radar_avanzado,
-            'matriz': fig_matriz,
-            'comparacion': fig_comparacion,
-            **figs_categorias
-        },
-        'textos': {
-            'estado_aptitud': estado_aptitud,
-            'color_aptitud': color_aptitud,
-            'mensaje_aptitud': mensaje_aptitud,
-            'recomendacion_rh': recomendacion_rh,
-            'cuadrante': cuadrante,
-            'color_cuadrante': color_cuadrante,
-            'descripcion_cuadrante': descripcion_cuadrante,
-            'accion_rh': accion_rh,
-            'fortalezas': sorted(promedios_categorias.items(), key=lambda x: x[1], reverse=True)[:3],
-            'mejoras': sorted(promedios_categorias.items(), key=lambda x: x[1])[:3]
-        },
-        'data_raw': {
-            'final_por_comp': final_por_comp,
-            'colores_categorias': colores_categorias,
-            'promedios_categorias': promedios_categorias,
-            'promedios_empresa_cat': promedios_empresa_cat if 'promedios_empresa_cat' in locals() else [],
-            'promedios_por_grupo': {
-                grupo: [grupos.loc[grupo][categorias_comp[cat]].mean() if categorias_comp[cat] else 0 for cat in promedios_categorias.keys()]
-                for grupo in grupos.index
-            }
-        }
+    # 6. Evolución por ciclo (particiones de historial; solo si el evaluado tiene al menos dos ciclos)
+    tendencia = historial.tendencia(evaluado, w_auto, w_jefe, w_colegas, w_sub)
+    if len(tendencia) >= 2:
+        fig_tendencia = go.Figure()
+        ciclos = tendencia.index.tolist()
+        for categoria in [c for c in categorias_list if c in tendencia.columns]:
+            fig_tendencia.add_trace(go.Scatter(
+                x=ciclos, y=tendencia[categoria], mode='lines+markers', name=categoria,
+                line=dict(color=colores_categorias.get(categoria, '#667eea'), width=1.5), opacity=0.7
+            ))
+        fig_tendencia.add_trace(go.Scatter(
+            x=ciclos, y=tendencia['calificacion_final'], mode='lines+markers', name='Calificación Final',
+            line=dict(color='#343a40', width=4), customdata=tendencia['evaluadores'],
+            hovertemplate='%{x}: %{y:.2f} (%{customdata} evaluaciones)<extra></extra>'
+        ))
+        fig_tendencia.update_layout(yaxis=dict(range=[0, 5], title='Puntaje'), xaxis=dict(type='category'),
+                                    height=400, margin=dict(t=20, b=60, l=50, r=20))
+        figs_categorias['tendencia'] = fig_tendencia
+
+    datos['figuras'] = {
+        'radar_general': fig_radar_general,
+        'radar_avanzado': fig_radar_avanzado,
+        'matriz': fig_matriz,
+        'comparacion': fig_comparacion,
+        **figs_categorias
     }
+    metricas.FASES.observar(time.perf_counter() - inicio_figuras, fase='figuras')
+    return datos
+
+def texto_intervalo(intervalos, intervalo):
+    """'IC 95%: inf – sup' de un intervalo de datos_evaluacion.intervalos_confianza ('' sin intervalo)."""
+    if intervalo is None:
+        return ''
+    return f"IC {intervalos['nivel']:.0%}: {intervalo[0]:.2f} – {intervalo[1]:.2f}"
 
 # --- 4. CALLBACK MODIFICADO ---
 @app.callback(
@@ -717,6 +505,8 @@ def calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub):
     Input('w-colegas', 'value'),
     Input('w-sub', 'value')
 )
+@metricas.CALLBACKS.cronometrar(callback='actualizar_panel')
+@perfilado.perfilar('actualizar_panel', etiqueta=lambda evaluado, *_: evaluado)
 def actualizar_panel(evaluado, w_auto, w_jefe, w_colegas, w_sub):
     try:
         datos = calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub)
@@ -732,13 +522,18 @@ def actualizar_panel(evaluado, w_auto, w_jefe, w_colegas, w_sub):
         kpis = datos['kpis']
         figs = datos['figuras']
         textos = datos['textos']
+        intervalos = datos['intervalos']
         
         # --- RESUMEN CON TARJETA DE EVALUADORES ---
         resumen = html.Div([
             # Calificación Final
             html.H6("Calificación Final", className="text-muted mb-1"),
             html.H1(f"{kpis['calificacion_final']:.2f}", className='text-primary fw-bold mb-1', style={'fontSize': '2.5rem'}),
-            html.Small('de 5.0', className="text-muted d-block mb-2"),
+            html.Small('de 5.0', className="text-muted d-block"),
+            html.Small(texto_intervalo(intervalos, intervalos['calificacion_final']), className="text-muted d-block mb-2",
+                       title=f"Bootstrap de {intervalos['remuestreos']} remuestreos de los evaluadores de cada grupo"),
+            html.Span(f"Corregido por sesgo de evaluadores ({meta['normalizacion']})",
+                      className="badge bg-light text-secondary mb-2") if meta['normalizacion'] else html.Span(),
             html.Hr(className="my-2"),
             
             # Tarjeta de Evaluadores
@@ -898,6 +693,17 @@ def actualizar_panel(evaluado, w_auto, w_jefe, w_colegas, w_sub):
                 ], width=12, className="mb-4")
             ])
         ])
+        if 'tendencia' in figs:
+            contenido.children.append(dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.H5("Evolución por Ciclo", className="card-title text-primary mb-3"),
+                            dcc.Graph(figure=figs['tendencia'], config={'displayModeBar': False}, style={'height': '400px'})
+                        ])
+                    ], className="shadow-sm")
+                ], width=12, className="mb-4")
+            ]))
 
         # Gráficas de Pastel (Donas)
         graficas = []
@@ -912,7 +718,9 @@ def actualizar_panel(evaluado, w_auto, w_jefe, w_colegas, w_sub):
                     dbc.Card([
                         dbc.CardBody([
                             html.Div([html.I(className="fas fa-star", style={'color': colores_categorias.get(categoria, '#667eea'), 'marginRight': '8px'}), html.Span(categoria, className="fw-bold")], className="text-center mb-2"),
-                            dcc.Graph(figure=fig_pastel, config={'displayModeBar': False}, style={'height': '180px'})
+                            dcc.Graph(figure=fig_pastel, config={'displayModeBar': False}, style={'height': '180px'}),
+                            html.Small(texto_intervalo(intervalos, intervalos['categorias'].get(categoria)),
+                                       className="text-muted d-block text-center")
                         ], className="p-2")
                     ], className="shadow-sm border-0", style={'borderTop': f'4px solid {colores_categorias.get(categoria, "#667eea")}'})
                 ], width=6, lg=4, xl=3, className="mb-3"))
@@ -924,9 +732,136 @@ def actualizar_panel(evaluado, w_auto, w_jefe, w_colegas, w_sub):
         traceback.print_exc()
         return html.Div(f"Error: {e}"), html.Div(f"Error detallado: {e}")
 
-# --- CALLBACK DE DESCARGA ---
+# --- VISTA DE ORGANIZACIÓN ---
+def figura_mapa_organizacion(pagina, etiquetas=None):
+    """Mapa de calor fila x categoría: evaluados de la página (en el orden de la tabla) o áreas."""
+    categorias = [c for c in categorias_comp if c in pagina.columns]
+    fig = go.Figure(go.Heatmap(
+        z=pagina[categorias].to_numpy(), x=categorias, y=etiquetas or pagina.index.tolist(),
+        zmin=1, zmax=5, colorscale='RdYlGn', texttemplate='%{z:.2f}', textfont={'size': 10},
+        hovertemplate='%{y}<br>%{x}: %{z:.2f}<extra></extra>', colorbar=dict(thickness=12)
+    ))
+    fig.update_layout(height=max(250, 28 * len(pagina) + 120), margin=dict(t=20, b=100, l=160, r=20),
+                      yaxis=dict(autorange='reversed'), xaxis=dict(side='bottom', tickangle=-30))
+    return fig
+
+
+@app.callback(
+    Output('tabla-organizacion', 'data'),
+    Output('tabla-organizacion', 'page_count'),
+    Output('mapa-organizacion', 'figure'),
+    Output('resumen-organizacion', 'children'),
+    Output('mapa-areas', 'figure'),
+    Input('pestanas', 'active_tab'),
+    Input('area-organizacion', 'value'),
+    Input('tabla-organizacion', 'page_current'),
+    Input('tabla-organizacion', 'page_size'),
+    Input('tabla-organizacion', 'sort_by'),
+    Input('w-auto', 'value'),
+    Input('w-jefe', 'value'),
+    Input('w-colegas', 'value'),
+    Input('w-sub', 'value')
+)
+@metricas.CALLBACKS.cronometrar(callback='actualizar_organizacion')
+def actualizar_organizacion(pestana, area, pagina, filas, sort_by, w_auto, w_jefe, w_colegas, w_sub):
+    # Solo se calcula con la pestaña visible; todos los evaluados en una pasada, en caché por ponderaciones
+    if pestana != 'organizacion':
+        raise PreventUpdate
+    organizacion = datos_evaluacion.score_organizacion(dataset, w_auto, w_jefe, w_colegas, w_sub)
+    if organizacion is None or organizacion.empty:
+        mensaje = 'Ponderaciones deben sumar > 0' if organizacion is None else 'Sin datos'
+        return [], 1, go.Figure(), mensaje, go.Figure()
+
+    # Área seleccionada: sus agregados ya están calculados (acceso directo al nodo)
+    nodo = None
+    agregados = jerarquia.agregados(dataset, w_auto, w_jefe, w_colegas, w_sub)
+    if agregados is not None and area:
+        nodo = agregados.nodo(*area.split('|', 1))
+    fig_areas = go.Figure()
+    if nodo is not None:
+        if nodo.nivel != jerarquia.EMPRESA:
+            organizacion = organizacion.loc[nodo.evaluados]
+        if nodo.hijos:
+            hijos = [agregados.nodos[h] for h in nodo.hijos]
+            fig_areas = figura_mapa_organizacion(
+                pd.DataFrame([h.promedios for h in hijos]), [f"{h.nombre} ({h.personas})" for h in hijos])
+
+    orden = sort_by[0] if sort_by else {'column_id': 'posicion', 'direction': 'asc'}
+    ascendente = orden['direction'] == 'asc'
+    if orden['column_id'] == 'evaluado':
+        ordenado = organizacion.sort_index(ascending=ascendente)
+    else:
+        ordenado = organizacion.sort_values(orden['column_id'], ascending=ascendente, kind='stable')
+
+    filas = filas or FILAS_ORGANIZACION
+    pagina = pagina or 0
+    visible = ordenado.iloc[pagina * filas:(pagina + 1) * filas]
+    total = len(organizacion)
+    if nodo is not None:
+        calificacion, cuadrantes = nodo.calificacion, nodo.cuadrantes
+    else:
+        calificacion, cuadrantes = organizacion['calificacion_final'].mean(), organizacion['cuadrante'].value_counts()
+    cuadrantes = sorted(dict(cuadrantes).items(), key=lambda x: x[1], reverse=True)
+    resumen = (f"{total} evaluados · calificación promedio {calificacion:.2f} · "
+               + ' · '.join(f"{c}: {n}" for c, n in cuadrantes))
+    return (visible.reset_index().to_dict('records'), max(1, -(-total // filas)),
+            figura_mapa_organizacion(visible), resumen, fig_areas)
+
+
+def figura_escenarios(por_persona):
+    """Rango de posiciones (mejor a peor) de cada evaluado frente a su posición con las ponderaciones actuales."""
+    datos = por_persona.sort_values('posicion_base')
+    fig = go.Figure(go.Scattergl(
+        x=datos['posicion_base'], y=datos['posicion_base'], mode='markers', text=datos.index,
+        error_y=dict(type='data', symmetric=False, array=datos['peor_posicion'] - datos['posicion_base'],
+                     arrayminus=datos['posicion_base'] - datos['mejor_posicion'], thickness=1, width=0,
+                     color='rgba(102, 126, 234, 0.35)'),
+        marker=dict(size=5, color=datos['cambios_cuadrante'], colorscale='Reds', cmin=0, cmax=100,
+                    colorbar=dict(title='% otro<br>cuadrante', thickness=12)),
+        customdata=datos[['mejor_posicion', 'peor_posicion', 'cambios_cuadrante']].to_numpy(),
+        hovertemplate=('%{text}<br>Posición actual: %{x} (de %{customdata[0]} a %{customdata[1]})'
+                       '<br>Otro cuadrante en %{customdata[2]:.0f}% de los escenarios<extra></extra>'),
+    ))
+    fig.update_layout(height=400, margin=dict(t=20, b=60, l=60, r=20), plot_bgcolor='white',
+                      xaxis=dict(title='Posición con las ponderaciones actuales'),
+                      yaxis=dict(title='Posición en los escenarios', autorange='reversed'))
+    return fig
+
+
 @app.callback(
-    Output("download-component", "data"),
+    Output('tabla-escenarios', 'data'),
+    Output('grafica-escenarios', 'figure'),
+    Output('resumen-escenarios', 'children'),
+    Input('pestanas', 'active_tab'),
+    Input('paso-escenarios', 'value'),
+    Input('w-auto', 'value'),
+    Input('w-jefe', 'value'),
+    Input('w-colegas', 'value'),
+    Input('w-sub', 'value')
+)
+@metricas.CALLBACKS.cronometrar(callback='actualizar_escenarios')
+def actualizar_escenarios(pestana, paso, w_auto, w_jefe, w_colegas, w_sub):
+    # Solo con la pestaña visible; el barrido queda en caché por versión, ponderaciones y rejilla
+    if pestana != 'escenarios':
+        raise PreventUpdate
+    barrido = escenarios.barrer(dataset, escenarios.rejilla(paso or 5), base=(w_auto, w_jefe, w_colegas, w_sub))
+    if barrido is None:
+        mensaje = 'Sin datos' if dataset.df.empty or not dataset.col_evaluado else 'Ponderaciones deben sumar > 0'
+        return [], go.Figure(), mensaje
+
+    indicadores = barrido.resumen()
+    resumen = (f"{indicadores['escenarios']} escenarios x {indicadores['evaluados']} evaluados "
+               f"({indicadores['segundos']:.2f} s) · correlación del ranking con el actual: "
+               f"{indicadores['correlacion_media']:.2f} en promedio, {indicadores['correlacion_minima']:.2f} la menor · "
+               f"{indicadores['cuadrante_estable']} evaluados conservan su cuadrante en todos los escenarios")
+    personas = barrido.por_persona.sort_values(['cambios_cuadrante', 'desviacion_posicion'], ascending=False)
+    return personas.reset_index().to_dict('records'), figura_escenarios(barrido.por_persona), resumen
+
+
+# --- CALLBACKS DE DESCARGA (trabajos en segundo plano) ---
+@app.callback(
+    Output("url-descarga", "data", allow_duplicate=True),
+    Output("trabajo-reporte", "data"),
     Input("btn-pdf", "n_clicks"),
     Input("btn-word", "n_clicks"),
     State('evaluado-dropdown', 'value'),
@@ -936,43 +871,97 @@ def actualizar_panel(evaluado, w_auto, w_jefe, w_colegas, w_sub):
     State('w-sub', 'value'),
     prevent_initial_call=True
 )
+@metricas.CALLBACKS.cronometrar(callback='descargar_reporte')
+@perfilado.perfilar('descargar_reporte', etiqueta=lambda n_pdf, n_word, evaluado, *_: evaluado)
 def descargar_reporte(n_pdf, n_word, evaluado, w_auto, w_jefe, w_colegas, w_sub):
     ctx = dash.callback_context
-    if not ctx.triggered:
+    if not ctx.triggered or evaluado is None:
         raise PreventUpdate
-    
+
     button_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    
-    datos = calcular_datos_dashboard(evaluado, w_auto, w_jefe, w_colegas, w_sub)
-    if datos is None or 'error' in datos:
+    formato = 'pdf' if button_id == "btn-pdf" else 'docx'
+    pesos = [float(w or 0) for w in (w_auto, w_jefe, w_colegas, w_sub)]
+    if sum(pesos) <= 0:
         raise PreventUpdate
 
-    print(f"Callback descarga activado: {button_id}")
-    
-    try:
-        if button_id == "btn-pdf":
-            print("Generando PDF...")
-            pdf_buffer = utils_reporte.generar_pdf(datos)
-            if pdf_buffer:
-                print("PDF generado correctamente, enviando...")
-                return dcc.send_bytes(pdf_buffer.read(), f"Reporte_360_{evaluado}.pdf")
-            else:
-                print("Error: generar_pdf retornó None")
-        
-        elif button_id == "btn-word":
-            print("Generando Word...")
-            word_buffer = utils_reporte.generar_word(datos)
-            if word_buffer:
-                print("Word generado correctamente, enviando...")
-                return dcc.send_bytes(word_buffer.read(), f"Reporte_360_{evaluado}.docx")
-            else:
-                print("Error: generar_word retornó None")
-    except Exception as e:
-        print(f"Excepción en generación de reporte: {e}")
-        import traceback
-        traceback.print_exc()
-            
-    return None
+    # Reporte ya generado con los mismos datos y ponderaciones: se descarga de inmediato
+    ruta = cache.obtener(cache.clave(evaluado, pesos, formato, VERSION_DATOS), formato)
+    if ruta is not None:
+        print(f"Reporte {formato} de {evaluado} servido desde caché")
+        return descarga_reporte(ruta, evaluado), dash.no_update
+
+    # Solo se encola: la generación corre en los trabajadores de trabajos_reporte
+    trabajo_id = cola_reportes.encolar(evaluado, formato, pesos)
+    print(f"Reporte {formato} encolado para {evaluado}: {trabajo_id}")
+    return dash.no_update, {'id': trabajo_id, 'evaluado': evaluado, 'formato': formato}
+
+
+@app.callback(
+    Output("url-descarga", "data"),
+    Output("intervalo-reporte", "disabled"),
+    Output("progreso-reporte", "value"),
+    Output("progreso-reporte", "style"),
+    Output("estado-reporte", "children"),
+    Input("trabajo-reporte", "data"),
+    Input("intervalo-reporte", "n_intervals"),
+    prevent_initial_call=True
+)
+@metricas.CALLBACKS.cronometrar(callback='consultar_trabajo_reporte')
+def consultar_trabajo_reporte(trabajo, n_intervals):
+    if not trabajo:
+        raise PreventUpdate
+
+    estado = cola_reportes.obtener(trabajo['id'])
+    if estado is None:
+        return None, True, 0, {'display': 'none'}, "El trabajo de reporte ya no existe"
+
+    visible = {'display': 'flex'}
+    if estado['estado'] == trabajos_reporte.TERMINADO:
+        if not os.path.exists(estado['ruta']):
+            return None, True, 0, {'display': 'none'}, "El reporte expiró, vuelve a generarlo"
+        return descarga_reporte(estado['ruta'], trabajo['evaluado']), True, 100, {'display': 'none'}, ""
+    if estado['estado'] == trabajos_reporte.ERROR:
+        return None, True, 0, {'display': 'none'}, estado['mensaje']
+    return None, False, estado['progreso'], visible, estado['mensaje']
+
+
+# Al recibir la URL de un reporte, el navegador lo descarga en streaming desde /reportes/
+app.clientside_callback(
+    """
+    function(descarga) {
+        if (!descarga || !descarga.url) {
+            return [null, {'display': 'none'}];
+        }
+        window.location.href = descarga.url;
+        return [descarga.url, {'display': 'block'}];
+    }
+    """,
+    Output("enlace-descarga", "href"),
+    Output("enlace-descarga", "style"),
+    Input("url-descarga", "data")
+)
+
+
+def create_app(preload=True):
+    """Fábrica para servidores WSGI: retorna el servidor Flask con el dataset ya cargado.
+
+    Los datos se descargan y convierten una sola vez, al importar este módulo. Con gunicorn en
+    modo preload (ver gunicorn.conf.py) eso ocurre en el proceso maestro y los workers heredan
+    el dataset por fork, compartiendo sus páginas de memoria (copy-on-write) sin volver a
+    consultar Google.
+    """
+    if preload:
+        # Mover los objetos ya creados a la generación permanente del recolector: así sus
+        # recorridos no escriben en ellos tras el fork y las páginas siguen compartidas.
+        gc.collect()
+        gc.freeze()
+        # Las métricas de la carga inicial quedan en el archivo del maestro (los workers empiezan en cero)
+        metricas.volcar()
+    return server
+
 
 if __name__ == '__main__':
+    # Con el recargador de debug el módulo corre dos veces; solo el proceso hijo arranca trabajadores
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        trabajos_reporte.iniciar_trabajadores(int(os.environ.get('REPORTES_TRABAJADORES', '1')))
     app.run(debug=True, port=8051)
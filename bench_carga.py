@@ -0,0 +1,341 @@
+"""
+Prueba de carga HTTP del dashboard contra el endpoint de callbacks de Dash.
+
+Uso:
+    python bench_carga.py --usuarios 20 --duracion 60                     # levanta gunicorn con datos sintéticos
+    python bench_carga.py --workers 4 --hilos 2 --trabajadores-reportes 2 --json carga.json
+    python bench_carga.py --url http://localhost:8051 --usuarios 10       # contra un servidor ya corriendo
+
+Sin --url se arrancan gunicorn (gunicorn.conf.py, app:create_app()) y los
+trabajadores de reportes con DATOS_SINTETICOS (sin acceso a Google) en un
+directorio temporal. Cada usuario simulado repite una sesión típica de RR. HH.
+hasta agotar la duración: elige un evaluado (actualizar_panel), ajusta las
+ponderaciones algunas veces, pide el PDF (descargar_reporte), consulta el
+trabajo cada 0.5 s (consultar_trabajo_reporte) y descarga el archivo
+(/reportes). Se reporta el rendimiento y la latencia p50/p95/p99 por callback.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+
+
+class Cliente:
+    """Conexión HTTP persistente (keep-alive) de un usuario simulado."""
+
+    def __init__(self, url, timeout=120):
+        partes = urllib.parse.urlsplit(url)
+        self.host, self.puerto = partes.hostname, partes.port or 80
+        self.prefijo = partes.path.rstrip('/')
+        self.timeout = timeout
+        self.conexion = None
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        """Retorna (status, bytes); reintenta una vez si el servidor cerró la conexión."""
+        encabezados = {'Content-Type': 'application/json'} if cuerpo is not None else {}
+        datos = json.dumps(cuerpo).encode('utf-8') if cuerpo is not None else None
+        for intento in range(2):
+            if self.conexion is None:
+                self.conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=self.timeout)
+            try:
+                self.conexion.request(metodo, self.prefijo + ruta, body=datos, headers=encabezados)
+                respuesta = self.conexion.getresponse()
+                return respuesta.status, respuesta.read()
+            except (http.client.HTTPException, OSError):
+                self.conexion.close()
+                self.conexion = None
+                if intento:
+                    raise
+
+    def callback(self, callback, valores, cambiados):
+        """POST a /_dash-update-component; retorna (status, {componente: {propiedad: valor}})."""
+        cuerpo = {
+            'output': callback['output'],
+            'outputs': callback['outputs'],
+            'inputs': [dict(e, value=valores.get(e['id'])) for e in callback['inputs']],
+            'state': [dict(e, value=valores.get(e['id'])) for e in callback['state']],
+            'changedPropIds': [f'{c}.{callback["propiedad"][c]}' for c in cambiados],
+        }
+        status, datos = self.pedir('POST', '/_dash-update-component', cuerpo)
+        if status == 200:
+            return status, json.loads(datos).get('response', {})
+        return status, {}
+
+
+def _salidas(output):
+    """'..a.children...b.value..' -> [{'id': 'a', 'property': 'children'}, ...] (sin sufijo @hash)."""
+    salidas = []
+    for parte in output.strip('.').split('...'):
+        componente, _, propiedad = parte.rpartition('.')
+        salidas.append({'id': componente, 'property': propiedad.split('@')[0]})
+    return salidas
+
+
+def descubrir(url):
+    """Callbacks (por nombre) y evaluados disponibles, leídos de /_dash-dependencies y /_dash-layout."""
+    cliente = Cliente(url)
+    _, dependencias = cliente.pedir('GET', '/_dash-dependencies')
+    buscados = {
+        'actualizar_panel': 'resultado-global.children',
+        'descargar_reporte': 'trabajo-reporte.data',
+        'consultar_trabajo_reporte': 'intervalo-reporte.disabled',
+    }
+    callbacks = {}
+    for dep in json.loads(dependencias):
+        for nombre, salida in buscados.items():
+            if salida in dep['output']:
+                entradas = [{'id': e['id'], 'property': e['property']} for e in dep['inputs']]
+                estado = [{'id': e['id'], 'property': e['property']} for e in dep['state']]
+                callbacks[nombre] = {
+                    'output': dep['output'], 'outputs': _salidas(dep['output']),
+                    'inputs': entradas, 'state': estado,
+                    'propiedad': {e['id']: e['property'] for e in entradas + estado},
+                }
+    faltan = set(buscados) - set(callbacks)
+    if faltan:
+        raise RuntimeError(f"No se encontraron los callbacks {sorted(faltan)} en {url}")
+
+    _, layout = cliente.pedir('GET', '/_dash-layout')
+    pendientes = [json.loads(layout)]
+    while pendientes:
+        nodo = pendientes.pop()
+        if isinstance(nodo, dict):
+            props = nodo.get('props', {}) if 'props' in nodo else nodo
+            if props.get('id') == 'evaluado-dropdown':
+                return callbacks, [o['value'] if isinstance(o, dict) else o for o in props.get('options', [])]
+            pendientes.extend(nodo.values())
+        elif isinstance(nodo, list):
+            pendientes.extend(nodo)
+    raise RuntimeError("No se encontró el selector de evaluados en el layout")
+
+
+class Registro:
+    """Latencias por operación, compartidas entre hilos."""
+
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.errores = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def agregar(self, nombre, segundos, error=False):
+        with self._lock:
+            if error:
+                self.errores[nombre] += 1
+            else:
+                self.latencias[nombre].append(segundos)
+
+
+def medir(registro, nombre, funcion, *args):
+    inicio = time.perf_counter()
+    try:
+        status, resultado = funcion(*args)
+    except (http.client.HTTPException, OSError, ValueError):
+        registro.agregar(nombre, 0, error=True)
+        return None
+    # 204: el callback no actualizó nada (PreventUpdate), también es una respuesta válida
+    error = status not in (200, 204, 206)
+    registro.agregar(nombre, time.perf_counter() - inicio, error=error)
+    return None if error else resultado
+
+
+def sesion(cliente, registro, callbacks, evaluados, rng, ajustes, pausa, formato):
+    """Una sesión de un usuario: elegir evaluado, ajustar ponderaciones y descargar un reporte."""
+    valores = {'evaluado-dropdown': rng.choice(evaluados), 'w-auto': 5, 'w-jefe': 18, 'w-colegas': 30, 'w-sub': 47}
+    medir(registro, 'actualizar_panel', cliente.callback, callbacks['actualizar_panel'], valores, ['evaluado-dropdown'])
+    for _ in range(ajustes):
+        time.sleep(pausa)
+        peso = rng.choice(['w-auto', 'w-jefe', 'w-colegas', 'w-sub'])
+        valores[peso] = rng.randint(0, 60)
+        medir(registro, 'actualizar_panel', cliente.callback, callbacks['actualizar_panel'], valores, [peso])
+
+    time.sleep(pausa)
+    boton = 'btn-pdf' if formato == 'pdf' else 'btn-word'
+    valores.update({'btn-pdf': None, 'btn-word': None, boton: 1})
+    inicio = time.perf_counter()
+    respuesta = medir(registro, 'descargar_reporte', cliente.callback, callbacks['descargar_reporte'], valores, [boton])
+    if respuesta is None:
+        return
+    descarga = (respuesta.get('url-descarga') or {}).get('data')
+    trabajo = (respuesta.get('trabajo-reporte') or {}).get('data')
+    intervalos = 0
+    while descarga is None and trabajo is not None:
+        time.sleep(0.5)
+        intervalos += 1
+        valores.update({'trabajo-reporte': trabajo, 'intervalo-reporte': intervalos})
+        respuesta = medir(registro, 'consultar_trabajo_reporte', cliente.callback,
+                          callbacks['consultar_trabajo_reporte'], valores, ['intervalo-reporte'])
+        if respuesta is None:
+            return
+        if (respuesta.get('intervalo-reporte') or {}).get('disabled'):
+            descarga = (respuesta.get('url-descarga') or {}).get('data')
+            if descarga is None:
+                registro.agregar('reporte_completo', 0, error=True)
+                return
+    if descarga is None:
+        return
+    medir(registro, 'GET /reportes', cliente.pedir, 'GET', descarga['url'])
+    registro.agregar('reporte_completo', time.perf_counter() - inicio)
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (valores ordenados)."""
+    if not valores:
+        return 0.0
+    indice = max(0, min(len(valores) - 1, int(round(p / 100 * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+
+def resumir(registro, duracion):
+    resultados = {}
+    for nombre in sorted(set(registro.latencias) | set(registro.errores)):
+        valores = sorted(registro.latencias[nombre])
+        resultados[nombre] = {
+            'peticiones': len(valores),
+            'errores': registro.errores[nombre],
+            'por_segundo': len(valores) / duracion,
+            'p50_ms': percentil(valores, 50) * 1000,
+            'p95_ms': percentil(valores, 95) * 1000,
+            'p99_ms': percentil(valores, 99) * 1000,
+            'max_ms': (valores[-1] if valores else 0.0) * 1000,
+        }
+    return resultados
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def levantar_servidor(args):
+    """Arranca gunicorn y los trabajadores de reportes con datos sintéticos; retorna (url, procesos, directorio)."""
+    directorio = tempfile.mkdtemp(prefix='bench_carga_')
+    puerto = _puerto_libre()
+    entorno = dict(os.environ, DATOS_SINTETICOS=args.datos, REPORTES_DIR=directorio, REPORTES_TRABAJADORES='0')
+    bitacora = open(os.path.join(directorio, 'servidor.log'), 'w')
+    procesos = [
+        subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(args.workers),
+                          '--threads', str(args.hilos), '-b', f'127.0.0.1:{puerto}', 'app:create_app()'],
+                         cwd=CARPETA, env=entorno, stdout=bitacora, stderr=subprocess.STDOUT, start_new_session=True),
+    ]
+    if args.trabajadores_reportes:
+        procesos.append(subprocess.Popen(
+            [sys.executable, 'trabajos_reporte.py', '--trabajadores', str(args.trabajadores_reportes)],
+            cwd=CARPETA, env=entorno, stdout=bitacora, stderr=subprocess.STDOUT, start_new_session=True))
+
+    url = f'http://127.0.0.1:{puerto}'
+    limite = time.time() + 180
+    while time.time() < limite:
+        if procesos[0].poll() is not None:
+            break
+        try:
+            if Cliente(url, timeout=5).pedir('GET', '/_dash-dependencies')[0] == 200:
+                return url, procesos, directorio
+        except OSError:
+            pass
+        time.sleep(0.5)
+    detener(procesos)
+    raise RuntimeError(f"El servidor no arrancó; ver {os.path.join(directorio, 'servidor.log')}")
+
+
+def detener(procesos):
+    for p in procesos:
+        if p.poll() is None:
+            os.killpg(p.pid, signal.SIGTERM)
+    for p in procesos:
+        try:
+            p.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(p.pid, signal.SIGKILL)
+
+
+def ejecutar(url, usuarios, duracion, ajustes, pausa, formato, semilla=0):
+    """Corre `usuarios` hilos durante `duracion` segundos; retorna (resultados, segundos reales)."""
+    callbacks, evaluados = descubrir(url)
+    if not evaluados:
+        raise RuntimeError("El dashboard no tiene evaluados")
+    registro = Registro()
+    fin = time.time() + duracion
+
+    def usuario(i):
+        rng = random.Random(semilla + i)
+        cliente = Cliente(url)
+        while time.time() < fin:
+            sesion(cliente, registro, callbacks, evaluados, rng, ajustes, pausa, formato)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=usuario, args=(i,), daemon=True) for i in range(usuarios)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    transcurrido = time.perf_counter() - inicio
+    return resumir(registro, transcurrido), transcurrido
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de los callbacks del dashboard.")
+    parser.add_argument('--url', help="Servidor ya corriendo (si no, se levanta gunicorn con datos sintéticos)")
+    parser.add_argument('--usuarios', type=int, default=10, help="Usuarios simultáneos")
+    parser.add_argument('--duracion', type=float, default=60, help="Segundos de prueba")
+    parser.add_argument('--ajustes', type=int, default=3, help="Cambios de ponderación por sesión")
+    parser.add_argument('--pausa', type=float, default=0.0, help="Segundos de 'pensar' entre acciones")
+    parser.add_argument('--formato', choices=['pdf', 'docx'], default='pdf')
+    parser.add_argument('--workers', type=int, default=2, help="Workers de gunicorn")
+    parser.add_argument('--hilos', type=int, default=1, help="Hilos por worker de gunicorn")
+    parser.add_argument('--trabajadores-reportes', type=int, default=1)
+    parser.add_argument('--datos', default='evaluados=200,evaluadores=8,preguntas=40',
+                        help="Parámetros de DATOS_SINTETICOS para el servidor levantado")
+    parser.add_argument('--json', dest='salida_json', help="Guardar los resultados en este archivo JSON")
+    parser.add_argument('--conservar', action='store_true', help="No borrar el directorio temporal del servidor")
+    args = parser.parse_args(argv)
+
+    procesos, directorio = [], None
+    url = args.url
+    if url is None:
+        url, procesos, directorio = levantar_servidor(args)
+        print(f"Servidor en {url} ({args.workers} workers x {args.hilos} hilos, "
+              f"{args.trabajadores_reportes} trabajadores de reportes, datos: {args.datos})")
+    try:
+        resultados, transcurrido = ejecutar(url, args.usuarios, args.duracion, args.ajustes, args.pausa, args.formato)
+    finally:
+        detener(procesos)
+        if directorio and not args.conservar:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    print(f"\n{args.usuarios} usuarios durante {transcurrido:.0f} s")
+    print(f"{'Operación':<28}{'peticiones':>11}{'errores':>9}{'req/s':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}"
+          f"{'p99 (ms)':>10}{'máx (ms)':>10}")
+    for nombre, r in resultados.items():
+        print(f"{nombre:<28}{r['peticiones']:>11}{r['errores']:>9}{r['por_segundo']:>8.1f}{r['p50_ms']:>10.0f}"
+              f"{r['p95_ms']:>10.0f}{r['p99_ms']:>10.0f}{r['max_ms']:>10.0f}")
+
+    if args.salida_json:
+        salida = {
+            'url': args.url, 'usuarios': args.usuarios, 'duracion_s': transcurrido, 'ajustes': args.ajustes,
+            'pausa_s': args.pausa, 'formato': args.formato,
+            'servidor': None if args.url else {'workers': args.workers, 'hilos': args.hilos,
+                                                'trabajadores_reportes': args.trabajadores_reportes,
+                                                'datos': args.datos},
+            'resultados': resultados,
+        }
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump(salida, f, indent=2, ensure_ascii=False)
+    return 1 if any(r['errores'] for r in resultados.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
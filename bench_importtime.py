@@ -0,0 +1,117 @@
+"""
+Benchmark del tiempo de arranque (importación) de los módulos del dashboard.
+
+Uso:
+    python bench_importtime.py [--repeticiones 5] [modulo ...]
+    python bench_importtime.py --json importtime.json                 # guardar resultados
+    python bench_importtime.py --referencia importtime.json           # comparar contra una corrida anterior
+
+Cada módulo se importa en un proceso nuevo con `python -X importtime`; se
+reporta la mediana del tiempo acumulado, los paquetes que más aportan y si se
+cargaron backends pesados (Matplotlib, xhtml2pdf, ReportLab, python-docx,
+clientes de Google, Dash/Plotly) que solo deberían importarse al generar un
+reporte, al usar credenciales o en la aplicación web. `app` también carga la
+hoja de Google, así que su tiempo incluye la red.
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+MODULOS = ['datos_evaluacion', 'fuentes_datos', 'utils_reporte', 'cache_reportes', 'trabajos_reporte', 'dataset_compartido',
+           'jerarquia', 'historial', 'normalizacion', 'escenarios']
+
+# Paquetes que no deben cargarse solo por importar el módulo (Dash y Plotly solo los necesita app.py)
+PESADOS = ['matplotlib', 'xhtml2pdf', 'reportlab', 'svglib', 'docx', 'gspread', 'oauth2client', 'dash', 'plotly']
+
+_LINEA = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def medir_importacion(modulo):
+    """Importa `modulo` en un proceso nuevo; retorna (µs acumulados, µs propios por paquete, pesados cargados)."""
+    codigo = f"import sys, json; import {modulo}; print(json.dumps([m for m in {PESADOS!r} if m in sys.modules]))"
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo],
+                             capture_output=True, text=True, check=True)
+    total = 0
+    por_paquete = defaultdict(int)
+    for linea in proceso.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if not m:
+            continue
+        propio, acumulado, sangria, nombre = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        por_paquete[nombre.split('.')[0]] += propio
+        if nombre == modulo and not sangria:
+            total = acumulado
+    pesados = json.loads(proceso.stdout.strip().splitlines()[-1])
+    return total, dict(por_paquete), pesados
+
+
+def ejecutar(modulos, repeticiones, top=5):
+    """Mide cada módulo `repeticiones` veces; retorna {modulo: resultado}."""
+    resultados = {}
+    for modulo in modulos:
+        totales = []
+        for _ in range(repeticiones):
+            total, por_paquete, pesados = medir_importacion(modulo)
+            totales.append(total)
+        mas_pesados = sorted(por_paquete.items(), key=lambda x: x[1], reverse=True)[:top]
+        resultados[modulo] = {
+            'mediana_ms': statistics.median(totales) / 1000,
+            'min_ms': min(totales) / 1000,
+            'paquetes_ms': {p: us / 1000 for p, us in mas_pesados},
+            'pesados_cargados': pesados,
+        }
+    return resultados
+
+
+def comparar(resultados, referencia, tolerancia):
+    """Imprime la variación contra una corrida anterior; retorna los módulos que empeoraron más de la tolerancia."""
+    regresiones = []
+    print(f"\n{'Módulo':<22}{'antes (ms)':>12}{'ahora (ms)':>12}{'cambio':>10}")
+    for modulo, actual in resultados.items():
+        anterior = referencia.get(modulo)
+        if anterior is None:
+            continue
+        cambio = actual['mediana_ms'] / anterior['mediana_ms'] - 1 if anterior['mediana_ms'] else 0.0
+        marca = '  <-- regresión' if cambio > tolerancia else ''
+        print(f"{modulo:<22}{anterior['mediana_ms']:>12.0f}{actual['mediana_ms']:>12.0f}{cambio:>+10.0%}{marca}")
+        if cambio > tolerancia:
+            regresiones.append(modulo)
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación de los módulos del dashboard.")
+    parser.add_argument('modulos', nargs='*', default=MODULOS, help="Módulos a medir (por defecto: %(default)s)")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--json', dest='salida_json', help="Guardar los resultados en este archivo JSON")
+    parser.add_argument('--referencia', help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Aumento relativo permitido contra la referencia (por defecto 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    resultados = ejecutar(args.modulos, args.repeticiones)
+
+    print(f"{'Módulo':<22}{'mediana (ms)':>14}{'mín (ms)':>10}  paquetes más costosos / backends pesados cargados")
+    for modulo, r in resultados.items():
+        paquetes = ', '.join(f"{p} {ms:.0f}" for p, ms in r['paquetes_ms'].items())
+        pesados = ', '.join(r['pesados_cargados']) or 'ninguno'
+        print(f"{modulo:<22}{r['mediana_ms']:>14.0f}{r['min_ms']:>10.0f}  {paquetes}  [pesados: {pesados}]")
+
+    if args.salida_json:
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+    if args.referencia:
+        with open(args.referencia, encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+        if regresiones:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
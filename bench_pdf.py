@@ -0,0 +1,95 @@
+"""
+Benchmark de los motores de PDF (xhtml2pdf vs ReportLab nativo) y de los formatos de gráfica.
+
+Uso:
+    python bench_pdf.py [--repeticiones 5] [--graficas png svg] [--calidad draft standard print]
+
+Las imágenes de Matplotlib se generan una vez por combinación de formato y
+perfil de calidad; después se mide solo el armado del documento con cada motor.
+"""
+import argparse
+import time
+
+import utils_reporte
+
+# Datos de ejemplo (misma forma que calcular_datos_dashboard)
+CATEGORIAS = ['Trabajo en Equipo', 'Comunicación', 'Liderazgo', 'Toma de Decisiones', 'Planeación',
+              'Manejo de Recursos', 'Capacidad de Negociación', 'Innovación y Creatividad',
+              'Gestión del Tiempo', 'Calidad y Resultados']
+VALORES = [4.2, 3.9, 4.5, 3.1, 3.6, 4.0, 2.8, 3.3, 4.4, 3.7]
+
+datos = {
+    'meta': {
+        'evaluado': 'Usuario de Prueba',
+        'total_evaluadores': 8,
+        'conteo_evaluadores': {'Autoevaluación': 1, 'Jefe Inmediato': 1, 'Colegas': 3, 'Subordinados': 3}
+    },
+    'kpis': {
+        'calificacion_final': 3.75,
+        'nivel_cumplimiento': 17,
+        'consistencia': 3.9,
+        'percentil': 55,
+        'brecha_mejora': 1.25
+    },
+    'textos': {
+        'estado_aptitud': 'CUMPLE EXPECTATIVAS',
+        'color_aptitud': '#17a2b8',
+        'mensaje_aptitud': 'Desempeño satisfactorio acorde al puesto',
+        'recomendacion_rh': 'Mantener nivel actual - Oportunidades de desarrollo',
+        'cuadrante': 'CONTRIBUIDOR SÓLIDO',
+        'color_cuadrante': '#17a2b8',
+        'descripcion_cuadrante': 'Alto desempeño, potencial moderado - Experto técnico',
+        'accion_rh': 'Acción: Reconocer expertise, considerar roles especializados',
+        'fortalezas': [('Liderazgo', 4.5), ('Gestión del Tiempo', 4.4), ('Trabajo en Equipo', 4.2)],
+        'mejoras': [('Capacidad de Negociación', 2.8), ('Toma de Decisiones', 3.1), ('Innovación y Creatividad', 3.3)]
+    },
+    'data_raw': {
+        'promedios_categorias': dict(zip(CATEGORIAS, VALORES)),
+        'colores_categorias': {c: '#667eea' for c in CATEGORIAS},
+        'promedios_empresa_cat': [3.8] * len(CATEGORIAS),
+        'promedios_por_grupo': {
+            'Autoevaluación': [v + 0.3 for v in VALORES],
+            'Jefe Inmediato': [v - 0.2 for v in VALORES],
+            'Colegas': VALORES,
+            'Subordinados': [v + 0.1 for v in VALORES]
+        }
+    }
+}
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta `funcion` varias veces; retorna (tiempos en segundos, último resultado)."""
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos, resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compara los motores de PDF del reporte.")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--graficas', nargs='+', choices=utils_reporte.FORMATOS_GRAFICA, default=['png', 'svg'],
+                        help="Formatos de gráfica a comparar")
+    parser.add_argument('--calidad', nargs='+', choices=sorted(utils_reporte.PERFILES_CALIDAD), default=['standard'],
+                        help="Perfiles de calidad a comparar (solo afectan a PNG)")
+    args = parser.parse_args()
+
+    # Calentamiento: Matplotlib se importa de forma diferida en la primera gráfica
+    utils_reporte.generar_imagenes_matplotlib(datos, formato='png', perfil='draft')
+
+    print(f"{'Motor':<10}{'gráficas':<18}{'imágenes (ms)':>14}{'PDF media (ms)':>16}{'mín (ms)':>10}{'tamaño (KB)':>13}")
+    for formato in args.graficas:
+        for perfil in (args.calidad if formato == 'png' else ['-']):
+            tiempos_img, imagenes = medir(lambda: utils_reporte.generar_imagenes_matplotlib(
+                datos, formato=formato, perfil=None if perfil == '-' else perfil), 1)
+            for motor in utils_reporte.MOTORES_PDF:
+                # Calentamiento: cada motor importa su backend en la primera llamada
+                utils_reporte.generar_pdf(datos, imagenes=imagenes, motor=motor)
+                tiempos, buffer = medir(lambda: utils_reporte.generar_pdf(datos, imagenes=imagenes, motor=motor),
+                                        args.repeticiones)
+                media = sum(tiempos) / len(tiempos) * 1000
+                print(f"{motor:<10}{formato + '/' + perfil:<18}{tiempos_img[0] * 1000:>14.0f}{media:>16.0f}"
+                      f"{min(tiempos) * 1000:>10.0f}{len(buffer.getvalue()) / 1024:>13.0f}")
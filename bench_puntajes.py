@@ -0,0 +1,175 @@
+"""
+Benchmark del flujo de puntajes y reportes sobre respuestas sintéticas.
+
+Uso:
+    python bench_puntajes.py [--evaluados 200] [--evaluadores 8] [--preguntas 40] [--respuestas texto|numero]
+    python bench_puntajes.py --mezcla "Colegas:4/Subordinados:2/Jefe Inmediato:1/Autoevaluación:1"
+    python bench_puntajes.py --json puntajes.json                 # guardar resultados
+    python bench_puntajes.py --referencia puntajes.json           # comparar contra una corrida anterior
+    python bench_puntajes.py --etapas convertir_likert score       # solo algunas etapas
+
+Las respuestas se generan con datos_sinteticos (sin acceso a Google). Etapas:
+convertir_likert, detectar_columnas, preparar_dataset (columnas de competencias y
+promedios de la empresa), score, calcular_datos_dashboard (score + figuras Plotly;
+importa app.py con DATOS_SINTETICOS), escenarios (barrido de la rejilla de ponderaciones
+en pasos de 5%, sin caché), graficas (Matplotlib), pdf y docx. Cada etapa se calienta una
+vez antes de medirse.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import datos_evaluacion
+import datos_sinteticos
+import escenarios
+
+ETAPAS = ['convertir_likert', 'detectar_columnas', 'preparar_dataset', 'score', 'calcular_datos_dashboard',
+          'escenarios', 'graficas', 'pdf', 'docx']
+PESOS = list(datos_evaluacion.PONDERACIONES_DEFAULT.values())
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta `funcion` una vez de calentamiento y `repeticiones` veces más; retorna los tiempos en segundos."""
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def _texto_parametros(parametros):
+    partes = [f'{k}={v}' for k, v in parametros.items() if k != 'mezcla']
+    if parametros.get('mezcla'):
+        partes.append('mezcla=' + '/'.join(f'{g}:{p:g}' for g, p in parametros['mezcla'].items()))
+    return ','.join(partes)
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(parametros, etapas, repeticiones, muestra=20):
+    """Mide cada etapa; retorna {etapa: resultado}. `score` y el dashboard se promedian sobre `muestra` evaluados."""
+    crudo = datos_sinteticos.generar_respuestas(**parametros)
+    convertido = datos_evaluacion.convertir_likert(crudo)
+    dataset = datos_evaluacion.desde_dataframe(convertido)
+    evaluados = dataset.evaluados[:muestra]
+    datos = datos_evaluacion.score(dataset, evaluados[0], *PESOS)
+
+    def por_evaluado(funcion):
+        return lambda: [funcion(e) for e in evaluados]
+
+    funciones = {
+        'convertir_likert': lambda: datos_evaluacion.convertir_likert(crudo),
+        'detectar_columnas': lambda: datos_evaluacion.detectar_columnas(convertido),
+        'preparar_dataset': lambda: datos_evaluacion.desde_dataframe(convertido),
+        'score': por_evaluado(lambda e: datos_evaluacion.score(dataset, e, *PESOS)),
+        'escenarios': lambda: escenarios.Barrido(*escenarios.agregados_grupo(dataset),
+                                                 escenarios.rejilla(5).to_numpy(dtype=float), PESOS),
+    }
+    if 'calcular_datos_dashboard' in etapas:
+        # app.py carga los datos al importarse: se le pasan las mismas respuestas sintéticas
+        datos_evaluacion.DATOS_SINTETICOS = _texto_parametros(parametros)
+        os.environ.setdefault('REPORTES_DIR', tempfile.mkdtemp(prefix='bench_puntajes_'))
+        import app
+        funciones['calcular_datos_dashboard'] = por_evaluado(lambda e: app.calcular_datos_dashboard(e, *PESOS))
+    if {'graficas', 'pdf', 'docx'} & set(etapas):
+        import utils_reporte
+        imagenes = utils_reporte.generar_imagenes_matplotlib(datos)
+        funciones['graficas'] = lambda: utils_reporte.generar_imagenes_matplotlib(datos)
+        funciones['pdf'] = lambda: utils_reporte.generar_pdf(datos, imagenes=imagenes)
+        funciones['docx'] = lambda: utils_reporte.generar_word(datos, imagenes=imagenes)
+
+    resultados = {}
+    for etapa in etapas:
+        tiempos = medir(funciones[etapa], repeticiones)
+        # Las etapas por evaluado se reportan por llamada
+        divisor = len(evaluados) if etapa in ('score', 'calcular_datos_dashboard') else 1
+        resultados[etapa] = {
+            'mediana_ms': statistics.median(tiempos) / divisor * 1000,
+            'min_ms': min(tiempos) / divisor * 1000,
+            'media_ms': statistics.mean(tiempos) / divisor * 1000,
+            'repeticiones': repeticiones,
+        }
+    return resultados
+
+
+def comparar(resultados, referencia, tolerancia):
+    """Imprime la variación contra una corrida anterior; retorna las etapas que empeoraron más de la tolerancia."""
+    regresiones = []
+    print(f"\n{'Etapa':<26}{'antes (ms)':>12}{'ahora (ms)':>12}{'cambio':>10}")
+    for etapa, actual in resultados.items():
+        anterior = referencia.get(etapa)
+        if anterior is None:
+            continue
+        cambio = actual['mediana_ms'] / anterior['mediana_ms'] - 1 if anterior['mediana_ms'] else 0.0
+        marca = '  <-- regresión' if cambio > tolerancia else ''
+        print(f"{etapa:<26}{anterior['mediana_ms']:>12.1f}{actual['mediana_ms']:>12.1f}{cambio:>+10.0%}{marca}")
+        if cambio > tolerancia:
+            regresiones.append(etapa)
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el cálculo de puntajes y la generación de reportes.")
+    parser.add_argument('--evaluados', type=int, default=200)
+    parser.add_argument('--evaluadores', type=int, default=8, help="Respuestas por evaluado")
+    parser.add_argument('--preguntas', type=int, default=40, help="Preguntas de competencia")
+    parser.add_argument('--respuestas', choices=['texto', 'numero'], default='texto')
+    parser.add_argument('--mezcla', help="Proporción de relaciones, p. ej. 'Colegas:3/Subordinados:3/Jefe Inmediato:1'")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=ETAPAS)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--json', dest='salida_json', help="Guardar los resultados en este archivo JSON")
+    parser.add_argument('--referencia', help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Aumento relativo permitido contra la referencia (por defecto 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    parametros = {'evaluados': args.evaluados, 'evaluadores': args.evaluadores, 'preguntas': args.preguntas,
+                  'respuestas': args.respuestas, 'semilla': args.semilla}
+    if args.mezcla:
+        parametros['mezcla'] = datos_sinteticos.parametros_desde_texto(f'mezcla={args.mezcla}')['mezcla']
+
+    resultados = ejecutar(parametros, args.etapas, args.repeticiones)
+
+    print(f"Datos: {_texto_parametros(parametros)}")
+    print(f"{'Etapa':<26}{'mediana (ms)':>14}{'mín (ms)':>10}{'media (ms)':>12}")
+    for etapa, r in resultados.items():
+        print(f"{etapa:<26}{r['mediana_ms']:>14.1f}{r['min_ms']:>10.1f}{r['media_ms']:>12.1f}")
+
+    if args.salida_json:
+        salida = {
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'parametros': parametros,
+            'resultados': resultados,
+        }
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump(salida, f, indent=2, ensure_ascii=False)
+
+    if args.referencia:
+        with open(args.referencia, encoding='utf-8') as f:
+            referencia = json.load(f)
+        if referencia.get('parametros') != parametros:
+            print("Aviso: la referencia se midió con otros parámetros de datos:", referencia.get('parametros'))
+        if comparar(resultados, referencia['resultados'], args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Caché en disco de reportes ya generados.
+
+La clave combina evaluado, ponderaciones normalizadas, formato (con motor de
+PDF y formato/calidad de gráficas), versión de la plantilla del reporte y
+versión del dataset, de modo que cualquier cambio en los datos o en el diseño
+del reporte invalida las entradas anteriores. Las entradas se eliminan por
+antigüedad y, si el directorio excede el tamaño máximo, por menor uso reciente.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+
+import metricas
+import utils_reporte
+
+CACHE_MAX_MB = float(os.environ.get('REPORTES_CACHE_MB', '500'))
+CACHE_MAX_HORAS = float(os.environ.get('REPORTES_CACHE_HORAS', '24'))
+
+
+def normalizar_pesos(pesos):
+    """Pesos como fracciones del total (redondeadas) para que 5/18/30/47 y 10/36/60/94 coincidan."""
+    pesos = [float(p or 0) for p in pesos]
+    total = sum(pesos)
+    if total <= 0:
+        raise ValueError('Ponderaciones deben sumar > 0')
+    return [round(p / total, 6) for p in pesos]
+
+
+class CacheReportes:
+    """Archivos de reporte en disco indexados por clave, con desalojo por edad y tamaño."""
+
+    def __init__(self, directorio, max_bytes=CACHE_MAX_MB * 1024 * 1024, max_edad=CACHE_MAX_HORAS * 3600):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.max_edad = max_edad
+        os.makedirs(directorio, exist_ok=True)
+
+    def clave(self, evaluado, pesos, formato, version_datos):
+        """Clave estable de un reporte."""
+        partes = {
+            'evaluado': evaluado,
+            'pesos': normalizar_pesos(pesos),
+            'formato': formato,
+            'plantilla': utils_reporte.VERSION_PLANTILLA,
+            'motor': utils_reporte.MOTOR_PDF if formato == 'pdf' else None,
+            'graficas': [utils_reporte.FORMATO_GRAFICAS if formato == 'pdf' else 'png', utils_reporte.PERFIL_CALIDAD],
+            'datos': version_datos,
+        }
+        texto = json.dumps(partes, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def _ruta(self, clave, formato):
+        _, extension = utils_reporte.FORMATOS_REPORTE[formato]
+        return os.path.join(self.directorio, f"{clave}.{extension}")
+
+    def obtener(self, clave, formato):
+        """Ruta del reporte en caché, o None si no existe o expiró."""
+        ruta = self._ruta(clave, formato)
+        try:
+            edad = time.time() - os.path.getmtime(ruta)
+        except OSError:
+            metricas.CACHE.incrementar(cache='reportes', resultado='fallo')
+            return None
+        if edad > self.max_edad:
+            self._eliminar(ruta)
+            metricas.CACHE.incrementar(cache='reportes', resultado='fallo')
+            return None
+        metricas.CACHE.incrementar(cache='reportes', resultado='acierto')
+        # Marcar como usado recientemente (el desalojo por tamaño es LRU sobre atime)
+        os.utime(ruta, (time.time(), os.path.getmtime(ruta)))
+        return ruta
+
+    def archivo(self, nombre):
+        """Ruta de un archivo de la caché por su nombre ('<clave>.<ext>'), validando que no escape del directorio."""
+        extensiones = '|'.join(re.escape(ext) for _, ext in utils_reporte.FORMATOS_REPORTE.values())
+        if not re.fullmatch(rf'[0-9a-f]{{64}}\.({extensiones})', nombre):
+            return None
+        ruta = os.path.join(self.directorio, nombre)
+        return ruta if os.path.isfile(ruta) else None
+
+    def guardar(self, clave, formato, contenido):
+        """Guarda el reporte (escritura atómica) y aplica el desalojo. Retorna la ruta."""
+        ruta = self._ruta(clave, formato)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+        self.desalojar()
+        return ruta
+
+    def desalojar(self):
+        """Elimina entradas expiradas y, si se excede el tamaño máximo, las menos usadas."""
+        ahora = time.time()
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith('.tmp'):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                st = os.stat(ruta)
+            except OSError:
+                continue
+            if ahora - st.st_mtime > self.max_edad:
+                self._eliminar(ruta)
+            else:
+                entradas.append((st.st_atime, st.st_size, ruta))
+
+        total = sum(tam for _, tam, _ in entradas)
+        for _, tam, ruta in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            self._eliminar(ruta)
+            total -= tam
+
+    @staticmethod
+    def _eliminar(ruta):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
@@ -0,0 +1,226 @@
+"""
+Dataset convertido compartido entre procesos mediante archivos memory-mapped.
+
+Cada versión del dataset se publica en su propio directorio como arreglos
+NumPy (.npy) más un meta.json; el archivo ACTUAL apunta a la versión vigente.
+Los procesos abren los .npy con mmap_mode='r', de modo que el sistema
+operativo mantiene una sola copia en memoria (page cache) para todos los
+workers web, trabajadores de reportes y hosts que compartan el volumen.
+
+La huella de las respuestas crudas de cada versión se guarda en meta.json:
+`actualizar` (y `python dataset_compartido.py --cada 60`) vuelve a leer la fuente y
+solo convierte y publica cuando la huella cambió. Si la fuente cambió pero los datos
+convertidos no (la misma versión), se reescribe solo la huella de esa versión.
+
+Estructura:
+    <DATASET_DIR>/ACTUAL                         versión vigente
+    <DATASET_DIR>/<versión>/meta.json            columnas y catálogos de texto
+    <DATASET_DIR>/<versión>/puntajes.npy         filas x competencias (float64)
+    <DATASET_DIR>/<versión>/evaluado.npy         código del evaluado por fila (int32, -1 = vacío)
+    <DATASET_DIR>/<versión>/relacion.npy         código de la relación por fila (int32, -1 = vacío)
+    <DATASET_DIR>/<versión>/promedio_competencias.npy   promedio de la empresa por competencia
+    <DATASET_DIR>/<versión>/promedio_evaluados.npy      promedio general de cada evaluado
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+import almacenamiento
+import datos_evaluacion
+import historial
+import perfilado
+
+DATASET_DIR = os.environ.get('DATASET_DIR', os.path.join(almacenamiento.REPORTES_DIR, 'dataset'))
+DATASET_REVISION_SEG = float(os.environ.get('DATASET_REVISION_SEG', '5'))
+VERSIONES_CONSERVADAS = 2
+
+
+class DatasetMapeado(datos_evaluacion.Dataset):
+    """Una versión publicada del dataset, abierta sin copiar los arreglos a memoria privada."""
+
+    def __init__(self, directorio, version):
+        ruta = os.path.join(directorio, version)
+        with open(os.path.join(ruta, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        def cargar(nombre):
+            return np.load(os.path.join(ruta, f'{nombre}.npy'), mmap_mode='r')
+
+        comp_cols = meta['comp_cols']
+        # Las competencias son una vista del memory-map (un solo bloque float64); solo las
+        # columnas de texto (referencias a los catálogos) ocupan memoria propia del proceso.
+        df = pd.DataFrame(cargar('puntajes'), columns=comp_cols, copy=False)
+        df[meta['col_evaluado']] = _decodificar(cargar('evaluado'), meta['evaluados'])
+        df[meta['col_relacion']] = _decodificar(cargar('relacion'), meta['relaciones'])
+        super().__init__(
+            df, meta['col_evaluado'], meta['col_relacion'], comp_cols, version,
+            promedio_competencias=pd.Series(cargar('promedio_competencias'), index=comp_cols, copy=False),
+            promedio_evaluados=pd.Series(cargar('promedio_evaluados'), index=meta['evaluados_promediados'], copy=False),
+            huella=meta.get('huella'), normalizacion=meta.get('normalizacion'),
+        )
+
+
+def _codificar(serie):
+    codigos, categorias = pd.factorize(serie)
+    return codigos.astype(np.int32), categorias.tolist()
+
+
+def _decodificar(codigos, categorias):
+    return pd.Categorical.from_codes(np.asarray(codigos), categories=categorias).astype(object)
+
+
+def version_actual(directorio=DATASET_DIR):
+    """Versión vigente publicada, o None si todavía no hay ninguna."""
+    try:
+        with open(os.path.join(directorio, 'ACTUAL'), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+@perfilado.perfilar('publicar_dataset')
+def publicar(dataset, directorio=DATASET_DIR):
+    """Escribe el dataset como nueva versión (si no existe ya), la marca como vigente y retorna la versión."""
+    version = dataset.version
+    ruta = os.path.join(directorio, version)
+    if os.path.isdir(ruta):
+        _actualizar_huella(ruta, dataset.huella)
+    else:
+        temporal = f'{ruta}.{os.getpid()}.tmp'
+        os.makedirs(temporal, exist_ok=True)
+
+        df, comp_cols = dataset.df, dataset.comp_cols
+        puntajes = np.ascontiguousarray(df[comp_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64))
+        evaluado, evaluados = _codificar(df[dataset.col_evaluado])
+        relacion, relaciones = _codificar(df[dataset.col_relacion])
+
+        np.save(os.path.join(temporal, 'puntajes.npy'), puntajes)
+        np.save(os.path.join(temporal, 'evaluado.npy'), evaluado)
+        np.save(os.path.join(temporal, 'relacion.npy'), relacion)
+        np.save(os.path.join(temporal, 'promedio_competencias.npy'),
+                dataset.promedio_competencias.to_numpy(dtype=np.float64))
+        np.save(os.path.join(temporal, 'promedio_evaluados.npy'), dataset.promedio_evaluados.to_numpy(dtype=np.float64))
+        meta = {
+            'version': version,
+            'col_evaluado': dataset.col_evaluado,
+            'col_relacion': dataset.col_relacion,
+            'comp_cols': list(comp_cols),
+            'evaluados': evaluados,
+            'relaciones': relaciones,
+            'evaluados_promediados': dataset.promedio_evaluados.index.tolist(),
+            'huella': dataset.huella,
+            'normalizacion': dataset.normalizacion,
+        }
+        with open(os.path.join(temporal, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        try:
+            os.rename(temporal, ruta)
+        except OSError:
+            # Otro proceso publicó la misma versión al mismo tiempo
+            shutil.rmtree(temporal, ignore_errors=True)
+            _actualizar_huella(ruta, dataset.huella)
+
+    if version_actual(directorio) != version:
+        puntero = os.path.join(directorio, f'ACTUAL.{os.getpid()}.tmp')
+        with open(puntero, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(puntero, os.path.join(directorio, 'ACTUAL'))
+        _limpiar_versiones(directorio, version)
+    return version
+
+
+def _actualizar_huella(ruta, huella):
+    """Reescribe la huella de una versión ya publicada cuando cambió la fuente pero no los datos convertidos.
+
+    Sin esto, cada `actualizar` compararía contra la huella vieja y volvería a convertir todo.
+    """
+    archivo = os.path.join(ruta, 'meta.json')
+    with open(archivo, encoding='utf-8') as f:
+        meta = json.load(f)
+    if huella is None or meta.get('huella') == huella:
+        return
+    meta['huella'] = huella
+    temporal = f'{archivo}.{os.getpid()}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(temporal, archivo)
+
+
+def _limpiar_versiones(directorio, vigente):
+    """Elimina versiones viejas (se conservan la vigente y la anterior)."""
+    versiones = [
+        os.path.join(directorio, v) for v in os.listdir(directorio)
+        if v != vigente and os.path.isdir(os.path.join(directorio, v)) and not v.endswith('.tmp')
+    ]
+    versiones.sort(key=os.path.getmtime, reverse=True)
+    # En Linux los procesos que aún mapean una versión borrada la siguen leyendo sin problema;
+    # en Windows el borrado falla mientras esté abierta y se reintenta en la siguiente publicación.
+    for ruta in versiones[VERSIONES_CONSERVADAS - 1:]:
+        shutil.rmtree(ruta, ignore_errors=True)
+
+
+@perfilado.perfilar('abrir_dataset')
+def abrir(version=None, directorio=DATASET_DIR):
+    """Abre una versión publicada (por defecto, la vigente)."""
+    version = version or version_actual(directorio)
+    if version is None:
+        raise FileNotFoundError(f"No hay un dataset publicado en '{directorio}'")
+    return DatasetMapeado(directorio, version)
+
+
+_vigente = None
+_ultima_revision = 0.0
+
+
+def vigente(directorio=DATASET_DIR):
+    """Dataset vigente, abierto una vez por proceso y renovado cuando se publica otra versión.
+
+    Revisa el puntero como máximo cada DATASET_REVISION_SEG segundos. Si todavía no hay
+    ninguna versión publicada, carga la hoja (datos_evaluacion.load) y la publica.
+    """
+    global _vigente, _ultima_revision
+    if _vigente is not None and time.time() - _ultima_revision < DATASET_REVISION_SEG:
+        return _vigente
+    _ultima_revision = time.time()
+    version = version_actual(directorio) or publicar(datos_evaluacion.load(), directorio)
+    if _vigente is None or _vigente.version != version:
+        _vigente = abrir(version, directorio)
+    return _vigente
+
+
+def actualizar(directorio=DATASET_DIR):
+    """Lee la fuente y publica una versión nueva solo si las respuestas crudas cambiaron.
+
+    Retorna el dataset cargado: la versión vigente (sin reprocesar) si la huella coincide.
+    Con datos nuevos también actualiza el historial de ciclos (historial.py).
+    """
+    try:
+        previo = abrir(directorio=directorio)
+    except (OSError, ValueError, KeyError):
+        previo = None
+    if not historial.existe():
+        # La versión publicada no conserva marcas temporales: el historial se arma desde la fuente
+        previo = None
+    dataset = datos_evaluacion.load(previo=previo)
+    if dataset is not previo and dataset.col_evaluado and dataset.col_relacion:
+        historial.actualizar(dataset)
+        publicar(dataset, directorio)
+    return dataset
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Publica el dataset si cambiaron las respuestas de la fuente.")
+    parser.add_argument('--cada', type=float, help="Revisar la fuente cada N segundos (por defecto, una sola vez)")
+    parser.add_argument('--directorio', default=DATASET_DIR, help="Directorio del dataset compartido")
+    args = parser.parse_args()
+
+    while True:
+        print(f"Versión vigente: {actualizar(args.directorio).version}")
+        if not args.cada:
+            break
+        time.sleep(args.cada)
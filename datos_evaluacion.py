@@ -0,0 +1,932 @@
+"""
+Capa de datos y puntajes de la evaluación 360°, independiente del dashboard.
+
+Carga las respuestas (hoja de Google u otra fuente, ver fuentes_datos), convierte
+la escala Likert, detecta las columnas clave y calcula los puntajes de un
+evaluado sin importar Dash ni Plotly, de modo que trabajos por lotes, benchmarks
+y scripts de depuración no pagan el arranque de la aplicación web.
+
+Uso:
+    import datos_evaluacion
+    dataset = datos_evaluacion.load()
+    datos = datos_evaluacion.score(dataset, 'Nombre del evaluado', 5, 18, 30, 47)
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import fuentes_datos
+import metricas
+import perfilado
+
+# Configuración por defecto
+DEFAULT_SHEET_ID = "16wSqQKJiYZBbmgBNg4Wzi1mvCx5laEncsL5npXzH1Po"
+SHEET_NAME_TEXT = "Respuestas de formulario 1"
+SHEET_NAME_NUM = "Respuestas de formulario 1"
+
+SHEET_ID = os.environ.get('SHEET_ID', DEFAULT_SHEET_ID)
+SHEET_GID = os.environ.get('SHEET_GID')
+
+# Origen de las respuestas (ver fuentes_datos): google, csv, parquet, sqlite o sintetico
+DATOS_FUENTE = os.environ.get('DATOS_FUENTE', 'google')
+DATOS_RUTA = os.environ.get('DATOS_RUTA')
+DATOS_TABLA = os.environ.get('DATOS_TABLA', 'respuestas')
+# Respuestas sintéticas en lugar de la hoja (benchmarks y pruebas de carga sin acceso a Google),
+# p. ej. "evaluados=200,evaluadores=8,preguntas=40" (ver datos_sinteticos.parametros_desde_texto)
+DATOS_SINTETICOS = os.environ.get('DATOS_SINTETICOS')
+# Carga por bloques con memoria acotada (ver cargar_por_bloques): filas por bloque, 0 = todo de una vez
+DATOS_BLOQUE_FILAS = int(os.environ.get('DATOS_BLOQUE_FILAS', '0'))
+# Base SQLite donde la carga por bloques guarda las respuestas abiertas (opcional; sin ella se descartan)
+DATOS_TEXTOS = os.environ.get('DATOS_TEXTOS')
+
+# Columna con la etiqueta del ciclo de evaluación (opcional; ver historial.py). Sin definirla se
+# busca una columna 'Ciclo' o 'Periodo'
+CICLOS_COLUMNA = os.environ.get('CICLOS_COLUMNA')
+
+# Corrección del sesgo de cada evaluador (indulgente o severo; ver normalizacion.py): '' sin corrección,
+# 'aditiva' (resta el sesgo) o 'z' (además iguala la dispersión de cada evaluador a la global)
+NORMALIZACION_EVALUADORES = os.environ.get('NORMALIZACION_EVALUADORES', '')
+# Peso (en respuestas) de los valores globales al estimar la media y la dispersión de cada evaluador
+NORMALIZACION_PREVIA = float(os.environ.get('NORMALIZACION_PREVIA', '40'))
+
+# Intervalos de confianza bootstrap de los puntajes (ver intervalos_confianza)
+BOOTSTRAP_REMUESTREOS = int(os.environ.get('BOOTSTRAP_REMUESTREOS', '1000'))
+NIVEL_CONFIANZA = 0.95
+
+# Se mezcla en la huella de las respuestas crudas: incrementarlo cuando cambie la conversión o
+# la detección de columnas, para que los datos ya procesados se vuelvan a procesar
+VERSION_PROCESO = 1
+
+# Preguntas abiertas del formulario
+COLUMNAS_TEXTO_LIBRE = [
+    '¿Cuáles son las 2 o 3 principales fortalezas que observas en este colaborador?',
+    '¿Cuáles son las 2 o 3 principales áreas de oportunidad (a mejorar) que sugieres para este colaborador?',
+    'Comentarios adicionales (opcional)',
+]
+
+# Columnas del formulario que no intervienen en los puntajes (texto libre y nombre del evaluador):
+# no se leen de la fuente
+COLUMNAS_NO_USADAS = ['Nombre Completo:'] + COLUMNAS_TEXTO_LIBRE
+
+# Mapeo de respuestas textuales a escala numérica (1-5)
+LIKERT_MAP = {
+    'muy en desacuerdo': 1,
+    'en desacuerdo': 2,
+    'neutral': 3,
+    'de acuerdo': 4,
+    'totalmente de acuerdo': 5,
+}
+
+# Categorías que definen el potencial en la matriz 9-Box
+CATEGORIAS_POTENCIAL = ['Liderazgo', 'Innovación y Creatividad', 'Toma de Decisiones']
+
+# Ponderaciones por defecto (%) de cada grupo de evaluadores
+PONDERACIONES_DEFAULT = {
+    'Autoevaluación': 5,
+    'Jefe Inmediato': 18,
+    'Colegas': 30,
+    'Subordinados': 47,
+}
+
+
+# Utilidad: normalizar texto
+def normalize_text(s):
+    if s is None:
+        return ''
+    s = str(s)
+    s = s.strip().lower()
+    # quitar tildes
+    s = ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
+    return s
+
+
+# Función que convierte respuestas textuales a números usando LIKERT_MAP
+@metricas.FASES.cronometrar(fase='conversion_likert')
+def convertir_likert(df):
+    df_conv = df.copy()
+    for col in df_conv.columns:
+        # intentar mapear valores textuales
+        if df_conv[col].dtype == object:
+            def map_val(v):
+                if pd.isna(v):
+                    return v
+                s = str(v).strip()
+                # normalizar texto (quitar tildes y pasar a minúsculas)
+                s_norm = ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c)).lower()
+                # intentar mapear texto Likert
+                mapped = LIKERT_MAP.get(s_norm)
+                if mapped is not None:
+                    return mapped
+                # intentar convertir a número si es posible
+                try:
+                    num = float(s)
+                    return num
+                except Exception:
+                    return s
+
+            df_conv[col] = df_conv[col].map(map_val)
+    # intentar convertir columnas a numéricas donde tenga sentido
+    for col in df_conv.columns:
+        try:
+            numeric = pd.to_numeric(df_conv[col], errors='coerce')
+            # si la conversión produjo al menos algún valor numérico, usarlo
+            if numeric.notna().sum() > 0:
+                df_conv[col] = numeric
+        except Exception:
+            pass
+    return df_conv
+
+
+# Función para extraer solo las columnas de competencias (numéricas)
+def columnas_competencias(df, exclude_cols):
+    cols = [c for c in df.columns if c not in exclude_cols]
+    numeric_cols = []
+    for c in cols:
+        # intentar convertir a numeric (sin modificar df)
+        try:
+            series = pd.to_numeric(df[c], errors='coerce')
+            # si no todo es NaN, consideramos la columna como numérica
+            if series.notna().sum() > 0:
+                numeric_cols.append(c)
+        except Exception:
+            pass
+    return numeric_cols
+
+
+_NO_USADAS = {normalize_text(c) for c in COLUMNAS_NO_USADAS}
+_TEXTO_LIBRE = {normalize_text(c) for c in COLUMNAS_TEXTO_LIBRE}
+# Columnas que identifican a quien responde (solo se leen con NORMALIZACION_EVALUADORES)
+_EVALUADOR = ['nombre completo:', 'nombre completo', 'nombre del evaluador', 'evaluador',
+              'direccion de correo electronico', 'correo electronico']
+
+
+def columna_necesaria(nombre):
+    """True si la columna se usa en los puntajes (proyección al leer la fuente)."""
+    clave = normalize_text(nombre)
+    if clave in _EVALUADOR:
+        return bool(NORMALIZACION_EVALUADORES)
+    return clave not in _NO_USADAS
+
+
+def fuente_configurada(sheet_id=SHEET_ID, creds_path='credentials.json'):
+    """Fuente de datos según DATOS_FUENTE (DATOS_SINTETICOS, si se define, tiene prioridad)."""
+    tipo = 'sintetico' if DATOS_SINTETICOS is not None else DATOS_FUENTE
+    return fuentes_datos.crear(tipo, sheet_id=sheet_id, creds_path=creds_path, ruta=DATOS_RUTA, tabla=DATOS_TABLA,
+                               sinteticos=DATOS_SINTETICOS)
+
+
+def leer_respuestas(sheet_id=SHEET_ID, creds_path='credentials.json', fuente=None):
+    """Respuestas crudas de la fuente (sin convertir), solo con las columnas que usan los puntajes."""
+    fuente = fuente or fuente_configurada(sheet_id, creds_path)
+
+    # Carga de las dos pestañas en paralelo (las fuentes de archivo tienen una sola tabla)
+    hojas = [SHEET_NAME_TEXT, SHEET_NAME_NUM] if fuente.multiples_hojas else [SHEET_NAME_TEXT]
+    leidas = fuente.leer_varias(hojas, columnas=columna_necesaria)
+
+    df_text = leidas[SHEET_NAME_TEXT]
+    if isinstance(df_text, Exception):
+        print('No pudo cargarse la pestaña de respuestas textuales:', df_text)
+        df_text = pd.DataFrame()
+    df_num = leidas.get(SHEET_NAME_NUM, pd.DataFrame())
+    if isinstance(df_num, Exception):
+        print('No pudo cargarse la pestaña numérica:', df_num)
+        df_num = pd.DataFrame()
+
+    # Preferir la pestaña numérica ('Base de Datos Limpia'); si está vacía, usar la textual
+    return df_num if not df_num.empty else df_text
+
+
+def cargar_datos(sheet_id=SHEET_ID, creds_path='credentials.json', fuente=None):
+    """Lee las respuestas de la fuente y retorna el DataFrame convertido a escala numérica."""
+    return _convertir(leer_respuestas(sheet_id, creds_path, fuente))
+
+
+def _convertir(crudo):
+    # convertir_likert se aplica también a la pestaña numérica por si quedan respuestas en texto.
+    # Copia consolidada (un bloque contiguo por tipo de dato), sin referencias a los originales
+    return convertir_likert(crudo).copy()
+
+
+@metricas.FASES.cronometrar(fase='huella_cruda')
+def calcular_huella(df):
+    """Huella de las respuestas crudas: si no cambia, tampoco cambia nada de lo que se deriva de ellas."""
+    huella = _huella_inicial(df.columns)
+    huella.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return huella.hexdigest()[:16]
+
+
+def _huella_inicial(columnas):
+    # Las filas se agregan después (una vez o bloque a bloque, con el mismo resultado). El modo de
+    # normalización y su previa cambian los puntajes derivados, así que también forman parte de la huella
+    proceso = VERSION_PROCESO
+    if NORMALIZACION_EVALUADORES:
+        proceso = f'{proceso}:{NORMALIZACION_EVALUADORES}:{NORMALIZACION_PREVIA:g}'
+    return hashlib.sha256(f"{proceso}|{'|'.join(map(str, columnas))}|".encode('utf-8'))
+
+
+def _hojas_bloques(fuente):
+    return dict.fromkeys([SHEET_NAME_NUM, SHEET_NAME_TEXT]) if fuente.multiples_hojas else [SHEET_NAME_TEXT]
+
+
+@metricas.FASES.cronometrar(fase='huella_cruda')
+def huella_por_bloques(fuente, filas=50000):
+    """Huella de las respuestas crudas leídas bloque a bloque, sin convertirlas (la misma que calcular_huella).
+
+    Solo se leen las columnas que usan los puntajes: editar una pregunta abierta no cambia la huella.
+    """
+    for hoja in _hojas_bloques(fuente):
+        huella = None
+        try:
+            for bloque in fuente.leer_bloques(hoja, columnas=columna_necesaria, filas=filas):
+                if huella is None:
+                    huella = _huella_inicial(bloque.columns)
+                huella.update(pd.util.hash_pandas_object(bloque, index=False).values.tobytes())
+        except Exception as e:
+            print(f"No pudo leerse la pestaña '{hoja}' por bloques:", e)
+            continue
+        if huella is not None:
+            return huella.hexdigest()[:16]
+    return calcular_huella(pd.DataFrame())
+
+
+@metricas.FASES.cronometrar(fase='carga_bloques')
+def cargar_por_bloques(fuente, filas=50000, textos=None):
+    """Lee, convierte y compacta las respuestas bloque a bloque; retorna (DataFrame convertido, huella cruda).
+
+    Cada bloque se convierte a la escala numérica y se reduce a una matriz float64 (competencias)
+    y códigos categóricos (evaluado y relación) antes de leer el siguiente, de modo que el pico de
+    memoria no depende de cuántos años de respuestas tenga la hoja. Con `textos` (ruta de una base
+    SQLite) las preguntas abiertas se guardan en su tabla 'textos' en lugar de descartarse; no forman
+    parte de la huella, igual que en la carga completa.
+    """
+    def seleccion(nombre):
+        return columna_necesaria(nombre) or (bool(textos) and normalize_text(nombre) in _TEXTO_LIBRE)
+
+    conexion = sqlite3.connect(textos) if textos else None
+
+    try:
+        for hoja in _hojas_bloques(fuente):
+            huella, orden, metadatos, matrices, categoricas = None, [], [], [], {}
+            try:
+                for bloque in fuente.leer_bloques(hoja, columnas=seleccion, filas=filas):
+                    if huella is None:
+                        metadatos = [c for c in (*detectar_columnas(bloque), detectar_columna_ciclo(bloque),
+                                                 detectar_columna_evaluador(bloque)) if c is not None]
+                        texto_libre = [c for c in bloque.columns if normalize_text(c) in _TEXTO_LIBRE]
+                        orden = [c for c in bloque.columns if c not in texto_libre]
+                        numericas = [c for c in orden if c not in metadatos]
+                        categoricas = {c: [] for c in metadatos}
+                        huella = _huella_inicial(orden)
+                    huella.update(pd.util.hash_pandas_object(bloque[orden], index=False).values.tobytes())
+                    if conexion is not None and texto_libre:
+                        _guardar_textos(conexion, bloque, metadatos, texto_libre, primero=not matrices)
+
+                    convertido = convertir_likert(bloque[orden])
+                    matrices.append(convertido[numericas].apply(pd.to_numeric, errors='coerce')
+                                    .to_numpy(dtype=np.float64))
+                    for c in metadatos:
+                        categoricas[c].append(pd.Categorical(convertido[c].astype(object)))
+            except Exception as e:
+                print(f"No pudo cargarse la pestaña '{hoja}' por bloques:", e)
+                continue
+            if matrices:
+                break
+        else:
+            return pd.DataFrame(), calcular_huella(pd.DataFrame())
+    finally:
+        if conexion is not None:
+            conexion.close()
+
+    if textos:
+        _publicar_textos(textos)
+    matriz = np.concatenate(matrices)
+    del matrices
+    # Las columnas sin ningún valor numérico no son competencias (igual que en columnas_competencias)
+    con_datos = ~np.isnan(matriz).all(axis=0)
+    if not con_datos.all():
+        matriz = matriz[:, con_datos]
+        numericas = [c for c, usar in zip(numericas, con_datos) if usar]
+    df = pd.DataFrame(matriz, columns=numericas, copy=False)
+    # Evaluado, relación y demás metadatos: referencias a un catálogo de textos (sin una cadena por fila)
+    for c in [c for c in orden if c in metadatos]:
+        valores = pd.api.types.union_categoricals(categoricas.pop(c), ignore_order=True)
+        df.insert([x for x in orden if x in metadatos or x in numericas].index(c), c, valores.astype(object))
+    print(f"Cargadas por bloques: {len(df)} filas, {len(numericas)} competencias")
+    return df, huella.hexdigest()[:16]
+
+
+def _guardar_textos(conexion, bloque, metadatos, texto_libre, primero):
+    # Se escribe en una tabla temporal que reemplaza a 'textos' al terminar la carga
+    bloque[metadatos + texto_libre].to_sql('textos_carga', conexion, if_exists='replace' if primero else 'append',
+                                           index=False)
+
+
+def _publicar_textos(ruta):
+    with sqlite3.connect(ruta) as conexion:
+        if conexion.execute("SELECT 1 FROM sqlite_master WHERE name = 'textos_carga'").fetchone():
+            conexion.execute('DROP TABLE IF EXISTS textos')
+            conexion.execute('ALTER TABLE textos_carga RENAME TO textos')
+
+
+def leer_textos(evaluado, ruta=DATOS_TEXTOS):
+    """Respuestas abiertas de un evaluado guardadas por la carga por bloques (DataFrame vacío si no hay)."""
+    if not ruta or not os.path.exists(ruta):
+        return pd.DataFrame()
+    with sqlite3.connect(ruta) as conexion:
+        columnas = [fila[1] for fila in conexion.execute('PRAGMA table_info(textos)')]
+        col_evaluado = detectar_columnas(pd.DataFrame(columns=columnas))[0]
+        if col_evaluado is None:
+            return pd.DataFrame()
+        return pd.read_sql_query(f'SELECT * FROM textos WHERE "{col_evaluado}" = ?', conexion, params=[evaluado])
+
+
+def detectar_columnas(df):
+    """Retorna (col_evaluado, col_relacion, col_timestamp) detectadas por nombre (None si no existen)."""
+    # Normalizar nombres de columnas y encontrar columnas clave
+    cols_map = {normalize_text(c): c for c in df.columns}
+    # candidatos para buscar
+    candidatos = {
+        'evaluado': ['nombre del colaborador evaluado', 'evaluado', 'nombre colaborador evaluado'],
+        'relacion': ['cual es tu relacion con el evaluado', 'cual es tu relacion con el evaluado?',
+                     'relacion con el evaluado', 'relacion'],
+        'timestamp': ['marca temporal', 'timestamp', 'fecha']
+    }
+
+    col_evaluado = None
+    col_relacion = None
+    col_timestamp = None
+    for key, variants in candidatos.items():
+        for v in variants:
+            norm = normalize_text(v)
+            if norm in cols_map:
+                if key == 'evaluado':
+                    col_evaluado = cols_map[norm]
+                elif key == 'relacion':
+                    col_relacion = cols_map[norm]
+                elif key == 'timestamp':
+                    col_timestamp = cols_map[norm]
+                break
+
+    # Si no encontramos, intentar heurística por búsqueda parcial
+    if col_evaluado is None:
+        for k_norm, orig in cols_map.items():
+            if 'evaluado' in k_norm or 'colaborador evaluado' in k_norm:
+                col_evaluado = orig
+                break
+    if col_relacion is None:
+        for k_norm, orig in cols_map.items():
+            if 'relacion' in k_norm or 'relaci' in k_norm:
+                col_relacion = orig
+                break
+    if col_timestamp is None:
+        for k_norm, orig in cols_map.items():
+            if 'marca' in k_norm or 'timestamp' in k_norm or 'fecha' in k_norm:
+                col_timestamp = orig
+                break
+
+    return col_evaluado, col_relacion, col_timestamp
+
+
+def detectar_columna_ciclo(df):
+    """Columna con la etiqueta del ciclo de evaluación (CICLOS_COLUMNA, 'Ciclo' o 'Periodo'), o None."""
+    if CICLOS_COLUMNA:
+        return CICLOS_COLUMNA if CICLOS_COLUMNA in df.columns else None
+    cols_map = {normalize_text(c): c for c in df.columns}
+    return next((cols_map[c] for c in ('ciclo', 'ciclo de evaluacion', 'periodo', 'periodo de evaluacion')
+                 if c in cols_map), None)
+
+
+def detectar_columna_evaluador(df):
+    """Columna que identifica a quien responde (nombre o correo del evaluador), o None."""
+    cols_map = {normalize_text(c): c for c in df.columns}
+    return next((cols_map[c] for c in _EVALUADOR if c in cols_map), None)
+
+
+@metricas.FASES.cronometrar(fase='version_datos')
+def calcular_version(df):
+    """Huella del contenido convertido: cambia cuando cambian los datos (invalida los reportes en caché)."""
+    version = hashlib.sha256()
+    # Por bloques de filas: el texto de cada celda solo existe para un bloque a la vez (mismo resultado)
+    for inicio in range(0, len(df), 5000):
+        version.update(pd.util.hash_pandas_object(df.iloc[inicio:inicio + 5000].astype(str), index=False)
+                       .values.tobytes())
+    version.update('|'.join(map(str, df.columns)).encode('utf-8'))
+    return version.hexdigest()[:16]
+
+
+# --- CATEGORIZACIÓN MEJORADA DE COMPETENCIAS ---
+def categorizar_competencias_detallado(competencias):
+    """
+    Agrupa las competencias en categorías específicas de habilidades
+    """
+    categorias = {
+        'Trabajo en Equipo': [],
+        'Comunicación': [],
+        'Liderazgo': [],
+        'Toma de Decisiones': [],
+        'Planeación': [],
+        'Manejo de Recursos': [],
+        'Capacidad de Negociación': [],
+        'Innovación y Creatividad': [],
+        'Gestión del Tiempo': [],
+        'Calidad y Resultados': []
+    }
+
+    for comp in competencias:
+        comp_lower = comp.lower()
+
+        # Clasificación por palabras clave
+        if any(palabra in comp_lower for palabra in ['equipo', 'colabora', 'trabajo en equipo']):
+            categorias['Trabajo en Equipo'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['comunica', 'escucha', 'claridad', 'respeto']):
+            categorias['Comunicación'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['liderazgo', 'manejo de', 'gestiona', 'subordin']):
+            categorias['Liderazgo'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['decisiones', 'toma de']):
+            categorias['Toma de Decisiones'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['planeación', 'planea', 'junta', 'seguimiento']):
+            categorias['Planeación'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['recursos', 'manejo de', 'material']):
+            categorias['Manejo de Recursos'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['negociación', 'negocia', 'flexibilidad', 'retroalimentación']):
+            categorias['Capacidad de Negociación'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['innovadora', 'creatividad', 'idea', 'investiga', 'tendencia']):
+            categorias['Innovación y Creatividad'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['tiempo', 'cumple', 'programa', 'forma']):
+            categorias['Gestión del Tiempo'].append(comp)
+        elif any(palabra in comp_lower for palabra in ['calidad', 'valor', 'resultado', 'estándar', 'mejora']):
+            categorias['Calidad y Resultados'].append(comp)
+        else:
+            # Si no encaja, ponerla en la más genérica
+            categorias['Calidad y Resultados'].append(comp)
+
+    # Filtrar categorías vacías
+    return {k: v for k, v in categorias.items() if v}
+
+
+# --- Mapeo de Relaciones ---
+def relacion_a_grupo(relacion):
+    r = str(relacion).lower()
+    if 'auto' in r or 'autoevalu' in r:
+        return 'Autoevaluación'
+    if 'jefe' in r or 'supervisor' in r:
+        return 'Jefe Inmediato'
+    if 'subordin' in r:
+        return 'Subordinados'
+    # tratar 'par' y 'cliente' como colegas por defecto
+    if 'par' in r or 'compa' in r or 'cliente' in r:
+        return 'Colegas'
+    # fallback
+    return 'Otros'
+
+
+def grupos_relacion(relaciones):
+    """relacion_a_grupo de toda una columna (se evalúa una vez por valor distinto)."""
+    grupos = relaciones.map({r: relacion_a_grupo(r) for r in relaciones.dropna().unique()})
+    return grupos.where(relaciones.notna(), relacion_a_grupo(None))
+
+# Colores profesionales y armoniosos para las categorías
+colores_categorias = {
+    'Trabajo en Equipo': '#667eea',
+    'Comunicación': '#36d1dc',
+    'Liderazgo': '#f093fb',
+    'Toma de Decisiones': '#fa709a',
+    'Planeación': '#a8edea',
+    'Manejo de Recursos': '#ffd166',
+    'Capacidad de Negociación': '#9795f0',
+    'Innovación y Creatividad': '#fbc2eb',
+    'Gestión del Tiempo': '#38ef7d',
+    'Calidad y Resultados': '#4facfe'
+}
+
+
+class Dataset:
+    """Respuestas convertidas con sus columnas clave, categorías y agregados de la empresa."""
+
+    def __init__(self, df, col_evaluado, col_relacion, comp_cols, version,
+                 promedio_competencias=None, promedio_evaluados=None, huella=None, col_timestamp=None,
+                 col_ciclo=None, col_evaluador=None, normalizacion=None):
+        self.df = df
+        self.col_evaluado = col_evaluado
+        self.col_relacion = col_relacion
+        # Marca temporal, etiqueta de ciclo y evaluador (solo en el dataset recién cargado; ver
+        # historial.py y normalizacion.py)
+        self.col_timestamp = col_timestamp
+        self.col_ciclo = col_ciclo
+        self.col_evaluador = col_evaluador
+        # Corrección de sesgo de evaluadores aplicada a los puntajes (None = respuestas tal cual)
+        self.normalizacion = normalizacion
+        self.comp_cols = list(comp_cols)
+        self.version = version
+        # Huella de las respuestas crudas de las que se derivó (None si no se conoce)
+        self.huella = huella
+        self.categorias_comp = categorizar_competencias_detallado(self.comp_cols)
+        # Agregados de toda la empresa: promedio por competencia y promedio general de cada evaluado
+        if promedio_competencias is None:
+            promedio_competencias = df[self.comp_cols].mean()
+        if promedio_evaluados is None:
+            if col_evaluado:
+                promedio_evaluados = df.groupby(col_evaluado)[self.comp_cols].mean().mean(axis=1)
+            else:
+                promedio_evaluados = pd.Series(dtype=float)
+        self.promedio_competencias = promedio_competencias
+        self.promedio_evaluados = promedio_evaluados
+
+    @property
+    def evaluados(self):
+        """Nombres de los evaluados, ordenados."""
+        if self.col_evaluado and self.col_evaluado in self.df.columns:
+            return sorted(self.df[self.col_evaluado].dropna().unique())
+        return []
+
+
+@perfilado.perfilar('load')
+def load(sheet_id=SHEET_ID, creds_path='credentials.json', fuente=None, previo=None):
+    """Carga y prepara el dataset desde la fuente configurada (por defecto, la hoja de Google).
+
+    Si las respuestas crudas tienen la misma huella que `previo` (un Dataset cargado antes),
+    retorna `previo` sin volver a convertir ni detectar columnas.
+    """
+    if DATOS_BLOQUE_FILAS:
+        fuente = fuente or fuente_configurada(sheet_id, creds_path)
+        if previo is not None:
+            # Primera pasada solo para la huella: sin cambios no se convierte ni se reescriben los textos
+            huella = huella_por_bloques(fuente, DATOS_BLOQUE_FILAS)
+            if previo.huella == huella:
+                print(f"Respuestas sin cambios (huella {huella}): se reutiliza la versión {previo.version}")
+                return previo
+        df, huella = cargar_por_bloques(fuente, DATOS_BLOQUE_FILAS, DATOS_TEXTOS)
+        return _normalizar(desde_dataframe(df, huella))
+
+    crudo = leer_respuestas(sheet_id, creds_path, fuente)
+    huella = calcular_huella(crudo)
+    if previo is not None and previo.huella == huella:
+        print(f"Respuestas sin cambios (huella {huella}): se reutiliza la versión {previo.version}")
+        return previo
+    return _normalizar(desde_dataframe(_convertir(crudo), huella))
+
+
+def _normalizar(dataset):
+    if not NORMALIZACION_EVALUADORES:
+        return dataset
+    # Import diferido: normalizacion importa este módulo
+    import normalizacion
+    return normalizacion.aplicar(dataset, NORMALIZACION_EVALUADORES)
+
+
+def desde_dataframe(df, huella=None):
+    """Dataset a partir de respuestas ya convertidas (detecta columnas clave y de competencias)."""
+    col_evaluado, col_relacion, col_timestamp = detectar_columnas(df)
+    col_ciclo = detectar_columna_ciclo(df)
+    col_evaluador = detectar_columna_evaluador(df)
+
+    # Preparar lista de columnas a excluir (metadatos)
+    exclude_list = [col_timestamp, col_evaluado, col_relacion, col_ciclo, col_evaluador] + COLUMNAS_NO_USADAS
+    # algunos de esos nombres pueden no existir en df; filtrarlos
+    exclude_list = [c for c in exclude_list if c is not None and c in df.columns]
+
+    comp_cols = columnas_competencias(df, exclude_list)
+    return Dataset(df, col_evaluado, col_relacion, comp_cols, calcular_version(df), huella=huella,
+                   col_timestamp=col_timestamp if col_timestamp in df.columns else None, col_ciclo=col_ciclo,
+                   col_evaluador=col_evaluador)
+
+
+def score(dataset, evaluado, w_auto, w_jefe, w_colegas, w_sub):
+    """Puntajes, KPIs y diagnóstico de un evaluado con las ponderaciones (%) de cada grupo.
+
+    Retorna el dict que consumen el dashboard y los reportes (sin figuras), None si no hay
+    evaluado, o {'error': ...}.
+    """
+    if evaluado is None:
+        return None
+
+    # Ponderaciones
+    weights = {
+        'Autoevaluación': float(w_auto or 0),
+        'Jefe Inmediato': float(w_jefe or 0),
+        'Colegas': float(w_colegas or 0),
+        'Subordinados': float(w_sub or 0)
+    }
+    total = sum(weights.values())
+    if total <= 0:
+        return {'error': 'Ponderaciones deben sumar > 0'}
+
+    weights_norm = {k: v / total for k, v in weights.items()}
+    df = dataset.df
+    comp_cols = dataset.comp_cols
+    categorias_comp = dataset.categorias_comp
+
+    # Filtrar datos del evaluado
+    with metricas.FASES.medir(fase='filtro'):
+        df_eval = df[df[dataset.col_evaluado] == evaluado]
+        if df_eval.empty:
+            return {'error': 'Sin datos'}
+
+        df_eval = df_eval.copy()
+        df_eval['grupo_ponderacion'] = df_eval[dataset.col_relacion].map(relacion_a_grupo)
+
+    # Calcular promedios por grupo
+    with metricas.FASES.medir(fase='groupby'):
+        grupos = df_eval.groupby('grupo_ponderacion')[comp_cols].mean()
+
+        # Conteo de evaluadores
+        conteo_evaluadores = df_eval['grupo_ponderacion'].value_counts().to_dict()
+        total_evaluadores = len(df_eval)
+
+    # Calcular puntaje final por competencia
+    with metricas.FASES.medir(fase='ponderacion'):
+        final_por_comp = pd.Series(0.0, index=comp_cols)
+        for grupo, peso in weights_norm.items():
+            if grupo in grupos.index:
+                final_por_comp = final_por_comp + grupos.loc[grupo].astype(float).fillna(0) * peso
+
+        calificacion_final = final_por_comp.mean()
+
+        # Promedios por categoría
+        promedios_categorias = {}
+        for categoria, comps_cat in categorias_comp.items():
+            if comps_cat:
+                promedios_categorias[categoria] = final_por_comp[comps_cat].mean()
+
+        # Promedio global de la empresa por categoría (precalculado por competencia)
+        promedios_empresa_cat = []
+        if promedios_categorias:
+            for categoria, comps_cat in categorias_comp.items():
+                if comps_cat:
+                    promedios_empresa_cat.append(dataset.promedio_competencias[comps_cat].mean())
+
+    inicio_kpis = time.perf_counter()
+
+    # Matriz 9-Box
+    cats_presentes = [c for c in CATEGORIAS_POTENCIAL if c in promedios_categorias]
+    if cats_presentes:
+        potencial = sum([promedios_categorias.get(cat, 0) for cat in cats_presentes]) / len(cats_presentes)
+    else:
+        potencial = 0
+    desempeno = calificacion_final
+
+    # Determinar cuadrante
+    if desempeno >= 4.0 and potencial >= 4.0:
+        cuadrante = "ESTRELLA"
+        color_cuadrante = "#28a745"
+        descripcion_cuadrante = "Alto desempeño y alto potencial - Talento clave"
+        accion_rh = "Acción: Retener, desarrollar para posiciones de liderazgo senior"
+    elif desempeno >= 4.0 and potencial < 4.0:
+        cuadrante = "CONTRIBUIDOR SÓLIDO"
+        color_cuadrante = "#17a2b8"
+        descripcion_cuadrante = "Alto desempeño, potencial moderado - Experto técnico"
+        accion_rh = "Acción: Reconocer expertise, considerar roles especializados"
+    elif desempeno < 4.0 and potencial >= 4.0:
+        cuadrante = "TALENTO EMERGENTE"
+        color_cuadrante = "#ffc107"
+        descripcion_cuadrante = "Potencial alto, desempeño en desarrollo"
+        accion_rh = "Acción: Mentoring intensivo, asignar proyectos retadores"
+    else:
+        cuadrante = "EN DESARROLLO"
+        color_cuadrante = "#dc3545"
+        descripcion_cuadrante = "Requiere apoyo en desempeño y desarrollo"
+        accion_rh = "Acción: Plan de mejora de 90 días con seguimiento semanal"
+
+    # Textos y KPIs
+    categorias_bajas = [cat for cat, val in promedios_categorias.items() if val < 3.0]
+    categorias_criticas = [cat for cat, val in promedios_categorias.items() if val < 2.5]
+
+    if calificacion_final >= 4.5:
+        estado_aptitud = "SOBRESALIENTE"
+        color_aptitud = "#28a745"
+        mensaje_aptitud = "Desempeño excepcional en todas las competencias"
+        recomendacion_rh = "Talento clave - Considerar para roles de liderazgo estratégico"
+    elif calificacion_final >= 4.0 and not categorias_bajas:
+        estado_aptitud = "ALTO DESEMPEÑO"
+        color_aptitud = "#28a745"
+        mensaje_aptitud = "Cumple ampliamente con los estándares del puesto"
+        recomendacion_rh = "Excelente desempeño - Considerar para promoción"
+    elif calificacion_final >= 3.5 and not categorias_criticas:
+        estado_aptitud = "CUMPLE EXPECTATIVAS"
+        color_aptitud = "#17a2b8"
+        mensaje_aptitud = "Desempeño satisfactorio acorde al puesto"
+        recomendacion_rh = "Mantener nivel actual - Oportunidades de desarrollo"
+    elif calificacion_final >= 2.5:
+        estado_aptitud = "EN DESARROLLO"
+        color_aptitud = "#ffc107"
+        mensaje_aptitud = f"Oportunidades de crecimiento en: {', '.join(categorias_bajas[:2])}"
+        recomendacion_rh = "Plan de desarrollo personalizado"
+    else:
+        estado_aptitud = "REQUIERE APOYO"
+        color_aptitud = "#ff6b6b"
+        mensaje_aptitud = f"Requiere apoyo inmediato en: {', '.join(categorias_criticas[:2])}"
+        recomendacion_rh = "Plan de acción intensivo"
+
+    # KPIs adicionales
+    consistencia = max(0, min(5, 5 - (final_por_comp.std() * 2)))
+    brecha_mejora = 5.0 - calificacion_final
+    percentil = (dataset.promedio_evaluados < calificacion_final).mean() * 100
+    nivel_cumplimiento = min(100, ((calificacion_final - 3.5) / 1.5) * 100) if calificacion_final >= 3.5 else (calificacion_final / 3.5) * 100
+    metricas.FASES.observar(time.perf_counter() - inicio_kpis, fase='kpis')
+
+    intervalos = intervalos_confianza(dataset, evaluado, df_eval, weights_norm)
+
+    return {
+        'meta': {
+            'evaluado': evaluado,
+            'total_evaluadores': total_evaluadores,
+            'conteo_evaluadores': conteo_evaluadores,
+            'normalizacion': dataset.normalizacion
+        },
+        'kpis': {
+            'calificacion_final': calificacion_final,
+            'consistencia': consistencia,
+            'brecha_mejora': brecha_mejora,
+            'percentil': percentil,
+            'nivel_cumplimiento': nivel_cumplimiento,
+            'potencial': potencial
+        },
+        'intervalos': intervalos,
+        'textos': {
+            'estado_aptitud': estado_aptitud,
+            'color_aptitud': color_aptitud,
+            'mensaje_aptitud': mensaje_aptitud,
+            'recomendacion_rh': recomendacion_rh,
+            'cuadrante': cuadrante,
+            'color_cuadrante': color_cuadrante,
+            'descripcion_cuadrante': descripcion_cuadrante,
+            'accion_rh': accion_rh,
+            'fortalezas': sorted(promedios_categorias.items(), key=lambda x: x[1], reverse=True)[:3],
+            'mejoras': sorted(promedios_categorias.items(), key=lambda x: x[1])[:3]
+        },
+        'data_raw': {
+            'final_por_comp': final_por_comp,
+            'colores_categorias': colores_categorias,
+            'promedios_categorias': promedios_categorias,
+            'promedios_empresa_cat': promedios_empresa_cat,
+            'promedios_por_grupo': {
+                grupo: [grupos.loc[grupo][categorias_comp[cat]].mean() if categorias_comp[cat] else 0 for cat in promedios_categorias.keys()]
+                for grupo in grupos.index
+            }
+        }
+    }
+
+
+# Intervalos ya calculados, por (versión del dataset, evaluado, ponderaciones normalizadas)
+_INTERVALOS = OrderedDict()
+_INTERVALOS_MAX = 1024
+_intervalos_lock = threading.Lock()
+
+
+def intervalos_confianza(dataset, evaluado, df_eval, weights_norm, remuestreos=None):
+    """Intervalos bootstrap (NIVEL_CONFIANZA) de la calificación final y de cada categoría.
+
+    Remuestrea con reemplazo a los evaluadores dentro de cada grupo de relación y recalcula
+    los puntajes con las mismas ponderaciones que score(). Retorna {'nivel', 'remuestreos',
+    'calificacion_final': (inf, sup), 'categorias': {categoria: (inf, sup)}}; se guarda por
+    versión del dataset, evaluado y ponderaciones.
+    """
+    remuestreos = remuestreos or BOOTSTRAP_REMUESTREOS
+    clave = (dataset.version, evaluado, tuple(round(weights_norm[g], 9) for g in sorted(weights_norm)), remuestreos)
+    with _intervalos_lock:
+        if clave in _INTERVALOS:
+            _INTERVALOS.move_to_end(clave)
+            metricas.CACHE.incrementar(cache='intervalos', resultado='acierto')
+            return _INTERVALOS[clave]
+    metricas.CACHE.incrementar(cache='intervalos', resultado='fallo')
+
+    with metricas.FASES.medir(fase='bootstrap'):
+        resultado = _calcular_intervalos(dataset, evaluado, df_eval, weights_norm, remuestreos)
+    with _intervalos_lock:
+        _INTERVALOS[clave] = resultado
+        while len(_INTERVALOS) > _INTERVALOS_MAX:
+            _INTERVALOS.popitem(last=False)
+    return resultado
+
+
+def _calcular_intervalos(dataset, evaluado, df_eval, weights_norm, remuestreos):
+    comp_cols = dataset.comp_cols
+    posicion = {c: i for i, c in enumerate(comp_cols)}
+    categorias = {c: [posicion[x] for x in comps] for c, comps in dataset.categorias_comp.items() if comps}
+    pesos_grupos = {g: p for g, p in weights_norm.items() if p > 0}
+
+    # Evaluadores ordenados por grupo: cada grupo ocupa un tramo contiguo [inicio, inicio + n)
+    grupo = df_eval['grupo_ponderacion']
+    presentes = [g for g in pesos_grupos if (grupo == g).any()]
+    filas = [df_eval.loc[grupo == g, comp_cols].to_numpy(dtype=float) for g in presentes]
+    tamanos = np.array([len(f) for f in filas])
+    if not presentes:
+        vacio = (0.0, 0.0)
+        return {'nivel': NIVEL_CONFIANZA, 'remuestreos': remuestreos, 'calificacion_final': vacio,
+                'categorias': {c: vacio for c in categorias}}
+    valores = np.concatenate(filas)
+    inicios = np.concatenate([[0], np.cumsum(tamanos)[:-1]])
+    grupo_de_fila = np.repeat(np.arange(len(presentes)), tamanos)
+
+    # Semilla fija por versión y evaluado: el mismo intervalo en todos los procesos
+    semilla = int.from_bytes(hashlib.sha256(f'{dataset.version}|{evaluado}'.encode('utf-8')).digest()[:8], 'little')
+    aleatorio = np.random.default_rng(semilla)
+
+    # Todos los remuestreos a la vez: índice (remuestreo, posición) dentro del tramo del grupo
+    indices = inicios[grupo_de_fila] + (aleatorio.random((remuestreos, len(valores))) * tamanos[grupo_de_fila]).astype(np.intp)
+    muestra = valores[indices]
+    validos = ~np.isnan(muestra)
+    sumas = np.add.reduceat(np.where(validos, muestra, 0.0), inicios, axis=1)
+    conteos = np.add.reduceat(validos, inicios, axis=1)
+    # Promedio por grupo y competencia (0 si nadie respondió, como el fillna(0) de score)
+    medias = np.divide(sumas, conteos, out=np.zeros_like(sumas), where=conteos > 0)
+    final_por_comp = np.einsum('rgc,g->rc', medias, np.array([pesos_grupos[g] for g in presentes]))
+
+    puntajes = np.column_stack([final_por_comp.mean(axis=1)] +
+                               [final_por_comp[:, indices_cat].mean(axis=1) for indices_cat in categorias.values()])
+    alfa = (1 - NIVEL_CONFIANZA) / 2 * 100
+    inferior, superior = np.percentile(puntajes, [alfa, 100 - alfa], axis=0)
+    limites = [(float(a), float(b)) for a, b in zip(inferior, superior)]
+    return {
+        'nivel': NIVEL_CONFIANZA,
+        'remuestreos': remuestreos,
+        'calificacion_final': limites[0],
+        'categorias': dict(zip(categorias, limites[1:])),
+    }
+
+
+# Puntajes de toda la organización ya calculados, por (versión del dataset, ponderaciones normalizadas)
+_ORGANIZACION = OrderedDict()
+_ORGANIZACION_MAX = 16
+_organizacion_lock = threading.Lock()
+
+
+def score_organizacion(dataset, w_auto, w_jefe, w_colegas, w_sub):
+    """Puntajes de todos los evaluados en una sola pasada vectorizada.
+
+    Retorna un DataFrame (índice: evaluado) con calificacion_final, potencial, cuadrante,
+    percentil, evaluadores, posicion (ranking) y el promedio de cada categoría, con los mismos valores que
+    score() da para cada evaluado; None si las ponderaciones no suman > 0. El resultado se
+    guarda por versión del dataset y ponderaciones (no modificarlo).
+    """
+    pesos = [float(w or 0) for w in (w_auto, w_jefe, w_colegas, w_sub)]
+    total = sum(pesos)
+    if total <= 0:
+        return None
+    clave = (dataset.version, tuple(round(p / total, 9) for p in pesos))
+    with _organizacion_lock:
+        if clave in _ORGANIZACION:
+            _ORGANIZACION.move_to_end(clave)
+            metricas.CACHE.incrementar(cache='organizacion', resultado='acierto')
+            return _ORGANIZACION[clave]
+    metricas.CACHE.incrementar(cache='organizacion', resultado='fallo')
+
+    with metricas.FASES.medir(fase='score_organizacion'):
+        resultado = _calcular_organizacion(dataset, dict(zip(PONDERACIONES_DEFAULT, clave[1])))
+    with _organizacion_lock:
+        _ORGANIZACION[clave] = resultado
+        while len(_ORGANIZACION) > _ORGANIZACION_MAX:
+            _ORGANIZACION.popitem(last=False)
+    return resultado
+
+
+def _calcular_organizacion(dataset, weights_norm):
+    df = dataset.df
+    comp_cols = dataset.comp_cols
+    evaluado = df[dataset.col_evaluado]
+    grupo = grupos_relacion(df[dataset.col_relacion])
+
+    # Promedio por (evaluado, grupo) y suma ponderada de los grupos presentes, en el mismo orden que score
+    medias = df[comp_cols].groupby([evaluado, grupo]).mean().fillna(0)
+    evaluados = medias.index.get_level_values(0).unique()
+    final_por_comp = pd.DataFrame(0.0, index=evaluados, columns=comp_cols)
+    presentes = set(medias.index.get_level_values(1))
+    for nombre_grupo, peso in weights_norm.items():
+        if nombre_grupo in presentes:
+            final_por_comp += medias.xs(nombre_grupo, level=1).reindex(evaluados, fill_value=0.0) * peso
+
+    # Promedios por fila sobre arreglos contiguos: misma suma (y mismo redondeo) que Series.mean en score
+    matriz = np.ascontiguousarray(final_por_comp.to_numpy())
+    posicion = {c: i for i, c in enumerate(comp_cols)}
+    resultado = pd.DataFrame(index=final_por_comp.index)
+    resultado.index.name = 'evaluado'
+    resultado['calificacion_final'] = matriz.sum(axis=1) / len(comp_cols)
+    for categoria, comps_cat in dataset.categorias_comp.items():
+        resultado[categoria] = matriz[:, [posicion[c] for c in comps_cat]].sum(axis=1) / len(comps_cat)
+
+    cats_presentes = [c for c in CATEGORIAS_POTENCIAL if c in dataset.categorias_comp]
+    resultado['potencial'] = sum(resultado[c] for c in cats_presentes) / len(cats_presentes) if cats_presentes else 0.0
+    alto_desempeno = resultado['calificacion_final'] >= 4.0
+    alto_potencial = resultado['potencial'] >= 4.0
+    resultado['cuadrante'] = np.select(
+        [alto_desempeno & alto_potencial, alto_desempeno, alto_potencial],
+        ['ESTRELLA', 'CONTRIBUIDOR SÓLIDO', 'TALENTO EMERGENTE'], default='EN DESARROLLO')
+
+    # Percentil: proporción de evaluados de la empresa con promedio general menor
+    promedios = np.sort(dataset.promedio_evaluados.to_numpy(dtype=float))
+    validos = promedios[~np.isnan(promedios)]
+    if len(promedios):
+        menores = np.searchsorted(validos, resultado['calificacion_final'].to_numpy(), side='left')
+        resultado['percentil'] = menores / len(promedios) * 100
+    else:
+        resultado['percentil'] = np.nan
+    resultado['evaluadores'] = evaluado.value_counts().reindex(resultado.index).fillna(0).astype(int)
+    resultado['posicion'] = resultado['calificacion_final'].rank(ascending=False, method='min').astype(int)
+    return resultado
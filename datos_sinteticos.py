@@ -0,0 +1,128 @@
+"""
+Generador de respuestas sintéticas del formulario 360° (para benchmarks y pruebas de carga).
+
+Produce un DataFrame con la misma forma que la hoja de Google: marca temporal,
+nombre del evaluador, evaluado, relación, una columna por pregunta de
+competencia (texto Likert o número 1-5) y las preguntas abiertas.
+
+Uso:
+    import datos_sinteticos
+    df = datos_sinteticos.generar_respuestas(evaluados=200, evaluadores=8, preguntas=40)
+
+También se puede arrancar el dashboard sin acceso a Google con
+DATOS_SINTETICOS="evaluados=200,evaluadores=8,preguntas=40,respuestas=numero".
+"""
+import numpy as np
+import pandas as pd
+
+# Una pregunta base por categoría (con las palabras clave de categorizar_competencias_detallado)
+PLANTILLAS_PREGUNTA = [
+    'Trabaja en equipo con sus compañeros',
+    'Se comunica con claridad',
+    'Demuestra liderazgo ante su área',
+    'Toma decisiones oportunas',
+    'Planea y da seguimiento a sus actividades',
+    'Administra los recursos asignados',
+    'Negocia acuerdos favorables',
+    'Propone ideas innovadoras',
+    'Cumple con los tiempos de entrega',
+    'Entrega resultados de calidad',
+]
+
+RELACIONES = {
+    'Autoevaluación': 'Soy yo mismo (Autoevaluación)',
+    'Jefe Inmediato': 'Soy su Jefe / Supervisor directo',
+    'Colegas': 'Soy un Par (compañero del mismo nivel)',
+    'Subordinados': 'Soy un Subordinado (le reporto)',
+}
+
+# Proporción de evaluadores de cada grupo
+MEZCLA_DEFAULT = {'Autoevaluación': 1, 'Jefe Inmediato': 1, 'Colegas': 3, 'Subordinados': 3}
+
+ETIQUETAS_LIKERT = ['Muy en desacuerdo', 'En desacuerdo', 'Neutral', 'De acuerdo', 'Totalmente de acuerdo']
+
+PREGUNTAS_ABIERTAS = [
+    '¿Cuáles son las 2 o 3 principales fortalezas que observas en este colaborador?',
+    '¿Cuáles son las 2 o 3 principales áreas de oportunidad (a mejorar) que sugieres para este colaborador?',
+    'Comentarios adicionales (opcional)',
+]
+
+
+def nombres_preguntas(n):
+    """`n` preguntas de competencia repartidas entre las categorías."""
+    nombres = []
+    for i in range(n):
+        base = PLANTILLAS_PREGUNTA[i % len(PLANTILLAS_PREGUNTA)]
+        vuelta = i // len(PLANTILLAS_PREGUNTA)
+        nombres.append(base if vuelta == 0 else f'{base} (aspecto {vuelta + 1})')
+    return nombres
+
+
+def generar_respuestas(evaluados=50, evaluadores=8, mezcla=None, preguntas=40, respuestas='texto',
+                       faltantes=0.0, semilla=0):
+    """DataFrame de respuestas crudas (como la hoja de Google).
+
+    - evaluados: número de personas evaluadas.
+    - evaluadores: respuestas (evaluadores) por persona.
+    - mezcla: {grupo: proporción} de relaciones (por defecto MEZCLA_DEFAULT).
+    - preguntas: número de preguntas de competencia.
+    - respuestas: 'texto' (etiquetas Likert) o 'numero' (1-5).
+    - faltantes: fracción de respuestas en blanco.
+    """
+    if respuestas not in ('texto', 'numero'):
+        raise ValueError(f"respuestas debe ser 'texto' o 'numero': {respuestas}")
+    rng = np.random.default_rng(semilla)
+    mezcla = mezcla or MEZCLA_DEFAULT
+    grupos = list(mezcla)
+    proporciones = np.array([mezcla[g] for g in grupos], dtype=float)
+    filas = evaluados * evaluadores
+
+    persona = np.repeat(np.arange(evaluados), evaluadores)
+    relacion = rng.choice(len(grupos), size=filas, p=proporciones / proporciones.sum())
+
+    # Nivel de cada evaluado + dificultad de cada pregunta + ruido de cada evaluador, en escala 1-5
+    nivel = rng.normal(3.6, 0.5, evaluados)[persona][:, None]
+    dificultad = rng.normal(0, 0.3, preguntas)[None, :]
+    puntajes = np.clip(np.rint(nivel + dificultad + rng.normal(0, 0.7, (filas, preguntas))), 1, 5).astype(int)
+
+    columnas = {
+        'Marca temporal': pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 30 * 24 * 3600, filas), unit='s'),
+        'Nombre Completo:': [f'Evaluador {i:05d}' for i in rng.integers(0, max(evaluados * 2, 1), filas)],
+        'Nombre del Colaborador Evaluado': np.array([f'Persona {i:04d}' for i in range(evaluados)], dtype=object)[persona],
+        '¿Cuál es tu relación con el Evaluado?': np.array([RELACIONES.get(g, g) for g in grupos], dtype=object)[relacion],
+    }
+    etiquetas = np.array(ETIQUETAS_LIKERT, dtype=object)
+    blancos = rng.random((filas, preguntas)) < faltantes if faltantes else None
+    for j, nombre in enumerate(nombres_preguntas(preguntas)):
+        valores = etiquetas[puntajes[:, j] - 1] if respuestas == 'texto' else puntajes[:, j].astype(float)
+        if blancos is not None:
+            valores = np.where(blancos[:, j], None if respuestas == 'texto' else np.nan, valores)
+        columnas[nombre] = valores
+    for nombre in PREGUNTAS_ABIERTAS:
+        columnas[nombre] = np.where(rng.random(filas) < 0.5, 'Buen desempeño en general', None)
+
+    df = pd.DataFrame(columnas)
+    df['Marca temporal'] = df['Marca temporal'].dt.strftime('%d/%m/%Y %H:%M:%S')
+    return df
+
+
+def parametros_desde_texto(texto):
+    """Parámetros de generar_respuestas desde 'evaluados=200,evaluadores=8,respuestas=numero,...'.
+
+    La mezcla se indica como 'mezcla=Colegas:3/Subordinados:3/Jefe Inmediato:1/Autoevaluación:1'.
+    """
+    parametros = {}
+    for parte in filter(None, (p.strip() for p in texto.split(','))):
+        clave, _, valor = parte.partition('=')
+        clave = clave.strip()
+        if clave == 'mezcla':
+            parametros[clave] = {g.strip(): float(p) for g, p in (x.split(':') for x in valor.split('/'))}
+        elif clave == 'respuestas':
+            parametros[clave] = valor.strip()
+        elif clave == 'faltantes':
+            parametros[clave] = float(valor)
+        elif clave in ('evaluados', 'evaluadores', 'preguntas', 'semilla'):
+            parametros[clave] = int(valor)
+        else:
+            raise ValueError(f"Parámetro de datos sintéticos desconocido: {clave}")
+    return parametros
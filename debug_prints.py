@@ -1,10 +1,12 @@
-from app import COL_EVALUADO, COL_RELACION, comp_cols, evaluados_options
-print('COL_EVALUADO =', COL_EVALUADO)
-print('COL_RELACION =', COL_RELACION)
-print('N_competencias =', len(comp_cols))
+import datos_evaluacion
+
+dataset = datos_evaluacion.load()
+print('COL_EVALUADO =', dataset.col_evaluado)
+print('COL_RELACION =', dataset.col_relacion)
+print('N_competencias =', len(dataset.comp_cols))
 print('First 10 competencias:')
-for c in comp_cols[:10]:
+for c in dataset.comp_cols[:10]:
     print(' -', c)
 print('First 10 evaluados:')
-for o in evaluados_options[:10]:
-    print(' -', o['value'])
+for n in dataset.evaluados[:10]:
+    print(' -', n)
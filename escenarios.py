@@ -0,0 +1,209 @@
+"""
+Barrido de ponderaciones: qué tan sensibles son el ranking y el cuadrante 9-Box de cada persona a la
+política de ponderación de los grupos de evaluadores.
+
+Los puntajes son lineales en las ponderaciones: la calificación final de un evaluado es la suma, sobre
+los grupos, de peso del grupo x promedio de sus competencias en ese grupo (y lo mismo para el potencial).
+Con los agregados por (evaluado, grupo), que no dependen de las ponderaciones y se calculan una vez por
+versión del dataset, una rejilla de miles de vectores de ponderación se evalúa para todos los evaluados
+con un producto tensorial por lote de escenarios.
+
+Uso:
+    import escenarios
+    barrido = escenarios.barrer(dataset, escenarios.rejilla(paso=5), base=(5, 18, 30, 47))
+    barrido.por_persona     # posición base, mejor y peor posición, % de escenarios con otro cuadrante
+    barrido.por_escenario   # ponderaciones, correlación con el ranking base, personas que cambian de cuadrante
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import datos_evaluacion
+import metricas
+
+GRUPOS = list(datos_evaluacion.PONDERACIONES_DEFAULT)
+# Código de cuadrante = 2 * (desempeño alto) + (potencial alto), con los mismos umbrales que score
+CUADRANTES = ['EN DESARROLLO', 'TALENTO EMERGENTE', 'CONTRIBUIDOR SÓLIDO', 'ESTRELLA']
+UMBRAL = 4.0
+# Escenarios evaluados por operación tensorial (acota la memoria: lote x evaluados x 2)
+ESCENARIOS_LOTE = 256
+
+
+def rejilla(paso=5, rangos=None):
+    """Ponderaciones (%) en múltiplos de `paso` que suman 100, una fila por escenario.
+
+    `rangos` ({grupo: (mínimo, máximo)}) limita los valores de cada grupo.
+    """
+    valores = np.arange(0, 101, paso)
+    combinaciones = np.stack(np.meshgrid(valores, valores, valores, indexing='ij'), axis=-1).reshape(-1, 3)
+    pesos = np.column_stack([combinaciones, 100 - combinaciones.sum(axis=1)])
+    pesos = pesos[pesos[:, -1] >= 0]
+    for grupo, (minimo, maximo) in (rangos or {}).items():
+        columna = pesos[:, GRUPOS.index(grupo)]
+        pesos = pesos[(columna >= minimo) & (columna <= maximo)]
+    return pd.DataFrame(pesos, columns=GRUPOS)
+
+
+# Agregados por (evaluado, grupo), por versión del dataset
+_AGREGADOS = OrderedDict()
+_AGREGADOS_MAX = 4
+# Barridos ya calculados, por (versión, ponderaciones base, rejilla)
+_BARRIDOS = OrderedDict()
+_BARRIDOS_MAX = 8
+_lock = threading.Lock()
+
+
+def agregados_grupo(dataset):
+    """(evaluados, tensor evaluados x grupos x [calificación, potencial]) sin ponderar.
+
+    Un grupo sin evaluaciones aporta 0, igual que en score().
+    """
+    with _lock:
+        if dataset.version in _AGREGADOS:
+            _AGREGADOS.move_to_end(dataset.version)
+            return _AGREGADOS[dataset.version]
+
+    df, comp_cols = dataset.df, dataset.comp_cols
+    evaluado = df[dataset.col_evaluado]
+    grupo = datos_evaluacion.grupos_relacion(df[dataset.col_relacion])
+    medias = df[comp_cols].groupby([evaluado, grupo]).mean().fillna(0)
+    matriz = medias.to_numpy(dtype=np.float64)
+    posicion = {c: i for i, c in enumerate(comp_cols)}
+    potencial = [dataset.categorias_comp[c] for c in datos_evaluacion.CATEGORIAS_POTENCIAL if dataset.categorias_comp.get(c)]
+    columnas = [matriz.mean(axis=1),
+                np.mean([matriz[:, [posicion[c] for c in comps]].mean(axis=1) for comps in potencial], axis=0)
+                if potencial else np.zeros(len(matriz))]
+
+    evaluados = medias.index.get_level_values(0).unique()
+    filas = evaluados.get_indexer(medias.index.get_level_values(0))
+    grupos = pd.Index(GRUPOS).get_indexer(medias.index.get_level_values(1))
+    tensor = np.zeros((len(evaluados), len(GRUPOS), 2))
+    ponderables = grupos >= 0
+    tensor[filas[ponderables], grupos[ponderables]] = np.column_stack(columnas)[ponderables]
+
+    with _lock:
+        _AGREGADOS[dataset.version] = (evaluados, tensor)
+        while len(_AGREGADOS) > _AGREGADOS_MAX:
+            _AGREGADOS.popitem(last=False)
+    return evaluados, tensor
+
+
+def _posiciones(calificaciones):
+    # Posición en el ranking de cada fila (1 = mejor; empates con la misma posición, como rank(method='min')).
+    # Se redondea para que sumas en distinto orden no rompan empates
+    valores = -np.round(calificaciones, 9)
+    orden = np.argsort(valores, axis=1)
+    ordenados = np.take_along_axis(valores, orden, axis=1)
+    # En cada tramo de empates, la posición del primero
+    indices = np.broadcast_to(np.arange(valores.shape[1], dtype=np.int32), valores.shape)
+    inicio_tramo = np.where(np.diff(ordenados, axis=1, prepend=np.nan) != 0, indices, 0)
+    posiciones = np.empty(valores.shape, dtype=np.int32)
+    np.put_along_axis(posiciones, orden, np.maximum.accumulate(inicio_tramo, axis=1) + 1, axis=1)
+    return posiciones
+
+
+class Barrido:
+    """Resultado de evaluar una rejilla de ponderaciones para todos los evaluados."""
+
+    def __init__(self, evaluados, tensor, pesos, base, lote=ESCENARIOS_LOTE):
+        inicio = time.perf_counter()
+        normalizados = pesos / pesos.sum(axis=1, keepdims=True)
+        base = np.asarray(base, dtype=np.float64) / sum(base)
+
+        # (calificación, potencial) x grupos x evaluados: cada lote es un solo producto matricial
+        transpuesto = np.ascontiguousarray(tensor.transpose(2, 1, 0))
+        calificacion_base, potencial_base = base @ transpuesto
+        posicion_base = _posiciones(calificacion_base[None, :])[0]
+        cuadrante_base = 2 * (calificacion_base >= UMBRAL) + (potencial_base >= UMBRAL)
+        centrada_base = posicion_base - posicion_base.mean()
+
+        personas = len(evaluados)
+        mejor = np.full(personas, personas, dtype=np.int32)
+        peor = np.ones(personas, dtype=np.int32)
+        suma, suma_cuadrados = np.zeros(personas), np.zeros(personas)
+        por_cuadrante = np.zeros((personas, len(CUADRANTES)), dtype=np.int64)
+        correlacion, cambios, promedio = [], [], []
+        for desde in range(0, len(normalizados), lote):
+            # Escenarios del lote x evaluados, para calificación y potencial a la vez
+            calificacion, potencial = normalizados[desde:desde + lote] @ transpuesto
+            posiciones = _posiciones(calificacion)
+            cuadrantes = 2 * (calificacion >= UMBRAL) + (potencial >= UMBRAL)
+
+            mejor = np.minimum(mejor, posiciones.min(axis=0))
+            peor = np.maximum(peor, posiciones.max(axis=0))
+            suma += posiciones.sum(axis=0)
+            suma_cuadrados += (posiciones.astype(np.float64) ** 2).sum(axis=0)
+            por_cuadrante += (cuadrantes[..., None] == np.arange(len(CUADRANTES))).sum(axis=0)
+
+            # Correlación de rangos (Spearman) con el ranking base y cambios de cuadrante por escenario
+            centradas = posiciones - posiciones.mean(axis=1, keepdims=True)
+            normas = np.linalg.norm(centradas, axis=1) * np.linalg.norm(centrada_base)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                correlacion.append(centradas @ centrada_base / normas)
+            cambios.append((cuadrantes != cuadrante_base).sum(axis=1))
+            promedio.append(calificacion.mean(axis=1))
+
+        total = len(normalizados)
+        media = suma / total
+        self.por_persona = pd.DataFrame({
+            'posicion_base': posicion_base,
+            'mejor_posicion': mejor,
+            'peor_posicion': peor,
+            'desviacion_posicion': np.sqrt(np.maximum(suma_cuadrados / total - media ** 2, 0.0)),
+            'cuadrante_base': np.array(CUADRANTES)[cuadrante_base],
+            'cambios_cuadrante': (total - por_cuadrante[np.arange(personas), cuadrante_base]) / total * 100,
+            'cuadrantes': [', '.join(CUADRANTES[c] for c in np.flatnonzero(fila)[::-1]) for fila in por_cuadrante],
+        }, index=evaluados)
+        self.por_persona.index.name = 'evaluado'
+        self.por_escenario = pd.DataFrame(pesos, columns=GRUPOS)
+        self.por_escenario['correlacion'] = np.concatenate(correlacion)
+        self.por_escenario['cambios_cuadrante'] = np.concatenate(cambios)
+        self.por_escenario['calificacion_promedio'] = np.concatenate(promedio)
+        self.segundos = time.perf_counter() - inicio
+
+    def resumen(self):
+        """Indicadores globales del barrido."""
+        return {
+            'escenarios': len(self.por_escenario),
+            'evaluados': len(self.por_persona),
+            'correlacion_media': float(self.por_escenario['correlacion'].mean()),
+            'correlacion_minima': float(self.por_escenario['correlacion'].min()),
+            'cuadrante_estable': int((self.por_persona['cambios_cuadrante'] == 0).sum()),
+            'segundos': self.segundos,
+        }
+
+
+def barrer(dataset, ponderaciones, base=None):
+    """Barrido de `ponderaciones` (DataFrame o arreglo escenarios x 4 grupos, en %) frente a `base`.
+
+    `base` son las ponderaciones de referencia (por defecto, PONDERACIONES_DEFAULT). Se omiten los
+    escenarios cuyas ponderaciones no suman > 0. Retorna un Barrido (guardado en caché por versión
+    del dataset, base y rejilla; no modificarlo), o None si no hay evaluados o la base no suma > 0.
+    """
+    base = [float(w or 0) for w in (base or datos_evaluacion.PONDERACIONES_DEFAULT.values())]
+    if sum(base) <= 0 or not dataset.col_evaluado or not dataset.col_relacion or dataset.df.empty:
+        return None
+    pesos = np.asarray(ponderaciones, dtype=np.float64).reshape(-1, len(GRUPOS))
+    pesos = pesos[pesos.sum(axis=1) > 0]
+    clave = (dataset.version, tuple(round(w / sum(base), 9) for w in base), hashlib.sha256(pesos.tobytes()).hexdigest())
+    with _lock:
+        if clave in _BARRIDOS:
+            _BARRIDOS.move_to_end(clave)
+            metricas.CACHE.incrementar(cache='escenarios', resultado='acierto')
+            return _BARRIDOS[clave]
+    metricas.CACHE.incrementar(cache='escenarios', resultado='fallo')
+
+    evaluados, tensor = agregados_grupo(dataset)
+    if not len(evaluados) or not len(pesos):
+        return None
+    with metricas.FASES.medir(fase='barrido_escenarios'):
+        resultado = Barrido(evaluados, tensor, pesos, base)
+    with _lock:
+        _BARRIDOS[clave] = resultado
+        while len(_BARRIDOS) > _BARRIDOS_MAX:
+            _BARRIDOS.popitem(last=False)
+    return resultado
@@ -0,0 +1,456 @@
+"""
+Fuentes de datos de las respuestas del formulario: Google Sheets, CSV, Parquet, SQLite y sintéticas.
+
+Cada fuente implementa `leer(hoja, columnas)` y retorna el DataFrame crudo (sin
+convertir). `columnas` es un predicado sobre el nombre de la columna; las fuentes
+lo aplican al leer (proyección), de modo que las columnas que no se usan (texto
+libre, nombre del evaluador) no se descargan ni se parsean:
+  - CSV: `usecols` de pandas (las demás columnas no se convierten).
+  - Parquet: solo se leen las columnas seleccionadas del archivo.
+  - SQLite: SELECT con las columnas seleccionadas.
+  - Google Sheets: consulta `select A, C, ...` de la API de visualización (hoja pública)
+    o rangos por columna (con credenciales).
+
+Se elige con DATOS_FUENTE (ver datos_evaluacion.fuente_configurada):
+    DATOS_FUENTE=google                                   (por defecto)
+    DATOS_FUENTE=csv      DATOS_RUTA=respuestas.csv
+    DATOS_FUENTE=parquet  DATOS_RUTA=respuestas.parquet   (requiere pyarrow)
+    DATOS_FUENTE=sqlite   DATOS_RUTA=respuestas.db  DATOS_TABLA=respuestas
+    DATOS_FUENTE=sintetico DATOS_SINTETICOS="evaluados=200,..."
+"""
+import io
+import os
+import random
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import metricas
+
+# Descarga desde Google: timeout por petición, reintentos de errores transitorios y URL base
+# (apuntarla a un servidor local permite probar la carga sin acceso a Google)
+GOOGLE_TIMEOUT_SEG = float(os.environ.get('GOOGLE_TIMEOUT_SEG', '30'))
+GOOGLE_REINTENTOS = int(os.environ.get('GOOGLE_REINTENTOS', '3'))
+GOOGLE_ESPERA_SEG = float(os.environ.get('GOOGLE_ESPERA_SEG', '0.5'))
+GOOGLE_URL = os.environ.get('GOOGLE_URL', 'https://docs.google.com')
+
+# Códigos HTTP que vale la pena reintentar
+_CODIGOS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+
+
+def _letra_columna(indice):
+    """Índice de columna (0 = A) a letra de hoja de cálculo (A, ..., Z, AA, ...)."""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+
+def _limpiar_nombre(nombre):
+    return nombre.strip() if isinstance(nombre, str) else nombre
+
+
+def _es_transitorio(error):
+    """True para errores de red, timeouts y respuestas 408/429/5xx (HTTP o de la API de Google)."""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in _CODIGOS_TRANSITORIOS
+    respuesta = getattr(error, 'response', None)
+    codigo = getattr(respuesta, 'status_code', None)
+    if codigo is not None:
+        return codigo in _CODIGOS_TRANSITORIOS
+    # URLError, timeouts y errores de conexión (también los de requests) derivan de OSError
+    return isinstance(error, (OSError, TimeoutError))
+
+
+def _con_reintentos(funcion, reintentos, descripcion, espera=None):
+    """Llama `funcion` reintentando errores transitorios con espera exponencial (con jitter)."""
+    espera = GOOGLE_ESPERA_SEG if espera is None else espera
+    for intento in range(reintentos + 1):
+        try:
+            return funcion()
+        except Exception as e:
+            if intento == reintentos or not _es_transitorio(e):
+                raise
+            pausa = espera * 2 ** intento * (1 + random.random() / 2)
+            print(f"Aviso: falló {descripcion} ({e}); reintento {intento + 1}/{reintentos} en {pausa:.1f} s")
+            time.sleep(pausa)
+
+
+def _resultado(futuro):
+    try:
+        return futuro.result()
+    except Exception as e:
+        return e
+
+
+class Fuente:
+    """Origen de las respuestas crudas del formulario."""
+
+    # Solo Google Sheets distingue pestañas (respuestas textuales / numéricas); las demás tienen una sola tabla
+    multiples_hojas = False
+
+    def columnas(self, hoja=None):
+        """Nombres de las columnas disponibles."""
+        raise NotImplementedError
+
+    def leer(self, hoja=None, columnas=None):
+        """DataFrame crudo; `columnas(nombre) -> bool` selecciona las columnas a leer (None = todas)."""
+        raise NotImplementedError
+
+    def leer_bloques(self, hoja=None, columnas=None, filas=50000):
+        """Itera el DataFrame crudo en bloques de hasta `filas` filas (las fuentes que no leen por partes
+        entregan un solo bloque)."""
+        yield self.leer(hoja, columnas)
+
+    def leer_varias(self, hojas, columnas=None):
+        """{hoja: DataFrame o excepción} de varias hojas; cada hoja distinta se lee una sola vez."""
+        resultados = {}
+        for hoja in dict.fromkeys(hojas):
+            try:
+                resultados[hoja] = self._leer_medido(hoja, columnas)
+            except Exception as e:
+                resultados[hoja] = e
+        return resultados
+
+    def _leer_medido(self, hoja, columnas):
+        with metricas.FASES.medir(fase='carga_hoja'):
+            return self.leer(hoja, columnas)
+
+    def _seleccion(self, nombres, columnas):
+        return [n for n in nombres if columnas is None or columnas(_limpiar_nombre(n))]
+
+    @staticmethod
+    def _proyectar(df, columnas):
+        # Limpia los nombres y asegura la proyección aunque el backend haya leído de más
+        df.columns = [_limpiar_nombre(c) for c in df.columns]
+        if columnas is not None:
+            df = df[[c for c in df.columns if columnas(c)]]
+        return df
+
+
+class FuenteCSV(Fuente):
+    """Archivo CSV local (p. ej. el extracto nocturno del almacén de datos)."""
+
+    def __init__(self, ruta, separador=','):
+        self.ruta = ruta
+        self.separador = separador
+
+    def columnas(self, hoja=None):
+        return list(pd.read_csv(self.ruta, sep=self.separador, nrows=0).columns)
+
+    def leer(self, hoja=None, columnas=None):
+        usecols = (lambda c: columnas(_limpiar_nombre(c))) if columnas is not None else None
+        df = self._proyectar(pd.read_csv(self.ruta, sep=self.separador, usecols=usecols), columnas)
+        print(f"Cargado CSV: {self.ruta} ({len(df)} filas, {len(df.columns)} columnas)")
+        return df
+
+    def leer_bloques(self, hoja=None, columnas=None, filas=50000):
+        usecols = (lambda c: columnas(_limpiar_nombre(c))) if columnas is not None else None
+        with pd.read_csv(self.ruta, sep=self.separador, usecols=usecols, chunksize=filas) as lector:
+            for bloque in lector:
+                yield self._proyectar(bloque, columnas)
+
+    def __str__(self):
+        return f'csv:{self.ruta}'
+
+
+class FuenteParquet(Fuente):
+    """Archivo Parquet local (requiere pyarrow)."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def columnas(self, hoja=None):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("La fuente parquet requiere pyarrow (pip install pyarrow)")
+        return list(pq.ParquetFile(self.ruta).schema_arrow.names)
+
+    def leer(self, hoja=None, columnas=None):
+        seleccion = self._seleccion(self.columnas(), columnas) if columnas is not None else None
+        df = self._proyectar(pd.read_parquet(self.ruta, columns=seleccion), columnas)
+        print(f"Cargado Parquet: {self.ruta} ({len(df)} filas, {len(df.columns)} columnas)")
+        return df
+
+    def leer_bloques(self, hoja=None, columnas=None, filas=50000):
+        import pyarrow.parquet as pq
+
+        seleccion = self._seleccion(self.columnas(), columnas) if columnas is not None else None
+        for lote in pq.ParquetFile(self.ruta).iter_batches(batch_size=filas, columns=seleccion):
+            yield self._proyectar(lote.to_pandas(), columnas)
+
+    def __str__(self):
+        return f'parquet:{self.ruta}'
+
+
+class FuenteSQLite(Fuente):
+    """Tabla de una base SQLite local."""
+
+    def __init__(self, ruta, tabla='respuestas'):
+        self.ruta = ruta
+        self.tabla = tabla
+
+    @staticmethod
+    def _identificador(nombre):
+        return '"' + str(nombre).replace('"', '""') + '"'
+
+    def _conectar(self):
+        # Solo lectura: la fuente nunca modifica la base
+        return sqlite3.connect(f'file:{urllib.parse.quote(os.path.abspath(self.ruta))}?mode=ro', uri=True)
+
+    def columnas(self, hoja=None):
+        with self._conectar() as conexion:
+            filas = conexion.execute(f'PRAGMA table_info({self._identificador(self.tabla)})').fetchall()
+        if not filas:
+            raise RuntimeError(f"La tabla '{self.tabla}' no existe en {self.ruta}")
+        return [fila[1] for fila in filas]
+
+    def _consulta(self, columnas):
+        seleccion = self._seleccion(self.columnas(), columnas)
+        return f"SELECT {', '.join(map(self._identificador, seleccion))} FROM {self._identificador(self.tabla)}"
+
+    def leer(self, hoja=None, columnas=None):
+        consulta = self._consulta(columnas)
+        conexion = self._conectar()
+        try:
+            df = self._proyectar(pd.read_sql_query(consulta, conexion), columnas)
+        finally:
+            conexion.close()
+        print(f"Cargada tabla SQLite: {self.ruta}:{self.tabla} ({len(df)} filas, {len(df.columns)} columnas)")
+        return df
+
+    def leer_bloques(self, hoja=None, columnas=None, filas=50000):
+        consulta = self._consulta(columnas)
+        conexion = self._conectar()
+        try:
+            for bloque in pd.read_sql_query(consulta, conexion, chunksize=filas):
+                yield self._proyectar(bloque, columnas)
+        finally:
+            conexion.close()
+
+    def __str__(self):
+        return f'sqlite:{self.ruta}:{self.tabla}'
+
+
+class FuenteSintetica(Fuente):
+    """Respuestas generadas por datos_sinteticos (benchmarks y pruebas de carga)."""
+
+    def __init__(self, parametros=''):
+        self.parametros = parametros
+
+    def _generar(self):
+        import datos_sinteticos
+        return datos_sinteticos.generar_respuestas(**datos_sinteticos.parametros_desde_texto(self.parametros))
+
+    def columnas(self, hoja=None):
+        return list(self._generar().columns)
+
+    def leer(self, hoja=None, columnas=None):
+        # Se genera completa y luego se proyecta (no hay nada que leer de disco o red)
+        df = self._proyectar(self._generar(), columnas)
+        print(f"Usando respuestas sintéticas: {len(df)} filas ({self.parametros or 'parámetros por defecto'})")
+        return df
+
+    def __str__(self):
+        return f'sintetico:{self.parametros}'
+
+
+# Hoja abierta (cliente autenticado) y pestañas de cada (sheet_id, creds_path), compartidas por todas las
+# instancias: fuente_configurada crea una FuenteGoogle en cada carga y cada revisión de respuestas nuevas
+_HOJAS = {}
+_PESTANAS = {}
+_pestanas_lock = threading.Lock()
+
+
+class FuenteGoogle(Fuente):
+    """Hoja de Google Sheets: API con credenciales (gspread) o exportación CSV pública.
+
+    Las pestañas se descargan en paralelo (leer_varias). Cada petición tiene un
+    timeout de GOOGLE_TIMEOUT_SEG y los errores transitorios (red, 429, 5xx) se
+    reintentan hasta GOOGLE_REINTENTOS veces con espera exponencial. GOOGLE_URL
+    permite apuntar la exportación pública a un servidor local de prueba.
+    """
+
+    multiples_hojas = True
+
+    def __init__(self, sheet_id, sheet_gid=None, creds_path='credentials.json', url_base=GOOGLE_URL,
+                 timeout=GOOGLE_TIMEOUT_SEG, reintentos=GOOGLE_REINTENTOS):
+        self.sheet_id = sheet_id
+        self.sheet_gid = sheet_gid
+        self.creds_path = creds_path
+        self.url_base = url_base.rstrip('/')
+        self.timeout = timeout
+        self.reintentos = reintentos
+
+    def _mapa_pestanas(self, refrescar=False):
+        """Mapas gid -> worksheet y título -> worksheet, con una sola consulta de metadatos por hoja y credenciales."""
+        clave = (self.sheet_id, self.creds_path)
+        with _pestanas_lock:
+            if clave not in _HOJAS:
+                # Clientes de Google solo cuando hay credenciales (su importación es costosa)
+                import gspread
+                from oauth2client.service_account import ServiceAccountCredentials
+
+                scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+                credentials = ServiceAccountCredentials.from_json_keyfile_name(self.creds_path, scope)
+                client = gspread.authorize(credentials)
+                if hasattr(client, 'set_timeout'):
+                    client.set_timeout(self.timeout)
+                _HOJAS[clave] = _con_reintentos(lambda: client.open_by_key(self.sheet_id), self.reintentos,
+                                                'abrir la hoja')
+            if refrescar or clave not in _PESTANAS:
+                pestanas = _con_reintentos(_HOJAS[clave].worksheets, self.reintentos, 'listar pestañas')
+                _PESTANAS[clave] = ({w.id: w for w in pestanas}, {w.title: w for w in pestanas})
+            return _PESTANAS[clave]
+
+    def _worksheet(self, hoja):
+        for refrescar in (False, True):
+            # Si no aparece, la lista guardada puede ser anterior a que se agregara o renombrara la pestaña
+            por_gid, por_titulo = self._mapa_pestanas(refrescar)
+            if self.sheet_gid and int(self.sheet_gid) in por_gid:
+                return por_gid[int(self.sheet_gid)]
+            if hoja in por_titulo:
+                return por_titulo[hoja]
+        raise RuntimeError(f"La pestaña '{hoja}' no existe en la hoja")
+
+    def _leer_api(self, hoja, columnas):
+        worksheet = self._worksheet(hoja)
+        if columnas is None:
+            return pd.DataFrame(_con_reintentos(worksheet.get_all_records, self.reintentos, hoja))
+        encabezado = _con_reintentos(lambda: worksheet.row_values(1), self.reintentos, hoja)
+        indices = [i for i, nombre in enumerate(encabezado) if columnas(_limpiar_nombre(nombre))]
+        if not indices:
+            return pd.DataFrame()
+        # Un rango por columna seleccionada; las celdas vacías al final de cada columna no se devuelven
+        rangos = _con_reintentos(
+            lambda: worksheet.batch_get([f'{_letra_columna(i)}2:{_letra_columna(i)}' for i in indices]),
+            self.reintentos, hoja)
+        filas = max((len(r) for r in rangos), default=0)
+        return pd.DataFrame({
+            encabezado[i]: [(r[k][0] if k < len(r) and r[k] else '') for k in range(filas)]
+            for i, r in zip(indices, rangos)
+        })
+
+    def _url_csv(self, hoja, consulta=None):
+        if self.sheet_gid:
+            return f'{self.url_base}/spreadsheets/d/{self.sheet_id}/export?format=csv&gid={self.sheet_gid}'
+        # codificar el nombre de la hoja para evitar espacios o caracteres especiales
+        sheet_name_enc = urllib.parse.quote(hoja, safe='')
+        url = f'{self.url_base}/spreadsheets/d/{self.sheet_id}/gviz/tq?tqx=out:csv&sheet={sheet_name_enc}'
+        if consulta:
+            url += '&tq=' + urllib.parse.quote(consulta, safe='')
+        return url
+
+    def _abrir(self, url):
+        """Respuesta HTTP abierta (para leerla por partes), con timeout y reintentos al conectar."""
+        return _con_reintentos(lambda: urllib.request.urlopen(url, timeout=self.timeout), self.reintentos, url)
+
+    def _descargar(self, url):
+        """Contenido de `url` con timeout y reintentos."""
+        def descargar():
+            with urllib.request.urlopen(url, timeout=self.timeout) as respuesta:
+                return respuesta.read()
+        return _con_reintentos(descargar, self.reintentos, url)
+
+    def _csv(self, url, **kwargs):
+        return pd.read_csv(io.BytesIO(self._descargar(url)), **kwargs)
+
+    def columnas(self, hoja=None):
+        if self.sheet_gid:
+            return list(self._csv(self._url_csv(hoja), nrows=0).columns)
+        return list(self._csv(self._url_csv(hoja, 'limit 0')).columns)
+
+    def _consulta_publica(self, hoja, columnas):
+        """(url, usecols) de la exportación pública con solo las columnas seleccionadas (url None si ninguna)."""
+        if columnas is None:
+            return self._url_csv(hoja), None
+        if self.sheet_gid:
+            # La exportación por gid no admite consultas: se descarga completa y solo se parsean las columnas usadas
+            return self._url_csv(hoja), (lambda c: columnas(_limpiar_nombre(c)))
+        encabezado = self.columnas(hoja)
+        letras = [_letra_columna(i) for i, nombre in enumerate(encabezado) if columnas(_limpiar_nombre(nombre))]
+        if not letras:
+            return None, None
+        return self._url_csv(hoja, 'select ' + ', '.join(letras)), None
+
+    def _leer_publica(self, hoja, columnas):
+        url, usecols = self._consulta_publica(hoja, columnas)
+        if url is None:
+            return pd.DataFrame()
+        return self._csv(url, usecols=usecols)
+
+    def leer(self, hoja=None, columnas=None):
+        # Intentar usar credenciales si existen
+        if os.path.exists(self.creds_path):
+            try:
+                df = self._proyectar(self._leer_api(hoja, columnas), columnas)
+                print(f"Cargada con credenciales: {hoja}")
+                return df
+            except Exception as e:
+                print("Aviso: no se pudieron usar credenciales (o falló gspread):", e)
+                # seguir a intentar lectura pública
+
+        # Leer versión pública como CSV
+        try:
+            df = self._proyectar(self._leer_publica(hoja, columnas), columnas)
+            print(f"Cargada públicamente: {hoja}")
+            return df
+        except Exception as e:
+            raise RuntimeError(f"No se pudo cargar la hoja '{hoja}' (credenciales o pública). Error: {e}")
+
+    def leer_bloques(self, hoja=None, columnas=None, filas=50000):
+        if os.path.exists(self.creds_path):
+            # La API entrega la pestaña completa: un solo bloque
+            yield self.leer(hoja, columnas)
+            return
+        # Exportación pública: el CSV se parsea a medida que llega, sin descargarlo completo primero
+        url, usecols = self._consulta_publica(hoja, columnas)
+        if url is None:
+            return
+        with self._abrir(url) as respuesta, pd.read_csv(respuesta, usecols=usecols, chunksize=filas) as lector:
+            for bloque in lector:
+                yield self._proyectar(bloque, columnas)
+        print(f"Cargada públicamente por bloques: {hoja}")
+
+    def leer_varias(self, hojas, columnas=None):
+        # Todas las pestañas a la vez: el tiempo total es el de la más lenta, no la suma
+        unicas = list(dict.fromkeys(hojas))
+        if len(unicas) == 1:
+            return super().leer_varias(unicas, columnas)
+        with ThreadPoolExecutor(max_workers=len(unicas)) as executor:
+            futuros = {hoja: executor.submit(self._leer_medido, hoja, columnas) for hoja in unicas}
+            return {hoja: _resultado(futuro) for hoja, futuro in futuros.items()}
+
+    def __str__(self):
+        return f'google:{self.sheet_id}'
+
+
+TIPOS = {
+    'google': lambda cfg: FuenteGoogle(cfg['sheet_id'], cfg.get('sheet_gid'), cfg.get('creds_path', 'credentials.json')),
+    'csv': lambda cfg: FuenteCSV(_ruta(cfg)),
+    'parquet': lambda cfg: FuenteParquet(_ruta(cfg)),
+    'sqlite': lambda cfg: FuenteSQLite(_ruta(cfg), cfg.get('tabla') or 'respuestas'),
+    'sintetico': lambda cfg: FuenteSintetica(cfg.get('sinteticos') or ''),
+}
+
+
+def _ruta(cfg):
+    if not cfg.get('ruta'):
+        raise ValueError("DATOS_RUTA es obligatoria para las fuentes csv, parquet y sqlite")
+    return cfg['ruta']
+
+
+def crear(tipo, **cfg):
+    """Fuente del tipo indicado ('google', 'csv', 'parquet', 'sqlite', 'sintetico')."""
+    if tipo not in TIPOS:
+        raise ValueError(f"Fuente de datos no soportada: {tipo} (opciones: {', '.join(TIPOS)})")
+    return TIPOS[tipo](cfg)
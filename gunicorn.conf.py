@@ -0,0 +1,18 @@
+"""
+Configuración de gunicorn para producción.
+
+Uso:
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Con preload_app el proceso maestro importa app.py (descarga y convierte la hoja
+una sola vez) y luego crea los workers por fork: todos comparten el dataset en
+memoria y ninguno vuelve a consultar Google al arrancar. Los reportes se
+generan aparte, con `python trabajos_reporte.py --trabajadores N`.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8051')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+preload_app = True
+timeout = 120
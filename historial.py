@@ -0,0 +1,268 @@
+"""
+Historial de ciclos de evaluación: particiones inmutables por ciclo con sus agregados.
+
+Las respuestas se reparten en ciclos por la columna de ciclo (datos_evaluacion.detectar_columna_ciclo)
+o, si no existe, por la marca temporal según CICLOS_PERIODO (anio, semestre, trimestre o mes). Cada
+ciclo se guarda en su propio directorio con el promedio de cada competencia por (evaluado, grupo de
+evaluadores), que basta para calcular los puntajes con cualquier ponderación. Los ciclos cerrados
+(todos menos el más reciente) se escriben una vez y no se vuelven a calcular, de modo que agregar un
+ciclo nuevo solo cuesta las respuestas de ese ciclo.
+
+Los ciclos se ordenan por la primera marca temporal de sus respuestas, así que las etiquetas pueden
+ser cualquier texto ('Ene-2025', 'Q4 2024'). Sin marca temporal se ordenan alfabéticamente, y entonces
+las etiquetas deben ordenarse como texto en orden cronológico (p. ej. '2024-2', '2025-1').
+
+Estructura:
+    <HISTORIAL_DIR>/ciclos.json                         ciclo -> partición vigente
+    <HISTORIAL_DIR>/<ciclo>.<huella>/meta.json          competencias, catálogos y rango de fechas
+    <HISTORIAL_DIR>/<ciclo>.<huella>/medias.npy         (evaluado, grupo) x competencias (float64)
+    <HISTORIAL_DIR>/<ciclo>.<huella>/evaluado.npy       código del evaluado de cada fila de medias (int32)
+    <HISTORIAL_DIR>/<ciclo>.<huella>/grupo.npy          código del grupo de cada fila de medias (int32)
+    <HISTORIAL_DIR>/<ciclo>.<huella>/conteo.npy         respuestas de cada (evaluado, grupo) (int32)
+"""
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+import almacenamiento
+import datos_evaluacion
+import metricas
+
+HISTORIAL_DIR = os.environ.get('HISTORIAL_DIR', os.path.join(almacenamiento.REPORTES_DIR, 'historial'))
+# Duración de un ciclo cuando se deduce de la marca temporal
+CICLOS_PERIODO = os.environ.get('CICLOS_PERIODO', 'semestre')
+PERIODOS = ('anio', 'semestre', 'trimestre', 'mes')
+# Respuestas sin ciclo ni fecha válida
+SIN_CICLO = 'sin-ciclo'
+
+
+def etiquetas_ciclo(dataset, periodo=None):
+    """Serie con el ciclo de cada respuesta del dataset, o None si no hay columna de ciclo ni marca temporal."""
+    df = dataset.df
+    if dataset.col_ciclo:
+        ciclos = df[dataset.col_ciclo].astype(str).str.strip()
+        return ciclos.where(df[dataset.col_ciclo].notna() & (ciclos != ''), SIN_CICLO)
+    if not dataset.col_timestamp:
+        return None
+
+    periodo = periodo or CICLOS_PERIODO
+    if periodo not in PERIODOS:
+        raise ValueError(f"CICLOS_PERIODO debe ser uno de {PERIODOS}: {periodo}")
+    fechas = _fechas(df[dataset.col_timestamp])
+
+    anio = fechas.dt.year.astype('Int64').astype(str)
+    mes = fechas.dt.month
+    if periodo == 'anio':
+        ciclos = anio
+    elif periodo == 'semestre':
+        ciclos = anio + '-S' + ((mes - 1) // 6 + 1).astype('Int64').astype(str)
+    elif periodo == 'trimestre':
+        ciclos = anio + '-T' + ((mes - 1) // 3 + 1).astype('Int64').astype(str)
+    else:
+        ciclos = anio + '-' + mes.astype('Int64').astype(str).str.zfill(2)
+    return ciclos.where(fechas.notna(), SIN_CICLO)
+
+
+def _fechas(marcas):
+    # Formato de los formularios de Google en español; el resto se interpreta con día primero
+    fechas = pd.to_datetime(marcas, format='%d/%m/%Y %H:%M:%S', errors='coerce')
+    faltan = fechas.isna() & marcas.notna()
+    if faltan.any():
+        fechas[faltan] = pd.to_datetime(marcas[faltan], format='mixed', dayfirst=True, errors='coerce')
+    return fechas
+
+
+def _cronologico(inicios):
+    """Ciclos de {ciclo: primera marca temporal en ISO o None} en orden cronológico (sin fecha, primero y por nombre)."""
+    return sorted(inicios, key=lambda ciclo: (inicios[ciclo] or '', ciclo))
+
+
+def _leer_indice(directorio):
+    try:
+        with open(os.path.join(directorio, 'ciclos.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def _guardar_indice(directorio, indice):
+    temporal = os.path.join(directorio, f'ciclos.json.{os.getpid()}.tmp')
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, os.path.join(directorio, 'ciclos.json'))
+
+
+def existe(directorio=HISTORIAL_DIR):
+    """True si el historial ya se construyó alguna vez (aunque no haya ciclos)."""
+    return _leer_indice(directorio) is not None
+
+
+@metricas.FASES.cronometrar(fase='historial')
+def actualizar(dataset, directorio=HISTORIAL_DIR):
+    """Escribe las particiones de los ciclos nuevos o abiertos; retorna el índice {ciclo: partición}.
+
+    Un ciclo cerrado que ya tiene partición no se vuelve a calcular. El ciclo más reciente (y las
+    respuestas sin ciclo) se reescriben solo si cambió su contenido.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    indice = _leer_indice(directorio) or {}
+    ciclos = etiquetas_ciclo(dataset)
+    if ciclos is None or not dataset.col_evaluado or not dataset.col_relacion:
+        print("Aviso: sin columna de ciclo ni marca temporal; no se actualiza el historial")
+        _guardar_indice(directorio, indice)
+        return indice
+
+    # El ciclo abierto es el que empezó último (no el último por nombre)
+    inicios = dict.fromkeys(set(ciclos.unique()) - {SIN_CICLO})
+    if dataset.col_timestamp:
+        primeras = _fechas(dataset.df[dataset.col_timestamp]).groupby(ciclos).min().dropna()
+        inicios.update({c: fecha.isoformat() for c, fecha in primeras.items() if c in inicios})
+    fechados = _cronologico(inicios)
+    abierto = fechados[-1] if fechados else None
+    nuevos = []
+    for ciclo, posiciones in ciclos.groupby(ciclos).indices.items():
+        if indice.get(ciclo, {}).get('cerrado') and ciclo != abierto:
+            continue
+        parte = dataset.df.iloc[posiciones]
+        huella = datos_evaluacion.calcular_version(parte)
+        cerrado = ciclo not in (abierto, SIN_CICLO)
+        if indice.get(ciclo, {}).get('huella') != huella:
+            particion = _escribir_particion(directorio, ciclo, parte, dataset, huella)
+            indice[ciclo] = {'particion': particion, 'huella': huella, 'filas': len(parte)}
+            nuevos.append(ciclo)
+        indice[ciclo]['cerrado'] = cerrado
+    _guardar_indice(directorio, dict(sorted(indice.items())))
+    _limpiar_particiones(directorio, indice)
+    if nuevos:
+        print(f"Historial: {len(nuevos)} ciclo(s) escritos ({', '.join(nuevos)}); {len(indice)} en total")
+    return indice
+
+
+def _escribir_particion(directorio, ciclo, parte, dataset, huella):
+    nombre = f"{re.sub(r'[^0-9A-Za-z_-]+', '_', ciclo)}.{huella}"
+    ruta = os.path.join(directorio, nombre)
+    if os.path.isdir(ruta):
+        return nombre
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    os.makedirs(temporal, exist_ok=True)
+
+    # Solo las competencias que se respondieron en el ciclo (las preguntas pueden cambiar entre ciclos)
+    comp_cols = [c for c in dataset.comp_cols if parte[c].notna().any()]
+    claves = [parte[dataset.col_evaluado], datos_evaluacion.grupos_relacion(parte[dataset.col_relacion])]
+    medias = parte[comp_cols].apply(pd.to_numeric, errors='coerce').groupby(claves).mean()
+    conteo = parte.groupby(claves).size().reindex(medias.index)
+    evaluado, evaluados = pd.factorize(medias.index.get_level_values(0))
+    grupo, grupos = pd.factorize(medias.index.get_level_values(1))
+
+    np.save(os.path.join(temporal, 'medias.npy'), np.ascontiguousarray(medias.to_numpy(dtype=np.float64)))
+    np.save(os.path.join(temporal, 'evaluado.npy'), evaluado.astype(np.int32))
+    np.save(os.path.join(temporal, 'grupo.npy'), grupo.astype(np.int32))
+    np.save(os.path.join(temporal, 'conteo.npy'), conteo.to_numpy(dtype=np.int32))
+    fechas = _fechas(parte[dataset.col_timestamp]) if dataset.col_timestamp else pd.Series(dtype='datetime64[ns]')
+    meta = {
+        'ciclo': ciclo,
+        'huella': huella,
+        'filas': len(parte),
+        'desde': None if fechas.isna().all() else fechas.min().isoformat(),
+        'hasta': None if fechas.isna().all() else fechas.max().isoformat(),
+        'comp_cols': comp_cols,
+        'evaluados': evaluados.tolist(),
+        'grupos': grupos.tolist(),
+    }
+    with open(os.path.join(temporal, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    try:
+        os.rename(temporal, ruta)
+    except OSError:
+        # Otro proceso escribió la misma partición al mismo tiempo
+        shutil.rmtree(temporal, ignore_errors=True)
+    return nombre
+
+
+def _limpiar_particiones(directorio, indice):
+    """Elimina las particiones reemplazadas (versiones anteriores del ciclo abierto)."""
+    vigentes = {entrada['particion'] for entrada in indice.values()}
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        if os.path.isdir(ruta) and nombre not in vigentes and not nombre.endswith('.tmp'):
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+class Particion:
+    """Agregados de un ciclo, abiertos en memory-map."""
+
+    def __init__(self, directorio, nombre):
+        ruta = os.path.join(directorio, nombre)
+        with open(os.path.join(ruta, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.ciclo = self.meta['ciclo']
+        self.comp_cols = self.meta['comp_cols']
+        self.categorias_comp = datos_evaluacion.categorizar_competencias_detallado(self.comp_cols)
+        self.medias = np.load(os.path.join(ruta, 'medias.npy'), mmap_mode='r')
+        self.evaluado = np.load(os.path.join(ruta, 'evaluado.npy'), mmap_mode='r')
+        self.grupo = np.load(os.path.join(ruta, 'grupo.npy'), mmap_mode='r')
+        self.conteo = np.load(os.path.join(ruta, 'conteo.npy'), mmap_mode='r')
+        self._codigo = {nombre: i for i, nombre in enumerate(self.meta['evaluados'])}
+
+    def puntajes(self, evaluado, weights_norm):
+        """Calificación final, promedio por categoría y evaluaciones del evaluado en el ciclo (None si no participó).
+
+        Misma regla que datos_evaluacion.score: suma ponderada de los promedios de cada grupo presente.
+        """
+        codigo = self._codigo.get(evaluado)
+        if codigo is None:
+            return None
+        filas = np.flatnonzero(self.evaluado == codigo)
+        final_por_comp = pd.Series(0.0, index=self.comp_cols)
+        for fila in filas:
+            peso = weights_norm.get(self.meta['grupos'][self.grupo[fila]], 0.0)
+            final_por_comp = final_por_comp + pd.Series(self.medias[fila], index=self.comp_cols).fillna(0) * peso
+        resultado = {'calificacion_final': final_por_comp.mean(), 'evaluadores': int(self.conteo[filas].sum())}
+        for categoria, comps_cat in self.categorias_comp.items():
+            resultado[categoria] = final_por_comp[comps_cat].mean()
+        return resultado
+
+
+# Las particiones son inmutables: se abren una vez por proceso
+_particiones = {}
+_particiones_lock = threading.Lock()
+
+
+def _abrir(directorio, nombre):
+    clave = (directorio, nombre)
+    with _particiones_lock:
+        if clave not in _particiones:
+            _particiones[clave] = Particion(directorio, nombre)
+        return _particiones[clave]
+
+
+def tendencia(evaluado, w_auto, w_jefe, w_colegas, w_sub, directorio=HISTORIAL_DIR):
+    """DataFrame (índice: ciclo, en orden) con la calificación y las categorías del evaluado en cada ciclo.
+
+    Solo incluye los ciclos en que el evaluado tiene respuestas; vacío sin historial.
+    """
+    pesos = [float(w or 0) for w in (w_auto, w_jefe, w_colegas, w_sub)]
+    total = sum(pesos)
+    indice = _leer_indice(directorio)
+    if not indice or total <= 0 or evaluado is None:
+        return pd.DataFrame()
+    weights_norm = {grupo: peso / total for grupo, peso in zip(datos_evaluacion.PONDERACIONES_DEFAULT, pesos)}
+    filas, inicios = {}, {}
+    for ciclo, entrada in indice.items():
+        if ciclo == SIN_CICLO:
+            continue
+        try:
+            particion = _abrir(directorio, entrada['particion'])
+        except OSError:
+            # Partición reemplazada por otro proceso entre la lectura del índice y su apertura
+            continue
+        puntajes = particion.puntajes(evaluado, weights_norm)
+        if puntajes is not None:
+            filas[ciclo] = puntajes
+            inicios[ciclo] = particion.meta.get('desde')
+    return pd.DataFrame.from_dict(filas, orient='index').reindex(_cronologico(inicios))
@@ -0,0 +1,204 @@
+"""
+Jerarquía de la organización (persona -> departamento -> división) y agregados por área.
+
+El mapeo es un CSV local (JERARQUIA_CSV) con una fila por persona:
+
+    evaluado,departamento,division
+    Ana López,Ventas Norte,Comercial
+
+Los agregados se construyen de abajo hacia arriba una vez por versión del dataset y
+ponderaciones (departamentos a partir de los evaluados, divisiones a partir de sus
+departamentos, empresa a partir de las divisiones), así que consultar cualquier nodo
+(promedios por categoría, distribución de cuadrantes 9-Box, personas) es un acceso a
+diccionario. Los promedios de un área son el promedio de los puntajes de sus evaluados.
+
+Uso:
+    import jerarquia
+    agregados = jerarquia.agregados(dataset, 5, 18, 30, 47)
+    ventas = agregados.nodo('departamento', 'Ventas Norte')
+    print(ventas.personas, ventas.calificacion, ventas.promedios, ventas.cuadrantes)
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+import datos_evaluacion
+import metricas
+
+JERARQUIA_CSV = os.environ.get('JERARQUIA_CSV')
+
+# Niveles de arriba hacia abajo (cada nodo se identifica por (nivel, nombre))
+EMPRESA = 'empresa'
+NIVELES = [EMPRESA, 'division', 'departamento']
+SIN_ASIGNAR = 'Sin asignar'
+
+# Nombres aceptados (normalizados) para las columnas del CSV
+_COLUMNAS = {
+    'evaluado': ['evaluado', 'persona', 'nombre', 'colaborador', 'nombre del colaborador evaluado'],
+    'departamento': ['departamento', 'area', 'equipo'],
+    'division': ['division', 'direccion', 'unidad de negocio'],
+}
+
+
+class Nodo:
+    """Un área de la jerarquía con sus agregados ya calculados."""
+
+    def __init__(self, nivel, nombre, padre, personas, calificacion, promedios, cuadrantes):
+        self.nivel = nivel
+        self.nombre = nombre
+        self.padre = padre
+        self.hijos = []
+        self.evaluados = []
+        self.personas = personas
+        self.calificacion = calificacion
+        self.promedios = promedios
+        self.cuadrantes = cuadrantes
+
+    @property
+    def clave(self):
+        return (self.nivel, self.nombre)
+
+
+class Agregados:
+    """Nodos de la jerarquía por (nivel, nombre), construidos de abajo hacia arriba."""
+
+    def __init__(self, organizacion, mapeo, categorias):
+        self.categorias = list(categorias)
+        self.nodos = {}
+        columnas = ['calificacion_final'] + self.categorias
+
+        # Departamento y división de cada evaluado (los que no están en el CSV quedan sin asignar)
+        claves = organizacion.index.map(datos_evaluacion.normalize_text)
+        departamento = pd.Series(claves.map(mapeo['departamento']), index=organizacion.index).fillna(SIN_ASIGNAR)
+        division = pd.Series(claves.map(mapeo['division']), index=organizacion.index).fillna(SIN_ASIGNAR)
+        division_de = self._division_de_departamento(departamento, division)
+
+        # Hojas: sumas, conteos y cuadrantes por departamento
+        sumas = organizacion[columnas].groupby(departamento).sum()
+        conteos = departamento.value_counts()
+        cuadrantes = pd.crosstab(departamento, organizacion['cuadrante'])
+        # Niveles superiores: a partir de los agregados del nivel inferior, sin volver a recorrer evaluados
+        por_nivel = {'departamento': (sumas, conteos, cuadrantes)}
+        por_nivel['division'] = tuple(agregado.groupby(agregado.index.map(division_de)).sum()
+                                      for agregado in (sumas, conteos, cuadrantes))
+        sumas_div, conteos_div, cuadrantes_div = por_nivel['division']
+        por_nivel[EMPRESA] = (sumas_div.sum().to_frame('Empresa').T, pd.Series({'Empresa': conteos_div.sum()}),
+                              cuadrantes_div.sum().to_frame('Empresa').T)
+
+        padres = {EMPRESA: lambda nombre: None, 'division': lambda nombre: (EMPRESA, 'Empresa'),
+                  'departamento': lambda nombre: ('division', division_de[nombre])}
+        for nivel in NIVELES:
+            sumas_nivel, conteos_nivel, cuadrantes_nivel = por_nivel[nivel]
+            for nombre in sorted(sumas_nivel.index, key=str):
+                personas = int(conteos_nivel[nombre])
+                medias = sumas_nivel.loc[nombre] / personas
+                nodo = Nodo(nivel, nombre, padres[nivel](nombre), personas, float(medias['calificacion_final']),
+                            {c: float(medias[c]) for c in self.categorias},
+                            {c: int(n) for c, n in cuadrantes_nivel.loc[nombre].items() if n})
+                self.nodos[nodo.clave] = nodo
+                if nodo.padre is not None:
+                    self.nodos[nodo.padre].hijos.append(nodo.clave)
+
+        # Evaluados de cada departamento (y de cada nivel superior, en el mismo orden que organizacion)
+        for nombre, evaluados in departamento.groupby(departamento).groups.items():
+            miembros = list(evaluados)
+            clave = ('departamento', nombre)
+            while clave is not None:
+                self.nodos[clave].evaluados.extend(miembros)
+                clave = self.nodos[clave].padre
+
+    @staticmethod
+    def _division_de_departamento(departamento, division):
+        """División de cada departamento (la más frecuente si el CSV asigna más de una)."""
+        pares = pd.crosstab(departamento, division)
+        division_de = pares.idxmax(axis=1).to_dict()
+        for nombre, fila in pares.iterrows():
+            if (fila > 0).sum() > 1:
+                print(f"Aviso: el departamento '{nombre}' aparece en varias divisiones; se usa '{division_de[nombre]}'")
+        return division_de
+
+    def nodo(self, nivel, nombre=None):
+        """Nodo (nivel, nombre), o None si no existe; nodo(EMPRESA) es la raíz."""
+        return self.nodos.get((nivel, 'Empresa' if nivel == EMPRESA else nombre))
+
+    def recorrido(self):
+        """Nodos en orden jerárquico (empresa, cada división seguida de sus departamentos)."""
+        pendientes = [(EMPRESA, 'Empresa')]
+        while pendientes:
+            nodo = self.nodos[pendientes.pop()]
+            yield nodo
+            pendientes.extend(reversed(nodo.hijos))
+
+
+def _columna(columnas, candidatos):
+    normalizadas = {datos_evaluacion.normalize_text(c): c for c in columnas}
+    return next((normalizadas[c] for c in candidatos if c in normalizadas), None)
+
+
+_mapeos = {}
+_mapeos_lock = threading.Lock()
+
+
+def cargar_mapeo(ruta=JERARQUIA_CSV):
+    """DataFrame (índice: nombre normalizado del evaluado) con departamento y division; None sin CSV.
+
+    Se relee solo si el archivo cambió.
+    """
+    if not ruta or not os.path.exists(ruta):
+        return None
+    modificado = os.path.getmtime(ruta)
+    with _mapeos_lock:
+        if ruta in _mapeos and _mapeos[ruta][0] == modificado:
+            return _mapeos[ruta][1]
+
+    crudo = pd.read_csv(ruta, dtype=str)
+    nombres = {clave: _columna(crudo.columns, candidatos) for clave, candidatos in _COLUMNAS.items()}
+    if nombres['evaluado'] is None or nombres['departamento'] is None:
+        raise ValueError(f"{ruta} debe tener columnas de evaluado y departamento (encontradas: {list(crudo.columns)})")
+    mapeo = pd.DataFrame({
+        'departamento': crudo[nombres['departamento']].str.strip(),
+        'division': crudo[nombres['division']].str.strip() if nombres['division'] else SIN_ASIGNAR,
+    })
+    mapeo.index = crudo[nombres['evaluado']].map(datos_evaluacion.normalize_text)
+    mapeo = mapeo[~mapeo.index.duplicated(keep='last')].fillna(SIN_ASIGNAR)
+    print(f"Jerarquía cargada: {ruta} ({len(mapeo)} personas, {mapeo['departamento'].nunique()} departamentos)")
+    with _mapeos_lock:
+        _mapeos[ruta] = (modificado, mapeo)
+    return mapeo
+
+
+# Agregados ya construidos, por (versión del dataset, ponderaciones normalizadas, archivo de jerarquía)
+_AGREGADOS = OrderedDict()
+_AGREGADOS_MAX = 16
+_agregados_lock = threading.Lock()
+
+
+def agregados(dataset, w_auto, w_jefe, w_colegas, w_sub, ruta=None):
+    """Agregados por área con las ponderaciones dadas; None sin jerarquía configurada o sin puntajes."""
+    ruta = ruta or JERARQUIA_CSV
+    mapeo = cargar_mapeo(ruta)
+    if mapeo is None:
+        return None
+    organizacion = datos_evaluacion.score_organizacion(dataset, w_auto, w_jefe, w_colegas, w_sub)
+    if organizacion is None or organizacion.empty:
+        return None
+
+    # score_organizacion retorna el mismo objeto mientras no cambien versión ni ponderaciones
+    clave = (dataset.version, id(organizacion), ruta, id(mapeo))
+    with _agregados_lock:
+        if clave in _AGREGADOS:
+            _AGREGADOS.move_to_end(clave)
+            metricas.CACHE.incrementar(cache='jerarquia', resultado='acierto')
+            return _AGREGADOS[clave][0]
+    metricas.CACHE.incrementar(cache='jerarquia', resultado='fallo')
+
+    with metricas.FASES.medir(fase='agregados_jerarquia'):
+        resultado = Agregados(organizacion, mapeo, dataset.categorias_comp)
+    with _agregados_lock:
+        # Se conservan organizacion y mapeo con el resultado: sus id() no se reutilizan mientras esté en caché
+        _AGREGADOS[clave] = (resultado, organizacion, mapeo)
+        while len(_AGREGADOS) > _AGREGADOS_MAX:
+            _AGREGADOS.popitem(last=False)
+    return resultado
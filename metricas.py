@@ -0,0 +1,286 @@
+"""
+Métricas de latencia y de caché en formato de texto de Prometheus.
+
+Cada proceso (workers web, trabajadores de reportes, generación masiva)
+acumula sus histogramas y contadores en memoria y los vuelca periódicamente a
+un archivo JSON propio en METRICAS_DIR; la ruta /metrics del dashboard suma
+los archivos de todos los procesos, de modo que las fases que corren fuera del
+worker web (gráficas, armado de PDF/Word) también aparecen.
+
+Uso:
+    with metricas.FASES.medir(fase='groupby'):
+        ...
+    @metricas.CALLBACKS.cronometrar(callback='actualizar_panel')
+    def actualizar_panel(...): ...
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import almacenamiento
+
+# Límites superiores (segundos) de los buckets de los histogramas
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+VOLCADO_SEG = float(os.environ.get('METRICAS_VOLCADO_SEG', '5'))
+MAX_EDAD_ARCHIVOS = float(os.environ.get('METRICAS_MAX_HORAS', '24')) * 3600
+
+_REGISTRO = []
+_lock = threading.Lock()
+_ultimo_volcado = 0.0
+
+
+def _directorio():
+    return os.environ.get('METRICAS_DIR', os.path.join(almacenamiento.REPORTES_DIR, 'metricas'))
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, descripcion, etiquetas):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = tuple(etiquetas)
+        self.valores = {}
+        _REGISTRO.append(self)
+
+    def _clave(self, etiquetas):
+        return tuple(str(etiquetas[e]) for e in self.etiquetas)
+
+    def _etiquetas_texto(self, clave, extra=()):
+        pares = list(zip(self.etiquetas, clave)) + list(extra)
+        if not pares:
+            return ''
+        return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in pares) + '}'
+
+
+class Contador(_Metrica):
+    """Contador monótono con etiquetas."""
+    tipo = 'counter'
+
+    def incrementar(self, valor=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with _lock:
+            self.valores[clave] = self.valores.get(clave, 0) + valor
+        _volcar_si_toca()
+
+    def _combinar(self, destino, valores):
+        for clave, valor in valores.items():
+            destino[clave] = destino.get(clave, 0) + valor
+
+    def _lineas(self, valores):
+        for clave, valor in sorted(valores.items()):
+            yield f'{self.nombre}{self._etiquetas_texto(clave)} {valor:g}'
+
+
+class Histograma(_Metrica):
+    """Histograma de duraciones en segundos (buckets BUCKETS)."""
+    tipo = 'histogram'
+
+    def observar(self, segundos, **etiquetas):
+        clave = self._clave(etiquetas)
+        with _lock:
+            # [conteo por bucket (no acumulado) ..., conteo > último bucket, suma, total]
+            estado = self.valores.setdefault(clave, [0] * (len(BUCKETS) + 1) + [0.0, 0])
+            indice = next((i for i, limite in enumerate(BUCKETS) if segundos <= limite), len(BUCKETS))
+            estado[indice] += 1
+            estado[-2] += segundos
+            estado[-1] += 1
+        _volcar_si_toca()
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Mide la duración del bloque (también si lanza una excepción)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def cronometrar(self, **etiquetas):
+        """Decorador equivalente a envolver la función en `medir`."""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.medir(**etiquetas):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    def _combinar(self, destino, valores):
+        for clave, estado in valores.items():
+            actual = destino.setdefault(clave, [0] * len(estado))
+            for i, v in enumerate(estado):
+                actual[i] += v
+
+    def _lineas(self, valores):
+        for clave, estado in sorted(valores.items()):
+            acumulado = 0
+            for limite, conteo in zip(BUCKETS + ('+Inf',), estado[:-2]):
+                acumulado += conteo
+                le = limite if limite == '+Inf' else f'{limite:g}'
+                yield f'{self.nombre}_bucket{self._etiquetas_texto(clave, [("le", le)])} {acumulado}'
+            yield f'{self.nombre}_sum{self._etiquetas_texto(clave)} {estado[-2]:.6f}'
+            yield f'{self.nombre}_count{self._etiquetas_texto(clave)} {estado[-1]}'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# --- Métricas del dashboard ---
+FASES = Histograma('dashboard360_fase_segundos',
+                   'Duración de cada fase de carga, cálculo y generación de reportes', ['fase'])
+CALLBACKS = Histograma('dashboard360_callback_segundos', 'Latencia de los callbacks de Dash', ['callback'])
+CACHE = Contador('dashboard360_cache_consultas_total', 'Consultas a cachés por resultado (acierto/fallo)',
+                 ['cache', 'resultado'])
+
+
+def _serializar():
+    with _lock:
+        return {m.nombre: [[list(clave), valor] for clave, valor in m.valores.items()] for m in _REGISTRO}
+
+
+def volcar():
+    """Escribe las métricas de este proceso en su archivo de METRICAS_DIR (escritura atómica)."""
+    global _ultimo_volcado
+    _ultimo_volcado = time.time()
+    directorio = _directorio()
+    os.makedirs(directorio, exist_ok=True)
+    _escribir(os.path.join(directorio, f'{os.getpid()}.json'), _serializar())
+
+
+def _escribir(ruta, datos):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f)
+    os.replace(temporal, ruta)
+
+
+def _volcar_si_toca():
+    if time.time() - _ultimo_volcado >= VOLCADO_SEG:
+        try:
+            volcar()
+        except OSError as e:
+            print('Aviso: no se pudieron guardar las métricas:', e)
+
+
+def _volcar_al_salir():
+    # Sin esperar VOLCADO_SEG: lo observado desde el último volcado se perdería
+    if any(m.valores for m in _REGISTRO):
+        try:
+            volcar()
+        except OSError as e:
+            print('Aviso: no se pudieron guardar las métricas:', e)
+
+
+def _reiniciar():
+    # En un proceso hijo (fork) las observaciones heredadas ya pertenecen al padre
+    global _ultimo_volcado
+    for m in _REGISTRO:
+        m.valores = {}
+    _ultimo_volcado = 0.0
+
+
+def _pid(nombre):
+    # '<pid>.json' (volcado de un proceso) o 'retirados-<pid>.json' (procesos terminados que sumó <pid>)
+    try:
+        return int(nombre[:-len('.json')].rsplit('-', 1)[-1])
+    except ValueError:
+        return None
+
+
+def _vivo(pid):
+    if os.name != 'posix':
+        # En Windows os.kill terminaría el proceso: se lo da por vivo
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _retirar(directorio, archivos):
+    """Suma a retirados-<pid>.json los archivos de procesos terminados y sin cambios en MAX_EDAD_ARCHIVOS.
+
+    Borrarlos haría bajar los totales combinados, que Prometheus toma como un reinicio de los contadores;
+    los de procesos vivos (aunque estén inactivos) no se tocan.
+    """
+    propio = os.path.join(directorio, f'retirados-{os.getpid()}.json')
+    retirados = None
+    for nombre in archivos:
+        pid = _pid(nombre)
+        if not nombre.endswith('.json') or pid is None or pid == os.getpid():
+            continue
+        ruta = os.path.join(directorio, nombre)
+        try:
+            if time.time() - os.path.getmtime(ruta) <= MAX_EDAD_ARCHIVOS or _vivo(pid):
+                continue
+            # El renombrado es atómico: si otro proceso lo está retirando, falla aquí
+            reclamado = f'{ruta}.{os.getpid()}.retirando'
+            os.rename(ruta, reclamado)
+            with open(reclamado, encoding='utf-8') as f:
+                datos = json.load(f)
+            if retirados is None:
+                try:
+                    with open(propio, encoding='utf-8') as f:
+                        retirados = json.load(f)
+                except FileNotFoundError:
+                    retirados = {}
+        except (OSError, ValueError):
+            continue
+        for m in _REGISTRO:
+            acumulado = {tuple(c): v for c, v in retirados.get(m.nombre, [])}
+            m._combinar(acumulado, {tuple(c): v for c, v in datos.get(m.nombre, [])})
+            retirados[m.nombre] = [[list(c), v] for c, v in acumulado.items()]
+        _escribir(propio, retirados)
+        os.remove(reclamado)
+
+
+def exportar():
+    """Métricas de todos los procesos en formato de texto de Prometheus."""
+    combinadas = {m.nombre: {} for m in _REGISTRO}
+    propias = _serializar()
+    directorio = _directorio()
+    if os.path.isdir(directorio):
+        _retirar(directorio, os.listdir(directorio))
+    archivos = os.listdir(directorio) if os.path.isdir(directorio) else []
+    for nombre in archivos:
+        ruta = os.path.join(directorio, nombre)
+        if not nombre.endswith('.json') or nombre == f'{os.getpid()}.json':
+            continue
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for m in _REGISTRO:
+            m._combinar(combinadas[m.nombre], {tuple(c): v for c, v in datos.get(m.nombre, [])})
+    for m in _REGISTRO:
+        m._combinar(combinadas[m.nombre], {tuple(c): v for c, v in propias[m.nombre]})
+
+    lineas = []
+    for m in _REGISTRO:
+        lineas += [f'# HELP {m.nombre} {m.descripcion}', f'# TYPE {m.nombre} {m.tipo}']
+        lineas += list(m._lineas(combinadas[m.nombre]))
+
+    # Proporción de aciertos por caché, calculada sobre los contadores combinados
+    totales = {}
+    for (cache, resultado), valor in combinadas[CACHE.nombre].items():
+        aciertos, total = totales.get(cache, (0, 0))
+        totales[cache] = (aciertos + (valor if resultado == 'acierto' else 0), total + valor)
+    lineas += ['# HELP dashboard360_cache_ratio_aciertos Proporción de consultas a la caché resueltas sin regenerar',
+               '# TYPE dashboard360_cache_ratio_aciertos gauge']
+    for cache, (aciertos, total) in sorted(totales.items()):
+        lineas.append(f'dashboard360_cache_ratio_aciertos{{cache="{_escapar(cache)}"}} {aciertos / total if total else 0:g}')
+    return '\n'.join(lineas) + '\n'
+
+
+os.register_at_fork(after_in_child=_reiniciar)
+atexit.register(_volcar_al_salir)
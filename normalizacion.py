@@ -0,0 +1,166 @@
+"""
+Corrección del sesgo de los evaluadores (indulgencia o severidad) con estadísticas de todo el dataset.
+
+Algunos evaluadores califican a todos con 5 y otros a todos con 2: con los promedios crudos el puntaje
+de una persona depende de quién le tocó evaluarla. Con NORMALIZACION_EVALUADORES (ver datos_evaluacion)
+se estima el sesgo de cada evaluador a partir de todas sus respuestas y se corrigen las respuestas antes
+de calcular cualquier puntaje:
+
+    aditiva   x' = x - (media del evaluador - media global)
+    z         x' = media global + (x - media del evaluador) * desviación global / desviación del evaluador
+
+La media y la dispersión de cada evaluador se contraen hacia las globales con NORMALIZACION_PREVIA
+(también en datos_evaluacion) respuestas "ficticias" con los valores globales, para que quien respondió
+pocas veces no quede corregido por completo. Los resultados se limitan al rango de la escala Likert.
+
+Las estadísticas son sumas (respuestas, suma y suma de cuadrados por evaluador), así que se mantienen
+de forma incremental: el estado en NORMALIZACION_DIR recuerda qué filas ya se contaron (por su huella) y
+al llegar respuestas nuevas solo se suman esas filas (y se restan las que desaparecieron de la hoja).
+
+Estructura:
+    <NORMALIZACION_DIR>/estado.npz    catálogo de evaluadores, totales por evaluador y aporte de cada fila
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import almacenamiento
+import datos_evaluacion
+import metricas
+
+NORMALIZACION_DIR = os.environ.get('NORMALIZACION_DIR', os.path.join(almacenamiento.REPORTES_DIR, 'normalizacion'))
+MODOS = ('aditiva', 'z')
+ESCALA = (min(datos_evaluacion.LIKERT_MAP.values()), max(datos_evaluacion.LIKERT_MAP.values()))
+
+
+class Estadisticas:
+    """Respuestas, suma y suma de cuadrados por evaluador, con la huella y el aporte de cada fila contada."""
+
+    def __init__(self, evaluadores=(), claves=None, codigos=None, aportes=None, totales=None):
+        self.evaluadores = list(evaluadores)
+        self.claves = np.empty(0, dtype=np.uint64) if claves is None else claves
+        self.codigos = np.empty(0, dtype=np.int64) if codigos is None else codigos
+        # Columnas de aportes y totales: respuestas, suma, suma de cuadrados
+        self.aportes = np.empty((0, 3)) if aportes is None else aportes
+        self.totales = np.zeros((len(self.evaluadores), 3)) if totales is None else totales
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Estado guardado en `ruta`, o uno vacío si no existe o no se puede leer."""
+        try:
+            with np.load(ruta, allow_pickle=False) as estado:
+                return cls(estado['evaluadores'].tolist(), estado['claves'], estado['codigos'],
+                           estado['aportes'], estado['totales'])
+        except (OSError, KeyError, ValueError):
+            return cls()
+
+    def guardar(self, ruta):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f'{ruta}.{os.getpid()}.tmp.npz'
+        np.savez(temporal, evaluadores=np.array(self.evaluadores, dtype=str), claves=self.claves,
+                 codigos=self.codigos, aportes=self.aportes, totales=self.totales)
+        os.replace(temporal, ruta)
+
+    def codigos_de(self, evaluadores):
+        """Código de cada evaluador (los nuevos se agregan al catálogo)."""
+        codigos = pd.Index(self.evaluadores, dtype=object).get_indexer(evaluadores)
+        faltan = pd.unique(evaluadores[codigos < 0])
+        if len(faltan):
+            self.evaluadores.extend(faltan)
+            self.totales = np.vstack([self.totales, np.zeros((len(faltan), 3))])
+            codigos = pd.Index(self.evaluadores, dtype=object).get_indexer(evaluadores)
+        return codigos
+
+    def _acumular(self, codigos, aportes, signo):
+        for j in range(3):
+            self.totales[:, j] += signo * np.bincount(codigos, aportes[:, j], minlength=len(self.totales))
+
+    def actualizar(self, claves, evaluadores, valores):
+        """Suma las filas que no estaban contadas y resta las que ya no están; retorna (sumadas, restadas)."""
+        nuevas = ~np.isin(claves, self.claves)
+        quitadas = ~np.isin(self.claves, claves)
+        if quitadas.any():
+            self._acumular(self.codigos[quitadas], self.aportes[quitadas], -1)
+            self.claves, self.codigos, self.aportes = (self.claves[~quitadas], self.codigos[~quitadas],
+                                                       self.aportes[~quitadas])
+        if nuevas.any():
+            codigos = self.codigos_de(evaluadores[nuevas])
+            respondidas = ~np.isnan(valores[nuevas])
+            x = np.where(respondidas, valores[nuevas], 0.0)
+            aportes = np.column_stack([respondidas.sum(axis=1), x.sum(axis=1), (x * x).sum(axis=1)])
+            self._acumular(codigos, aportes, 1)
+            self.claves = np.concatenate([self.claves, claves[nuevas]])
+            self.codigos = np.concatenate([self.codigos, codigos])
+            self.aportes = np.concatenate([self.aportes, aportes])
+        return int(nuevas.sum()), int(quitadas.sum())
+
+    def correccion(self, modo, previa):
+        """(media global, centro, escala por evaluador): x' = media + (x - centro) * escala."""
+        n, suma, cuadrados = self.totales.T
+        total = max(n.sum(), 1.0)
+        media = suma.sum() / total
+        varianza = max(cuadrados.sum() / total - media ** 2, 0.0)
+
+        # Media y segundo momento de cada evaluador, contraídos hacia los globales
+        peso = np.maximum(n + previa, 1e-12)
+        centro = (suma + previa * media) / peso
+        escala = np.ones(len(n))
+        if modo == 'z':
+            varianza_evaluador = (cuadrados + previa * (varianza + media ** 2)) / peso - centro ** 2
+            escala = np.sqrt(varianza / np.maximum(varianza_evaluador, 1e-9))
+        # Respuestas sin evaluador identificado: sin corrección
+        if '' in self.evaluadores:
+            sin_nombre = self.evaluadores.index('')
+            centro[sin_nombre], escala[sin_nombre] = media, 1.0
+        return media, centro, escala
+
+
+def _claves_filas(df, columnas):
+    # Huella de cada fila más su número de aparición (las respuestas duplicadas se cuentan todas)
+    filas = pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+    ocurrencia = pd.Series(filas).groupby(filas).cumcount().to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame({'fila': filas, 'ocurrencia': ocurrencia}), index=False).to_numpy()
+
+
+@metricas.FASES.cronometrar(fase='normalizacion')
+def aplicar(dataset, modo=None, directorio=NORMALIZACION_DIR, previa=None):
+    """Dataset con las respuestas corregidas por el sesgo de cada evaluador (mismas columnas y metadatos).
+
+    Retorna el mismo dataset si no tiene columna de evaluador.
+    """
+    modo = modo or datos_evaluacion.NORMALIZACION_EVALUADORES
+    if modo not in MODOS:
+        raise ValueError(f"NORMALIZACION_EVALUADORES debe ser uno de {MODOS}: {modo}")
+    if not dataset.col_evaluador or not dataset.col_evaluado or not dataset.col_relacion:
+        print("Aviso: no hay columna de evaluador; los puntajes no se normalizan")
+        return dataset
+    previa = datos_evaluacion.NORMALIZACION_PREVIA if previa is None else previa
+
+    df, comp_cols = dataset.df, dataset.comp_cols
+    nombres = df[dataset.col_evaluador]
+    evaluadores = nombres.map({n: datos_evaluacion.normalize_text(n) for n in nombres.dropna().unique()})
+    evaluadores = evaluadores.fillna('').to_numpy(dtype=object)
+    valores = df[comp_cols].to_numpy(dtype=np.float64)
+    claves = _claves_filas(df, [dataset.col_evaluador, dataset.col_evaluado, dataset.col_relacion] + comp_cols)
+
+    ruta = os.path.join(directorio, 'estado.npz')
+    estadisticas = Estadisticas.cargar(ruta)
+    sumadas, restadas = estadisticas.actualizar(claves, evaluadores, valores)
+    if sumadas or restadas:
+        estadisticas.guardar(ruta)
+
+    # Corrección de todas las respuestas en una sola operación sobre la matriz
+    codigos = estadisticas.codigos_de(evaluadores)
+    media, centro, escala = estadisticas.correccion(modo, previa)
+    corregidos = np.clip(media + (valores - centro[codigos, None]) * escala[codigos, None], *ESCALA)
+    normalizado = df.copy()
+    normalizado[comp_cols] = corregidos
+    print(f"Normalización de evaluadores ({modo}): {len(estadisticas.evaluadores)} evaluadores, "
+          f"{sumadas} filas nuevas, {restadas} retiradas")
+
+    return datos_evaluacion.Dataset(
+        normalizado, dataset.col_evaluado, dataset.col_relacion, comp_cols,
+        datos_evaluacion.calcular_version(normalizado), huella=dataset.huella, col_timestamp=dataset.col_timestamp,
+        col_ciclo=dataset.col_ciclo, col_evaluador=dataset.col_evaluador, normalizacion=modo,
+    )
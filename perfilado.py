@@ -0,0 +1,208 @@
+"""
+Perfilado bajo demanda de callbacks, cargas de datos y trabajos de reporte.
+
+Desactivado por defecto. Se activa:
+  - para todo el proceso con PERFILADO=1, o
+  - para un navegador: abrir el dashboard con ?perfilar=<PERFILADO_TOKEN> (queda en una cookie
+    hasta visitar ?perfilar=0), o para una petición suelta con el encabezado X-Perfilar: <token>.
+
+Cada llamada perfilada que tarde al menos PERFILADO_MIN_MS se guarda en PERFILADO_DIR:
+  - PERFILADO_MODO=muestreo (por defecto): muestreador de pilas cada PERFILADO_INTERVALO_MS,
+    con poca sobrecarga; archivo .speedscope.json (abrir en https://www.speedscope.app).
+  - PERFILADO_MODO=determinista: cProfile; archivo .pstats (python -m pstats, snakeviz).
+Al superar PERFILADO_MAX_MB se eliminan los perfiles más antiguos.
+"""
+import functools
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+import almacenamiento
+
+PERFILADO = os.environ.get('PERFILADO', '0') == '1'
+PERFILADO_TOKEN = os.environ.get('PERFILADO_TOKEN')
+PERFILADO_MODO = os.environ.get('PERFILADO_MODO', 'muestreo')
+PERFILADO_MIN_MS = float(os.environ.get('PERFILADO_MIN_MS', '0'))
+PERFILADO_INTERVALO_MS = float(os.environ.get('PERFILADO_INTERVALO_MS', '5'))
+PERFILADO_MAX_MB = float(os.environ.get('PERFILADO_MAX_MB', '100'))
+
+# Nombre de la cookie / parámetro / encabezado que activan el perfilado de un navegador o petición
+PARAMETRO = 'perfilar'
+ENCABEZADO = 'X-Perfilar'
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def directorio():
+    return os.environ.get('PERFILADO_DIR', os.path.join(almacenamiento.REPORTES_DIR, 'perfiles'))
+
+
+def token_valido(valor):
+    """True si `valor` coincide con PERFILADO_TOKEN (comparación en tiempo constante)."""
+    return bool(PERFILADO_TOKEN and valor) and hmac.compare_digest(str(valor), PERFILADO_TOKEN)
+
+
+def activo():
+    """True si la llamada actual debe perfilarse (variable de entorno o petición web con el token)."""
+    if PERFILADO:
+        return True
+    if not PERFILADO_TOKEN or 'flask' not in sys.modules:
+        return False
+    from flask import has_request_context, request
+    if not has_request_context():
+        return False
+    return any(token_valido(v) for v in (request.headers.get(ENCABEZADO), request.cookies.get(PARAMETRO),
+                                         request.args.get(PARAMETRO)))
+
+
+class Muestreador:
+    """Perfilador por muestreo: un hilo toma la pila del hilo perfilado cada `intervalo` segundos."""
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.hilo = threading.get_ident()
+        self.frames = []
+        self._indices = {}
+        self.muestras = []
+        self.pesos = []
+        self._detener = threading.Event()
+
+    def _indice(self, codigo):
+        clave = (codigo.co_name, codigo.co_filename, codigo.co_firstlineno)
+        if clave not in self._indices:
+            self._indices[clave] = len(self.frames)
+            self.frames.append({'name': codigo.co_name, 'file': codigo.co_filename, 'line': codigo.co_firstlineno})
+        return self._indices[clave]
+
+    def _muestrear(self):
+        anterior = time.perf_counter()
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo)
+            ahora = time.perf_counter()
+            pila = []
+            while frame is not None:
+                pila.append(self._indice(frame.f_code))
+                frame = frame.f_back
+            if pila:
+                self.muestras.append(pila[::-1])
+                self.pesos.append(ahora - anterior)
+            anterior = ahora
+
+    def iniciar(self):
+        self.inicio = time.perf_counter()
+        self._hilo_muestreo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo_muestreo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._hilo_muestreo.join()
+        self.duracion = time.perf_counter() - self.inicio
+
+    def guardar(self, ruta, nombre):
+        perfil = {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': nombre,
+            'exporter': 'dashboard360 perfilado.py',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled', 'name': nombre, 'unit': 'seconds',
+                'startValue': 0, 'endValue': self.duracion,
+                'samples': self.muestras, 'weights': self.pesos,
+            }],
+        }
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(perfil, f)
+
+
+class Determinista:
+    """Perfilador determinista (cProfile)."""
+
+    def __init__(self):
+        import cProfile
+        self.perfil = cProfile.Profile()
+
+    def iniciar(self):
+        self.inicio = time.perf_counter()
+        self.perfil.enable()
+
+    def detener(self):
+        self.perfil.disable()
+        self.duracion = time.perf_counter() - self.inicio
+
+    def guardar(self, ruta, nombre):
+        self.perfil.dump_stats(ruta)
+
+
+def _nuevo_perfilador():
+    if PERFILADO_MODO == 'determinista':
+        return Determinista(), 'pstats'
+    if PERFILADO_MODO == 'muestreo':
+        return Muestreador(PERFILADO_INTERVALO_MS / 1000), 'speedscope.json'
+    raise ValueError(f"PERFILADO_MODO no soportado: {PERFILADO_MODO}")
+
+
+def _rotar(carpeta, max_bytes):
+    """Elimina los perfiles más antiguos hasta que la carpeta ocupe como máximo `max_bytes`."""
+    archivos = []
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        try:
+            st = os.stat(ruta)
+        except OSError:
+            continue
+        archivos.append((st.st_mtime, st.st_size, ruta))
+    total = sum(tam for _, tam, _ in archivos)
+    for _, tam, ruta in sorted(archivos):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+        total -= tam
+
+
+def perfilar(nombre, etiqueta=None):
+    """Decorador: perfila la función cuando `activo()`; `etiqueta(*args, **kwargs)` agrega contexto al archivo."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            # Sin perfilado activo, o ya dentro de otra llamada perfilada del mismo hilo: llamada directa
+            if getattr(_local, 'perfilando', False) or not activo():
+                return funcion(*args, **kwargs)
+            perfilador, extension = _nuevo_perfilador()
+            _local.perfilando = True
+            perfilador.iniciar()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                perfilador.detener()
+                _local.perfilando = False
+                if perfilador.duracion * 1000 >= PERFILADO_MIN_MS:
+                    _guardar(perfilador, extension, nombre, etiqueta(*args, **kwargs) if etiqueta else None)
+        return envoltura
+    return decorador
+
+
+def _guardar(perfilador, extension, nombre, etiqueta):
+    carpeta = directorio()
+    partes = [datetime.now().strftime('%Y%m%d-%H%M%S-%f'), nombre, str(os.getpid()),
+              f'{perfilador.duracion * 1000:.0f}ms']
+    if etiqueta:
+        partes.insert(2, re.sub(r'[^\w.-]+', '_', str(etiqueta))[:60])
+    titulo = '_'.join(partes)
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, f'{titulo}.{extension}')
+        perfilador.guardar(ruta, titulo)
+        with _lock:
+            _rotar(carpeta, PERFILADO_MAX_MB * 1024 * 1024)
+        print(f"Perfil guardado: {ruta}")
+    except OSError as e:
+        print('Aviso: no se pudo guardar el perfil:', e)
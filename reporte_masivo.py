@@ -0,0 +1,176 @@
+"""
+Generación masiva de reportes 360° (PDF y Word) para todos los evaluados.
+
+Uso:
+    python reporte_masivo.py --salida reportes/            # un archivo por reporte
+    python reporte_masivo.py --salida reportes.zip         # todo en un ZIP
+    python reporte_masivo.py --salida reportes.zip --formatos pdf --procesos 8
+
+Los reportes se generan en paralelo en varios procesos y se escriben en la
+salida conforme terminan. Si la ejecución se interrumpe, al volver a correrla
+con la misma salida se omiten los reportes que ya existen.
+"""
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import datos_evaluacion
+import utils_reporte
+
+
+# Dataset cargado por generar_todos antes de crear los procesos: con 'fork' se hereda ya
+# convertido; con 'spawn' cada proceso lo carga una vez en su primera tarea.
+_dataset = None
+
+
+def _obtener_dataset():
+    global _dataset
+    if _dataset is None:
+        _dataset = datos_evaluacion.load()
+    return _dataset
+
+
+def _generar_reportes_evaluado(evaluado, formatos, pesos):
+    """Tarea de un proceso trabajador: genera los formatos pedidos de un evaluado."""
+    datos = datos_evaluacion.score(_obtener_dataset(), evaluado, *pesos)
+    if datos is None or 'error' in datos:
+        msg = datos.get('error', 'Sin datos') if datos else 'Sin datos'
+        raise RuntimeError(f"No se pudieron calcular los datos de '{evaluado}': {msg}")
+
+    # Las imágenes se generan una sola vez y se comparten entre PDF y Word
+    imagenes = utils_reporte.generar_imagenes_matplotlib(datos)
+    resultados = {}
+    for formato in formatos:
+        buffer = utils_reporte.generar_reporte(datos, formato, imagenes=imagenes)
+        if buffer is None:
+            raise RuntimeError(f"La generación {formato} de '{evaluado}' retornó None")
+        resultados[formato] = buffer.getvalue()
+    return resultados
+
+
+class _SalidaDirectorio:
+    """Escribe cada reporte como archivo dentro de un directorio."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        os.makedirs(ruta, exist_ok=True)
+
+    def existentes(self):
+        return set(os.listdir(self.ruta))
+
+    def escribir(self, nombre, contenido):
+        # Escritura atómica: un archivo a medias nunca cuenta como terminado
+        destino = os.path.join(self.ruta, nombre)
+        temporal = destino + '.tmp'
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, destino)
+
+    def cerrar(self):
+        pass
+
+
+class _SalidaZip:
+    """Agrega cada reporte a un archivo ZIP (en modo 'append' para reanudar)."""
+
+    def __init__(self, ruta):
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        try:
+            self.zip = zipfile.ZipFile(ruta, 'a', compression=zipfile.ZIP_STORED)
+        except zipfile.BadZipFile:
+            raise RuntimeError(f"El ZIP '{ruta}' está dañado (¿ejecución interrumpida abruptamente?). "
+                               "Elimínalo o usa un directorio como salida.")
+
+    def existentes(self):
+        return set(self.zip.namelist())
+
+    def escribir(self, nombre, contenido):
+        # PDF y DOCX ya vienen comprimidos; ZIP_STORED evita recomprimirlos
+        self.zip.writestr(nombre, contenido)
+
+    def cerrar(self):
+        self.zip.close()
+
+
+def _pendientes(evaluados, formatos, existentes):
+    """Retorna {evaluado: [formatos faltantes]} omitiendo lo ya generado."""
+    pendientes = {}
+    for evaluado in evaluados:
+        faltan = [f for f in formatos if utils_reporte.nombre_archivo_reporte(evaluado, f) not in existentes]
+        if faltan:
+            pendientes[evaluado] = faltan
+    return pendientes
+
+
+def generar_todos(salida, formatos=('pdf', 'docx'), pesos=None, procesos=None, evaluados=None):
+    """Genera los reportes de todos los evaluados en paralelo. Retorna el número de fallos."""
+    if pesos is None:
+        pesos = tuple(datos_evaluacion.PONDERACIONES_DEFAULT[g] for g in ('Autoevaluación', 'Jefe Inmediato', 'Colegas', 'Subordinados'))
+    if evaluados is None:
+        evaluados = _obtener_dataset().evaluados
+
+    destino = _SalidaZip(salida) if salida.lower().endswith('.zip') else _SalidaDirectorio(salida)
+    fallos = 0
+    try:
+        pendientes = _pendientes(evaluados, formatos, destino.existentes())
+        omitidos = len(evaluados) - len(pendientes)
+        if omitidos:
+            print(f"Reanudando: {omitidos} evaluados ya tienen todos sus reportes en '{salida}'.")
+        if not pendientes:
+            print("No hay reportes pendientes.")
+            return 0
+
+        total = len(pendientes)
+        _obtener_dataset()
+        print(f"Generando reportes de {total} evaluados ({', '.join(formatos)}) con {procesos or os.cpu_count()} procesos...")
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            futuros = {
+                executor.submit(_generar_reportes_evaluado, evaluado, faltan, pesos): evaluado
+                for evaluado, faltan in pendientes.items()
+            }
+            for hechos, futuro in enumerate(as_completed(futuros), start=1):
+                evaluado = futuros[futuro]
+                try:
+                    for formato, contenido in futuro.result().items():
+                        destino.escribir(utils_reporte.nombre_archivo_reporte(evaluado, formato), contenido)
+                    estado = 'ok'
+                except Exception as e:
+                    fallos += 1
+                    estado = f'ERROR: {e}'
+                transcurrido = time.perf_counter() - inicio
+                restante = transcurrido / hechos * (total - hechos)
+                print(f"[{hechos}/{total}] {evaluado}: {estado} "
+                      f"({transcurrido:.0f}s transcurridos, ~{restante:.0f}s restantes)", flush=True)
+    finally:
+        destino.cerrar()
+
+    print(f"Listo: {total - fallos} evaluados generados, {fallos} con error.")
+    return fallos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los reportes 360° de todos los evaluados.")
+    parser.add_argument('--salida', required=True,
+                        help="Directorio de salida, o ruta terminada en .zip para empaquetar los reportes")
+    parser.add_argument('--formatos', nargs='+', choices=sorted(utils_reporte.FORMATOS_REPORTE), default=['pdf', 'docx'],
+                        help="Formatos a generar (por defecto: pdf docx)")
+    parser.add_argument('--procesos', type=int, default=None,
+                        help="Número de procesos trabajadores (por defecto: núcleos de CPU)")
+    parser.add_argument('--pesos', type=float, nargs=4, metavar=('AUTO', 'JEFE', 'COLEGAS', 'SUB'), default=None,
+                        help="Ponderaciones (%%) por grupo; por defecto las del dashboard")
+    parser.add_argument('--evaluado', action='append', dest='evaluados', default=None,
+                        help="Limitar a este evaluado (se puede repetir)")
+    args = parser.parse_args(argv)
+
+    fallos = generar_todos(args.salida, formatos=args.formatos, pesos=args.pesos,
+                           procesos=args.procesos, evaluados=args.evaluados)
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
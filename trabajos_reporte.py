@@ -0,0 +1,227 @@
+"""
+Cola de trabajos de reporte respaldada en SQLite.
+
+El callback de descarga solo encola un trabajo y regresa de inmediato; uno o
+más procesos trabajadores (fuera de los workers web) generan el PDF/Word y lo
+dejan en la caché de reportes (cache_reportes). El dashboard consulta el
+estado por ID hasta que el archivo está listo y entonces lo descarga.
+
+Trabajadores dedicados (recomendado en producción):
+    python trabajos_reporte.py --trabajadores 2
+
+Si no se inician por separado, app.py arranca REPORTES_TRABAJADORES procesos
+(1 por defecto) junto con el servidor de desarrollo.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+
+import almacenamiento
+import cache_reportes
+import metricas
+import perfilado
+import utils_reporte
+
+REPORTES_DIR = almacenamiento.REPORTES_DIR
+
+# Estados de un trabajo
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+TERMINADO = 'terminado'
+ERROR = 'error'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    evaluado TEXT NOT NULL,
+    formato TEXT NOT NULL,
+    pesos TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    progreso INTEGER NOT NULL DEFAULT 0,
+    mensaje TEXT,
+    ruta TEXT,
+    creado REAL NOT NULL,
+    actualizado REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, creado);
+"""
+
+
+class ColaTrabajos:
+    """Cola de trabajos de reporte persistida en un archivo SQLite compartido entre procesos."""
+
+    def __init__(self, directorio=REPORTES_DIR):
+        self.directorio = directorio
+        self.ruta_db = os.path.join(directorio, 'trabajos.sqlite3')
+        os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as con:
+            con.execute('PRAGMA journal_mode=WAL')
+            con.executescript(_ESQUEMA)
+
+    @contextmanager
+    def _conectar(self):
+        # Una conexión por operación: seguro entre hilos y procesos
+        con = sqlite3.connect(self.ruta_db, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def encolar(self, evaluado, formato, pesos):
+        """Registra un trabajo pendiente y retorna su ID."""
+        if formato not in utils_reporte.FORMATOS_REPORTE:
+            raise ValueError(f"Formato de reporte no soportado: {formato}")
+        trabajo_id = uuid.uuid4().hex
+        ahora = time.time()
+        with self._conectar() as con:
+            con.execute(
+                'INSERT INTO trabajos (id, evaluado, formato, pesos, estado, mensaje, creado, actualizado) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (trabajo_id, evaluado, formato, json.dumps(list(pesos)), PENDIENTE, 'En cola', ahora, ahora))
+        return trabajo_id
+
+    def obtener(self, trabajo_id):
+        """Retorna el trabajo como dict, o None si no existe."""
+        with self._conectar() as con:
+            fila = con.execute('SELECT * FROM trabajos WHERE id = ?', (trabajo_id,)).fetchone()
+        return self._a_dict(fila)
+
+    def reclamar(self, abandono=300):
+        """Toma el trabajo pendiente más antiguo (atómicamente) y lo marca en proceso."""
+        ahora = time.time()
+        with self._conectar() as con:
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                # Trabajos cuyo trabajador murió sin terminarlos vuelven a la cola
+                con.execute('UPDATE trabajos SET estado = ?, progreso = 0 WHERE estado = ? AND actualizado < ?',
+                            (PENDIENTE, EN_PROCESO, ahora - abandono))
+                fila = con.execute('SELECT * FROM trabajos WHERE estado = ? ORDER BY creado LIMIT 1',
+                                   (PENDIENTE,)).fetchone()
+                if fila is not None:
+                    con.execute('UPDATE trabajos SET estado = ?, mensaje = ?, actualizado = ? WHERE id = ?',
+                                (EN_PROCESO, 'Iniciando', ahora, fila['id']))
+                con.execute('COMMIT')
+            except Exception:
+                con.execute('ROLLBACK')
+                raise
+        return self._a_dict(fila)
+
+    def actualizar(self, trabajo_id, **campos):
+        """Actualiza campos de un trabajo (estado, progreso, mensaje, ruta)."""
+        campos['actualizado'] = time.time()
+        asignaciones = ', '.join(f'{k} = ?' for k in campos)
+        with self._conectar() as con:
+            con.execute(f'UPDATE trabajos SET {asignaciones} WHERE id = ?', (*campos.values(), trabajo_id))
+
+    def limpiar(self, max_edad=3600):
+        """Elimina trabajos terminados o fallidos más antiguos que `max_edad` segundos.
+
+        Los archivos generados viven en la caché de reportes, que tiene su propio desalojo.
+        """
+        limite = time.time() - max_edad
+        with self._conectar() as con:
+            cursor = con.execute('DELETE FROM trabajos WHERE estado IN (?, ?) AND actualizado < ?',
+                                 (TERMINADO, ERROR, limite))
+        return cursor.rowcount
+
+    @staticmethod
+    def _a_dict(fila):
+        if fila is None:
+            return None
+        trabajo = dict(fila)
+        trabajo['pesos'] = json.loads(trabajo['pesos'])
+        return trabajo
+
+
+@perfilado.perfilar('procesar_trabajo', etiqueta=lambda cola, cache, trabajo: trabajo['evaluado'])
+def procesar_trabajo(cola, cache, trabajo):
+    """Genera el reporte de un trabajo reclamado y lo deja en la caché de reportes."""
+    # Solo la capa de datos (sin Dash ni Plotly) y el dataset compartido en memory-map
+    import datos_evaluacion
+    import dataset_compartido
+
+    trabajo_id = trabajo['id']
+    dataset = dataset_compartido.vigente()
+    clave = cache.clave(trabajo['evaluado'], trabajo['pesos'], trabajo['formato'], dataset.version)
+    ruta = cache.obtener(clave, trabajo['formato'])
+    if ruta is not None:
+        # Otro trabajo idéntico ya lo generó mientras este esperaba en la cola
+        cola.actualizar(trabajo_id, estado=TERMINADO, progreso=100, mensaje='Listo', ruta=ruta)
+        return
+
+    cola.actualizar(trabajo_id, progreso=10, mensaje='Calculando puntajes')
+    datos = datos_evaluacion.score(dataset, trabajo['evaluado'], *trabajo['pesos'])
+    if datos is None or 'error' in datos:
+        msg = datos.get('error', 'Sin datos') if datos else 'Selecciona un evaluado'
+        cola.actualizar(trabajo_id, estado=ERROR, mensaje=msg)
+        return
+
+    cola.actualizar(trabajo_id, progreso=30, mensaje='Generando gráficas')
+    imagenes = utils_reporte.generar_imagenes_matplotlib(datos)
+
+    cola.actualizar(trabajo_id, progreso=70, mensaje='Armando documento')
+    buffer = utils_reporte.generar_reporte(datos, trabajo['formato'], imagenes=imagenes)
+    if buffer is None:
+        cola.actualizar(trabajo_id, estado=ERROR, mensaje='No se pudo generar el documento')
+        return
+
+    ruta = cache.guardar(clave, trabajo['formato'], buffer.getvalue())
+    cola.actualizar(trabajo_id, estado=TERMINADO, progreso=100, mensaje='Listo', ruta=ruta)
+
+
+def ejecutar_trabajador(directorio=REPORTES_DIR, espera=0.5, max_edad=3600):
+    """Bucle de un proceso trabajador: reclama y procesa trabajos indefinidamente."""
+    cola = ColaTrabajos(directorio)
+    cache = cache_reportes.CacheReportes(os.path.join(directorio, 'cache'))
+    ultima_limpieza = 0.0
+    print(f"Trabajador de reportes iniciado (pid {os.getpid()}, cola en {cola.ruta_db})")
+    while True:
+        if time.time() - ultima_limpieza > 60:
+            cola.limpiar(max_edad)
+            ultima_limpieza = time.time()
+
+        trabajo = cola.reclamar()
+        if trabajo is None:
+            time.sleep(espera)
+            continue
+        try:
+            procesar_trabajo(cola, cache, trabajo)
+        except Exception as e:
+            traceback.print_exc()
+            cola.actualizar(trabajo['id'], estado=ERROR, mensaje=f'Error: {e}')
+        finally:
+            # Publicar las latencias del trabajo para /metrics (los trabajadores no terminan con atexit)
+            metricas.volcar()
+
+
+def iniciar_trabajadores(n, directorio=REPORTES_DIR):
+    """Arranca `n` procesos trabajadores en segundo plano (daemon) y los retorna."""
+    procesos = []
+    for _ in range(n):
+        p = multiprocessing.Process(target=ejecutar_trabajador, args=(directorio,), daemon=True)
+        p.start()
+        procesos.append(p)
+    return procesos
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Procesos trabajadores de la cola de reportes.")
+    parser.add_argument('--trabajadores', type=int, default=1, help="Número de procesos trabajadores")
+    parser.add_argument('--directorio', default=REPORTES_DIR, help="Directorio de la cola y de los reportes")
+    args = parser.parse_args()
+
+    if args.trabajadores <= 1:
+        ejecutar_trabajador(args.directorio)
+    else:
+        # Abrir el dataset una sola vez antes del fork: los trabajadores heredan el memory-map
+        import dataset_compartido
+        dataset_compartido.vigente()
+        for p in iniciar_trabajadores(args.trabajadores, args.directorio):
+            p.join()
@@ -1,22 +1,75 @@
 import io
+import os
+import re
 import base64
+from copy import deepcopy
 from datetime import datetime
+from functools import lru_cache
 import numpy as np
 
-# Matplotlib (Object-Oriented API for thread safety)
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
-import matplotlib.pyplot as plt
-
-# Para PDF
-from xhtml2pdf import pisa
+from xml.sax.saxutils import escape
+
+import metricas
+
+# Los backends pesados (Matplotlib, xhtml2pdf, ReportLab, python-docx) se importan dentro de las
+# funciones que los usan: importar este módulo (p. ej. para FORMATOS_REPORTE o la clave de la
+# caché) no debe cargarlos hasta que realmente se genere un reporte.
+
+# Versión del diseño de los reportes: incrementarla al cambiar su contenido o formato
+# (invalida los reportes guardados en cache_reportes)
+VERSION_PLANTILLA = '5'
+
+# Perfiles de calidad de las gráficas: resolución, escala del tamaño de figura y compresión PNG (0-9)
+PERFILES_CALIDAD = {
+    'draft': {'dpi': 72, 'escala': 0.75, 'compresion_png': 3},
+    'standard': {'dpi': 100, 'escala': 1.0, 'compresion_png': 6},
+    'print': {'dpi': 200, 'escala': 1.0, 'compresion_png': 9},
+}
+PERFIL_CALIDAD = os.environ.get('REPORTES_CALIDAD', 'standard')
+
+# Formato de las gráficas: 'png' (raster) o 'svg' (vectorial; el PDF las embebe como dibujos)
+FORMATOS_GRAFICA = ('png', 'svg')
+FORMATO_GRAFICAS = os.environ.get('REPORTES_FORMATO_GRAFICAS', 'png')
+
+def _perfil(perfil):
+    """Resuelve un perfil de calidad por nombre (None = PERFIL_CALIDAD)."""
+    nombre = perfil or PERFIL_CALIDAD
+    if nombre not in PERFILES_CALIDAD:
+        raise ValueError(f"Perfil de calidad no soportado: {nombre}")
+    return PERFILES_CALIDAD[nombre]
+
+def _crear_figura(tamano, perfil=None):
+    """Crea una figura con el tamaño base escalado y el DPI del perfil de calidad."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+    from matplotlib.figure import Figure
+    config = _perfil(perfil)
+    fig = Figure(figsize=(tamano[0] * config['escala'], tamano[1] * config['escala']), dpi=config['dpi'])
+    FigureCanvas(fig)
+    return fig
+
+def _guardar_figura(fig, formato=None, perfil=None, transparent=False):
+    """Serializa la figura en PNG (con el DPI y compresión del perfil) o en SVG vectorial."""
+    formato = formato or FORMATO_GRAFICAS
+    if formato not in FORMATOS_GRAFICA:
+        raise ValueError(f"Formato de gráfica no soportado: {formato}")
+    buf = io.BytesIO()
+    if formato == 'svg':
+        # Sin fecha en los metadatos: el mismo gráfico produce el mismo SVG
+        fig.savefig(buf, format='svg', bbox_inches='tight', transparent=transparent, metadata={'Date': None})
+        # Matplotlib expresa `alpha` como 'opacity' del elemento, que svglib ignora;
+        # se traduce a fill/stroke-opacity para que los rellenos semitransparentes se conserven
+        return re.sub(rb'(?<![-\w])opacity: ([\d.]+)', rb'fill-opacity: \1; stroke-opacity: \1', buf.getvalue())
+    else:
+        config = _perfil(perfil)
+        fig.savefig(buf, format='png', bbox_inches='tight', transparent=transparent, dpi=config['dpi'],
+                    pil_kwargs={'compress_level': config['compresion_png']})
+    return buf.getvalue()
 
-# Para Word
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+def es_svg(contenido):
+    """True si los bytes de una imagen son SVG (y no PNG)."""
+    return contenido[:256].lstrip().startswith((b'<?xml', b'<svg'))
 
-def crear_radar_matplotlib(categorias, valores_evaluado, valores_empresa=None, nombre_evaluado='Evaluado'):
+def crear_radar_matplotlib(categorias, valores_evaluado, valores_empresa=None, nombre_evaluado='Evaluado', formato=None, perfil=None):
     """Genera un gráfico de radar usando Matplotlib."""
     # Cerrar el ciclo
     N = len(categorias)
@@ -28,8 +81,7 @@ def crear_radar_matplotlib(categorias, valores_evaluado, valores_empresa=None, n
         valores_empresa = list(valores_empresa) + [valores_empresa[0]]
     
     # Crear figura
-    fig = Figure(figsize=(8, 8), dpi=100)
-    canvas = FigureCanvas(fig)
+    fig = _crear_figura((8, 8), perfil)
     ax = fig.add_subplot(111, polar=True)
     
     # Configurar ejes
@@ -42,7 +94,7 @@ def crear_radar_matplotlib(categorias, valores_evaluado, valores_empresa=None, n
     
     # Eje Y
     ax.set_rlabel_position(0)
-    plt.yticks([1, 2, 3, 4, 5], ["1", "2", "3", "4", "5"], color="grey", size=7)
+    ax.set_yticks([1, 2, 3, 4, 5], ["1", "2", "3", "4", "5"], color="grey", size=7)
     ax.set_ylim(0, 5)
     
     # Plot Evaluado
@@ -63,15 +115,11 @@ def crear_radar_matplotlib(categorias, valores_evaluado, valores_empresa=None, n
     ax.legend(loc='upper right', bbox_to_anchor=(1.1, 1.1))
     
     # Guardar
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    return buf.getvalue()
+    return _guardar_figura(fig, formato, perfil)
 
-def crear_dona_matplotlib(valor, color, titulo):
-    """Genera un gráfico de dona usando Matplotlib."""
-    fig = Figure(figsize=(4, 4), dpi=100)
-    canvas = FigureCanvas(fig)
+def crear_dona_matplotlib(valor, color, titulo, formato=None, perfil=None, intervalo=''):
+    """Genera un gráfico de dona usando Matplotlib (intervalo: texto opcional bajo el valor)."""
+    fig = _crear_figura((4, 4), perfil)
     ax = fig.add_subplot(111)
     
     sizes = [valor, 5 - valor]
@@ -82,16 +130,15 @@ def crear_dona_matplotlib(valor, color, titulo):
     
     # Texto central
     ax.text(0, 0, f"{valor:.2f}", ha='center', va='center', fontsize=20, fontweight='bold', color='#333')
+    if intervalo:
+        ax.text(0, -0.3, intervalo, ha='center', va='center', fontsize=9, color='#6c757d')
     
     # Título (opcional, mejor manejarlo fuera)
     # ax.set_title(titulo)
     
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight', transparent=True)
-    buf.seek(0)
-    return buf.getvalue()
+    return _guardar_figura(fig, formato, perfil, transparent=True)
 
-def crear_perfil_competencias_matplotlib(categorias, valores_evaluado):
+def crear_perfil_competencias_matplotlib(categorias, valores_evaluado, formato=None, perfil=None):
     """Genera un gráfico de radar (Perfil de Competencias) comparando con el estándar."""
     N = len(categorias)
     angles = [n / float(N) * 2 * np.pi for n in range(N)]
@@ -100,8 +147,7 @@ def crear_perfil_competencias_matplotlib(categorias, valores_evaluado):
     valores_evaluado = list(valores_evaluado) + [valores_evaluado[0]]
     valores_estandar = [3.5] * (N + 1)
     
-    fig = Figure(figsize=(5, 5), dpi=100)
-    canvas = FigureCanvas(fig)
+    fig = _crear_figura((5, 5), perfil)
     ax = fig.add_subplot(111, polar=True)
     
     ax.set_theta_offset(np.pi / 2)
@@ -109,7 +155,7 @@ def crear_perfil_competencias_matplotlib(categorias, valores_evaluado):
     ax.set_xticks(angles[:-1])
     ax.set_xticklabels(categorias, size=9)
     ax.set_rlabel_position(0)
-    plt.yticks([1, 2, 3, 4, 5], ["1", "2", "3", "4", "5"], color="grey", size=7)
+    ax.set_yticks([1, 2, 3, 4, 5], ["1", "2", "3", "4", "5"], color="grey", size=7)
     ax.set_ylim(0, 5)
     
     # Evaluado
@@ -121,12 +167,9 @@ def crear_perfil_competencias_matplotlib(categorias, valores_evaluado):
     
     ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1.1), fontsize='small')
     
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    return buf.getvalue()
+    return _guardar_figura(fig, formato, perfil)
 
-def crear_madurez_habilidades_matplotlib(categorias, valores_evaluado, valores_empresa=None, nombre_evaluado='Evaluado'):
+def crear_madurez_habilidades_matplotlib(categorias, valores_evaluado, valores_empresa=None, nombre_evaluado='Evaluado', formato=None, perfil=None):
     """Genera un gráfico de radar para Análisis de Madurez con benchmarks específicos."""
     N = len(categorias)
     angles = [n / float(N) * 2 * np.pi for n in range(N)]
@@ -140,8 +183,7 @@ def crear_madurez_habilidades_matplotlib(categorias, valores_evaluado, valores_e
     val_sobresaliente = [4.5] * (N + 1)
     val_aceptable = [3.5] * (N + 1)
 
-    fig = Figure(figsize=(6.5, 6.5), dpi=100)
-    canvas = FigureCanvas(fig)
+    fig = _crear_figura((6.5, 6.5), perfil)
     ax = fig.add_subplot(111, polar=True)
     
     ax.set_theta_offset(np.pi / 2)
@@ -149,7 +191,7 @@ def crear_madurez_habilidades_matplotlib(categorias, valores_evaluado, valores_e
     ax.set_xticks(angles[:-1])
     ax.set_xticklabels(categorias, size=10)
     ax.set_rlabel_position(0)
-    plt.yticks([1, 2, 3, 4, 5], ["1", "2", "3", "4", "5"], color="grey", size=7)
+    ax.set_yticks([1, 2, 3, 4, 5], ["1", "2", "3", "4", "5"], color="grey", size=7)
     ax.set_ylim(0, 5)
     
     # Plot Benchmarks
@@ -166,12 +208,9 @@ def crear_madurez_habilidades_matplotlib(categorias, valores_evaluado, valores_e
     
     ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1.1), fontsize='small')
     
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    return buf.getvalue()
+    return _guardar_figura(fig, formato, perfil)
 
-def crear_radar_general_matplotlib(categorias, valores_evaluado):
+def crear_radar_general_matplotlib(categorias, valores_evaluado, formato=None, perfil=None):
     """Genera el radar general (Evaluado vs Estándar)."""
     N = len(categorias)
     angles = [n / float(N) * 2 * np.pi for n in range(N)]
@@ -180,8 +219,7 @@ def crear_radar_general_matplotlib(categorias, valores_evaluado):
     valores_evaluado = list(valores_evaluado) + [valores_evaluado[0]]
     valores_estandar = [3.5] * (N + 1)
     
-    fig = Figure(figsize=(6, 6), dpi=100)
-    canvas = FigureCanvas(fig)
+    fig = _crear_figura((6, 6), perfil)
     ax = fig.add_subplot(111, polar=True)
     
     ax.set_theta_offset(np.pi / 2)
@@ -189,7 +227,7 @@ def crear_radar_general_matplotlib(categorias, valores_evaluado):
     ax.set_xticks(angles[:-1])
     ax.set_xticklabels(categorias, size=9)
     ax.set_rlabel_position(0)
-    plt.yticks([1, 2, 3, 4, 5], ["1", "2", "3", "4", "5"], color="grey", size=7)
+    ax.set_yticks([1, 2, 3, 4, 5], ["1", "2", "3", "4", "5"], color="grey", size=7)
     ax.set_ylim(0, 5)
     
     # Evaluado
@@ -201,15 +239,11 @@ def crear_radar_general_matplotlib(categorias, valores_evaluado):
     
     ax.legend(loc='upper right', bbox_to_anchor=(1.3, 1.1), fontsize='small')
     
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    return buf.getvalue()
+    return _guardar_figura(fig, formato, perfil)
 
-def crear_matriz_9box_matplotlib(potencial, desempeno, evaluado, cuadrante_info):
+def crear_matriz_9box_matplotlib(potencial, desempeno, evaluado, cuadrante_info, formato=None, perfil=None):
     """Genera la matriz 9-Box."""
-    fig = Figure(figsize=(6, 6), dpi=100)
-    canvas = FigureCanvas(fig)
+    fig = _crear_figura((6, 6), perfil)
     ax = fig.add_subplot(111)
     
     # Ejes y límites
@@ -230,15 +264,11 @@ def crear_matriz_9box_matplotlib(potencial, desempeno, evaluado, cuadrante_info)
     # Fondo (opcional, para dar contexto)
     ax.grid(True, linestyle=':', alpha=0.3)
     
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    return buf.getvalue()
+    return _guardar_figura(fig, formato, perfil)
 
-def crear_comparacion_barras_matplotlib(categorias, grupos_data, colores_grupos):
+def crear_comparacion_barras_matplotlib(categorias, grupos_data, colores_grupos, formato=None, perfil=None):
     """Genera gráfico de barras agrupadas para comparación."""
-    fig = Figure(figsize=(10, 5), dpi=100)
-    canvas = FigureCanvas(fig)
+    fig = _crear_figura((10, 5), perfil)
     ax = fig.add_subplot(111)
     
     x = np.arange(len(categorias))
@@ -255,14 +285,17 @@ def crear_comparacion_barras_matplotlib(categorias, grupos_data, colores_grupos)
     ax.legend(loc='upper center', bbox_to_anchor=(0.5, 1.15), ncol=len(grupos_data), fontsize='small')
     ax.grid(axis='y', linestyle='--', alpha=0.3)
     
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    return buf.getvalue()
+    return _guardar_figura(fig, formato, perfil)
+
+@metricas.FASES.cronometrar(fase='graficas')
+def generar_imagenes_matplotlib(datos, formato=None, perfil=None):
+    """Genera todas las imágenes necesarias usando Matplotlib.
 
-def generar_imagenes_matplotlib(datos):
-    """Genera todas las imágenes necesarias usando Matplotlib."""
+    `formato` ('png' o 'svg') y `perfil` ('draft', 'standard', 'print') usan por defecto
+    FORMATO_GRAFICAS y PERFIL_CALIDAD.
+    """
     imagenes = {}
+    opciones = {'formato': formato, 'perfil': perfil}
     raw = datos['data_raw']
     meta = datos['meta']
     kpis = datos['kpis']
@@ -283,7 +316,7 @@ def generar_imagenes_matplotlib(datos):
     desempeno = kpis['calificacion_final']
     
     print("Generando Matriz 9-Box (Matplotlib)...")
-    img_matriz = crear_matriz_9box_matplotlib(potencial, desempeno, meta['evaluado'], textos)
+    img_matriz = crear_matriz_9box_matplotlib(potencial, desempeno, meta['evaluado'], textos, **opciones)
     imagenes['matriz'] = img_matriz
 
     # 4. Comparación (Barras)
@@ -300,20 +333,20 @@ def generar_imagenes_matplotlib(datos):
         print("Generando Comparación (Matplotlib)...")
         img_comp = crear_comparacion_barras_matplotlib(cats, raw['promedios_por_grupo'], {
             'Autoevaluación': '#17a2b8', 'Jefe Inmediato': '#dc3545', 'Colegas': '#ffc107', 'Subordinados': '#28a745'
-        })
+        }, **opciones)
         imagenes['comparacion'] = img_comp
     
     # 5. Perfil de Competencias
     if cats:
         print("Generando Perfil de Competencias (Matplotlib)...")
-        img_perfil = crear_perfil_competencias_matplotlib(cats, vals)
+        img_perfil = crear_perfil_competencias_matplotlib(cats, vals, **opciones)
         imagenes['perfil_competencias'] = img_perfil
 
     # 6. Análisis de Madurez
     if cats:
         print("Generando Análisis de Madurez (Matplotlib)...")
         # Usamos la misma data de empresa si existe
-        img_madurez = crear_madurez_habilidades_matplotlib(cats, vals, empresa if empresa else None, meta.get('evaluado', 'Evaluado'))
+        img_madurez = crear_madurez_habilidades_matplotlib(cats, vals, empresa if empresa else None, meta.get('evaluado', 'Evaluado'), **opciones)
         imagenes['madurez'] = img_madurez
     
     # 7. Donas por Categoría
@@ -321,22 +354,34 @@ def generar_imagenes_matplotlib(datos):
     for cat, val in raw['promedios_categorias'].items():
         # print(f"Generando Dona {cat} (Matplotlib)...") # Reduce noise
         color = colores.get(cat, '#667eea')
-        img_dona = crear_dona_matplotlib(val, color, cat)
+        img_dona = crear_dona_matplotlib(val, color, cat, intervalo=texto_intervalo(datos, cat), **opciones)
         imagenes[f'cat_{cat}'] = img_dona
         
     return imagenes
 
-def generar_pdf(datos):
-    """Genera PDF usando imágenes de Matplotlib."""
+def texto_intervalo(datos, categoria=None):
+    """'IC 95%: inf – sup' de la calificación final o de una categoría ('' si datos no trae intervalos)."""
+    intervalos = datos.get('intervalos')
+    if not intervalos:
+        return ''
+    intervalo = intervalos['calificacion_final'] if categoria is None else intervalos['categorias'].get(categoria)
+    if intervalo is None:
+        return ''
+    return f"IC {intervalos['nivel']:.0%}: {intervalo[0]:.2f} – {intervalo[1]:.2f}"
+
+def generar_pdf_html(datos, imagenes=None):
+    """Genera PDF convirtiendo HTML con xhtml2pdf (imágenes de Matplotlib embebidas en base64)."""
+    from xhtml2pdf import pisa
     # Generar imágenes
-    imagenes_bytes = generar_imagenes_matplotlib(datos)
+    imagenes_bytes = imagenes if imagenes is not None else generar_imagenes_matplotlib(datos)
     
     # Convertir a base64
     imagenes_b64 = {}
     for k, v in imagenes_bytes.items():
         if v:
             encoded = base64.b64encode(v).decode('utf-8')
-            imagenes_b64[k] = f"data:image/png;base64,{encoded}"
+            mime = 'image/svg+xml' if es_svg(v) else 'image/png'
+            imagenes_b64[k] = f"data:{mime};base64,{encoded}"
         else:
             imagenes_b64[k] = ""
 
@@ -413,7 +458,7 @@ def generar_pdf(datos):
         </div>
 
         <div class="kpi-container">
-            <div class="kpi-box"><div class="label">Calificación</div><div class="score">{kpis['calificacion_final']:.2f}</div></div>
+            <div class="kpi-box"><div class="label">Calificación</div><div class="score">{kpis['calificacion_final']:.2f}</div><div class="label">{texto_intervalo(datos)}</div></div>
             <div class="kpi-box"><div class="label">Cumplimiento</div><div class="score">{kpis['nivel_cumplimiento']:.0f}%</div></div>
             <div class="kpi-box"><div class="label">Consistencia</div><div class="score">{kpis['consistencia']:.1f}</div></div>
             <div class="kpi-box"><div class="label">Percentil</div><div class="score">{100 - kpis['percentil']:.0f}%</div></div>
@@ -468,12 +513,6 @@ def generar_pdf(datos):
             {categorias_html}
         </table>
 
-        <pdf:nextpage />
-        <h2>Detalle por Competencia</h2>
-        <table style="border: none;">
-            {categorias_html}
-        </table>
-
         <div id="footerContent" class="footer">
             Página <pdf:pagenumber /> | Generado por Dashboard 360°
         </div>
@@ -489,10 +528,207 @@ def generar_pdf(datos):
     buffer.seek(0)
     return buffer
 
-def generar_word(datos):
-    """Genera Word usando imágenes de Matplotlib."""
-    imagenes_bytes = generar_imagenes_matplotlib(datos)
+def _imagen_pdf(contenido, ancho):
+    """Flowable escalado a `ancho` puntos: dibujo vectorial si es SVG, imagen si es PNG (sin base64)."""
+    from reportlab.lib.utils import ImageReader
+    from reportlab.platypus import Image as RLImage
+    if es_svg(contenido):
+        from svglib.svglib import svg2rlg
+        dibujo = svg2rlg(io.BytesIO(contenido))
+        factor = ancho / dibujo.width
+        dibujo.width, dibujo.height = ancho, dibujo.height * factor
+        dibujo.scale(factor, factor)
+        return dibujo
+    lector = ImageReader(io.BytesIO(contenido))
+    ancho_px, alto_px = lector.getSize()
+    return RLImage(io.BytesIO(contenido), width=ancho, height=ancho * alto_px / ancho_px)
+
+def _estilos_pdf():
+    """Estilos de párrafo equivalentes al CSS del reporte HTML."""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    base = getSampleStyleSheet()
+    return {
+        'titulo': ParagraphStyle('titulo', parent=base['Title'], fontName='Helvetica-Bold', fontSize=24,
+                                 textColor=colors.HexColor('#2c3e50'), spaceAfter=10),
+        'nombre': ParagraphStyle('nombre', parent=base['Normal'], fontSize=16, alignment=TA_CENTER,
+                                 textColor=colors.HexColor('#2c3e50'), spaceAfter=8, leading=20),
+        'centro': ParagraphStyle('centro', parent=base['Normal'], alignment=TA_CENTER),
+        'h2': ParagraphStyle('h2', parent=base['Heading2'], fontName='Helvetica-Bold', fontSize=16,
+                             textColor=colors.HexColor('#667eea'), spaceBefore=20, spaceAfter=10),
+        'h3': ParagraphStyle('h3', parent=base['Heading3'], fontName='Helvetica-Bold', fontSize=14,
+                             textColor=colors.HexColor('#17a2b8'), spaceBefore=0),
+        'h4': ParagraphStyle('h4', parent=base['Heading4'], fontName='Helvetica-Bold', fontSize=11,
+                             textColor=colors.HexColor('#667eea'), alignment=TA_CENTER, spaceAfter=2),
+        'texto': ParagraphStyle('texto', parent=base['Normal'], fontSize=10, leading=14, textColor=colors.HexColor('#333333')),
+        'nota': ParagraphStyle('nota', parent=base['Normal'], fontSize=9, leading=12, alignment=TA_JUSTIFY,
+                               textColor=colors.HexColor('#666666'), spaceAfter=12),
+        'nota_centro': ParagraphStyle('nota_centro', parent=base['Normal'], fontSize=8, alignment=TA_CENTER,
+                                      textColor=colors.HexColor('#666666'), spaceAfter=6),
+        'kpi_label': ParagraphStyle('kpi_label', parent=base['Normal'], fontName='Helvetica-Bold', fontSize=8,
+                                    alignment=TA_CENTER, textColor=colors.HexColor('#6c757d')),
+        'kpi_valor': ParagraphStyle('kpi_valor', parent=base['Normal'], fontName='Helvetica-Bold', fontSize=18,
+                                    alignment=TA_CENTER, textColor=colors.HexColor('#2c3e50'), leading=22),
+    }
+
+def generar_pdf_nativo(datos, imagenes=None):
+    """Genera PDF dibujando el reporte directamente con ReportLab (sin HTML/CSS ni base64)."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import cm
+    from reportlab.platypus import KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    imagenes_bytes = imagenes if imagenes is not None else generar_imagenes_matplotlib(datos)
+    meta = datos['meta']
+    kpis = datos['kpis']
+    textos = datos['textos']
+    est = _estilos_pdf()
+    ancho_util = letter[0] - 2 * 2.5 * cm
+
+    def seccion(titulo, nota, clave, ancho, encabezado=()):
+        # `encabezado` se mantiene en la misma página que la sección (no queda solo al pie de la anterior)
+        elementos = [*encabezado, Paragraph(titulo, est['h2']), Paragraph(nota, est['nota'])]
+        if imagenes_bytes.get(clave):
+            img = _imagen_pdf(imagenes_bytes[clave], ancho)
+            img.hAlign = 'CENTER'
+            elementos.append(img)
+        return KeepTogether(elementos)
+
+    historia = []
+
+    # Encabezado
+    encabezado = Table([
+        [Paragraph('REPORTE DE EVALUACIÓN 360°', est['titulo'])],
+        [Paragraph(f"<b>{escape(str(meta['evaluado']))}</b>", est['nombre'])],
+        [Paragraph(f"Fecha: {datetime.now().strftime('%d/%m/%Y')}", est['centro'])],
+    ], colWidths=[ancho_util])
+    encabezado.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('TOPPADDING', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, -1), (-1, -1), 14),
+    ]))
+    historia += [encabezado, Spacer(1, 24)]
+
+    # KPIs
+    etiquetas = ['CALIFICACIÓN', 'CUMPLIMIENTO', 'CONSISTENCIA', 'PERCENTIL']
+    intervalo = texto_intervalo(datos)
+    calificacion = f"{kpis['calificacion_final']:.2f}" + (f'<br/><font size="7" color="#6c757d">{intervalo}</font>' if intervalo else '')
+    valores = [calificacion, f"{kpis['nivel_cumplimiento']:.0f}%",
+               f"{kpis['consistencia']:.1f}", f"{100 - kpis['percentil']:.0f}%"]
+    tabla_kpis = Table([[Paragraph(e, est['kpi_label']) for e in etiquetas],
+                        [Paragraph(v, est['kpi_valor']) for v in valores]],
+                       colWidths=[ancho_util / 4] * 4)
+    tabla_kpis.setStyle(TableStyle([
+        ('BOX', (0, 0), (0, -1), 0.75, colors.HexColor('#e9ecef')),
+        ('BOX', (1, 0), (1, -1), 0.75, colors.HexColor('#e9ecef')),
+        ('BOX', (2, 0), (2, -1), 0.75, colors.HexColor('#e9ecef')),
+        ('BOX', (3, 0), (3, -1), 0.75, colors.HexColor('#e9ecef')),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    historia += [tabla_kpis, Spacer(1, 20)]
+
+    # Diagnóstico (aptitud)
+    aptitud = Table([[[
+        Paragraph(escape(textos['estado_aptitud']), est['h3']),
+        Paragraph(escape(textos['mensaje_aptitud']), est['texto']),
+        Spacer(1, 6),
+        Paragraph(f"<b>Recomendación RH:</b> {escape(textos['recomendacion_rh'])}", est['texto']),
+    ]]], colWidths=[ancho_util])
+    aptitud.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#eef2f7')),
+        ('LINEBEFORE', (0, 0), (0, -1), 6, colors.HexColor(textos.get('color_aptitud', '#667eea'))),
+        ('LEFTPADDING', (0, 0), (-1, -1), 16),
+        ('TOPPADDING', (0, 0), (-1, -1), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 14),
+    ]))
+    historia.append(aptitud)
+
+    historia.append(seccion(
+        'Perfil de Competencias',
+        "Este gráfico muestra el desempeño del evaluado en cada competencia (área azul) comparado con el estándar mínimo requerido (línea roja discontinua). Permite visualizar rápidamente las fortalezas y áreas que requieren atención.",
+        'perfil_competencias', 300, encabezado=[Paragraph('Análisis de Competencias', est['h2'])]))
+    historia.append(seccion(
+        'Análisis de Madurez por Habilidades',
+        f"Este gráfico compara el desempeño de <b>{escape(str(meta['evaluado']))}</b> (área azul) frente al promedio de la empresa (línea gris discontinua) y los niveles de referencia: Sobresaliente (4.5, línea verde) y Aceptable (3.5, línea amarilla). Permite identificar rápidamente las brechas de madurez en cada competencia.",
+        'madurez', 300))
+
+    historia.append(PageBreak())
+    historia.append(seccion(
+        'Matriz de Talento (9-Box)',
+        "Esta matriz ubica al evaluado en función de su <b>Desempeño</b> (Eje Y) y <b>Potencial</b> (Eje X). Permite identificar si el colaborador es un talento clave, requiere desarrollo o está en una posición adecuada a sus capacidades actuales.",
+        'matriz', 337))
+    historia.append(seccion(
+        'Comparativa por Grupo',
+        "Este gráfico de barras permite contrastar la autoevaluación con la percepción de otros grupos (Jefe, Colegas, Subordinados), facilitando la identificación de puntos ciegos y áreas de consenso.",
+        'comparacion', ancho_util))
+
+    # Detalle por competencia (donas en cuadrícula de 2 columnas)
+    historia += [PageBreak(), Paragraph('Detalle por Competencia', est['h2'])]
+    celdas = []
+    for key in [k for k in imagenes_bytes.keys() if k.startswith('cat_')]:
+        cat_name = escape(key.replace('cat_', ''))
+        celda = [Paragraph(cat_name, est['h4']),
+                 Paragraph(f"Nivel de dominio alcanzado en <b>{cat_name}</b>.", est['nota_centro'])]
+        if imagenes_bytes.get(key):
+            celda.append(_imagen_pdf(imagenes_bytes[key], 150))
+        celdas.append(celda)
+    if celdas:
+        filas = [celdas[i:i + 2] + [''] * (2 - len(celdas[i:i + 2])) for i in range(0, len(celdas), 2)]
+        grid = Table(filas, colWidths=[ancho_util / 2] * 2)
+        grid.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ]))
+        historia.append(grid)
+
+    def pie_de_pagina(canvas_pdf, doc):
+        canvas_pdf.saveState()
+        canvas_pdf.setStrokeColor(colors.HexColor('#eeeeee'))
+        canvas_pdf.line(doc.leftMargin, 1.8 * cm, doc.leftMargin + doc.width, 1.8 * cm)
+        canvas_pdf.setFont('Helvetica', 8)
+        canvas_pdf.setFillColor(colors.HexColor('#aaaaaa'))
+        canvas_pdf.drawCentredString(letter[0] / 2, 1.3 * cm, f"Página {doc.page} | Generado por Dashboard 360°")
+        canvas_pdf.restoreState()
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, leftMargin=2.5 * cm, rightMargin=2.5 * cm,
+                            topMargin=2.5 * cm, bottomMargin=2.5 * cm,
+                            title=f"Reporte 360° - {meta['evaluado']}", author='Dashboard 360°')
+    doc.build(historia, onFirstPage=pie_de_pagina, onLaterPages=pie_de_pagina)
+    buffer.seek(0)
+    return buffer
 
+# Motores de PDF disponibles; el activo se elige con REPORTES_MOTOR_PDF ('html' o 'nativo')
+MOTORES_PDF = {
+    'html': generar_pdf_html,
+    'nativo': generar_pdf_nativo,
+}
+MOTOR_PDF = os.environ.get('REPORTES_MOTOR_PDF', 'html')
+
+@metricas.FASES.cronometrar(fase='documento_pdf')
+def generar_pdf(datos, imagenes=None, motor=None):
+    """Genera PDF con el motor indicado (por defecto MOTOR_PDF)."""
+    motor = motor or MOTOR_PDF
+    if motor not in MOTORES_PDF:
+        raise ValueError(f"Motor de PDF no soportado: {motor}")
+    return MOTORES_PDF[motor](datos, imagenes=imagenes)
+
+# --- Plantilla Word ---
+# Ruta opcional a una plantilla .docx propia (ver guardar_plantilla_word); si no se indica,
+# se usa la plantilla por defecto construida en memoria.
+PLANTILLA_WORD = os.environ.get('REPORTES_PLANTILLA_WORD')
+
+_MARCADOR = re.compile(r'\{\{([a-z_]+)\}\}')
+_MARCADOR_IMAGEN = re.compile(r'\{\{imagen:([^:}]+):([\d.]+)\}\}')
+
+def _construir_plantilla_word():
+    """Construye la plantilla Word por defecto: estilos, textos fijos y marcadores {{...}}."""
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.shared import Pt
     document = Document()
     style = document.styles['Normal']
     font = style.font
@@ -502,112 +738,171 @@ def generar_word(datos):
     # Título
     titulo = document.add_heading('Reporte de Evaluación 360°', 0)
     titulo.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    document.add_paragraph(f"Evaluado: {datos['meta']['evaluado']}")
-    document.add_paragraph(f"Fecha: {datetime.now().strftime('%d/%m/%Y')}")
+    document.add_paragraph("Evaluado: {{evaluado}}")
+    document.add_paragraph("Fecha: {{fecha}}")
 
     # KPIs
     table = document.add_table(rows=2, cols=4)
     table.style = 'Table Grid'
     headers = ['Calificación', 'Cumplimiento', 'Consistencia', 'Percentil']
-    vals = [
-        f"{datos['kpis']['calificacion_final']:.2f}",
-        f"{datos['kpis']['nivel_cumplimiento']:.0f}%",
-        f"{datos['kpis']['consistencia']:.1f}",
-        f"Top {100 - datos['kpis']['percentil']:.0f}%"
-    ]
+    vals = ['{{calificacion}}', '{{cumplimiento}}', '{{consistencia}}', '{{percentil}}']
     for i, h in enumerate(headers):
         table.rows[0].cells[i].text = h
     for i, v in enumerate(vals):
         table.rows[1].cells[i].text = v
+    table.rows[1].cells[0].add_paragraph('{{intervalo_calificacion}}')
 
     document.add_paragraph()
 
     # Diagnóstico
     document.add_heading('Diagnóstico General', level=1)
     p = document.add_paragraph()
-    p.add_run(f"{datos['textos']['estado_aptitud']}\n").bold = True
-    p.add_run(f"{datos['textos']['mensaje_aptitud']}\n")
-    p.add_run(f"Recomendación RH: {datos['textos']['recomendacion_rh']}")
-
-    # Radar (REMOVED)
-    # document.add_heading('Análisis de Competencias', level=1)
-    
-    # if imagenes_bytes.get('radar_general'):
-    #     document.add_heading('Radar General', level=2)
-    #     img_stream = io.BytesIO(imagenes_bytes['radar_general'])
-    #     document.add_picture(img_stream, width=Inches(4.5))
-        
-    # if imagenes_bytes.get('radar_avanzado'):
-    #     document.add_heading('Radar Avanzado', level=2)
-    #     img_stream = io.BytesIO(imagenes_bytes['radar_avanzado'])
-    #     document.add_picture(img_stream, width=Inches(6.0))
+    p.add_run("{{estado_aptitud}}\n").bold = True
+    p.add_run("{{mensaje_aptitud}}\n")
+    p.add_run("Recomendación RH: {{recomendacion_rh}}")
 
     # Perfil y Madurez
-    # document.add_page_break() # Removed to optimize space
     document.add_heading('Perfil de Competencias', level=1)
-    p = document.add_paragraph()
-    p.add_run("Este gráfico muestra el desempeño del evaluado en cada competencia (área azul) comparado con el estándar mínimo requerido (línea roja discontinua). Permite visualizar rápidamente las fortalezas y áreas que requieren atención.")
-    
-    if imagenes_bytes.get('perfil_competencias'):
-        img_stream = io.BytesIO(imagenes_bytes['perfil_competencias'])
-        document.add_picture(img_stream, width=Inches(4.8))
+    document.add_paragraph("Este gráfico muestra el desempeño del evaluado en cada competencia (área azul) comparado con el estándar mínimo requerido (línea roja discontinua). Permite visualizar rápidamente las fortalezas y áreas que requieren atención.")
+    document.add_paragraph("{{imagen:perfil_competencias:4.8}}")
 
     document.add_heading('Análisis de Madurez por Habilidades', level=1)
-    p = document.add_paragraph()
-    p.add_run(f"Este gráfico compara el desempeño de {datos['meta']['evaluado']} frente al promedio de la empresa y los niveles de referencia (Sobresaliente 4.5 y Aceptable 3.5). Permite visualizar la madurez profesional en cada competencia clave.")
-    
-    if imagenes_bytes.get('madurez'):
-        img_stream = io.BytesIO(imagenes_bytes['madurez'])
-        document.add_picture(img_stream, width=Inches(4.8))
+    document.add_paragraph("Este gráfico compara el desempeño de {{evaluado}} frente al promedio de la empresa y los niveles de referencia (Sobresaliente 4.5 y Aceptable 3.5). Permite visualizar la madurez profesional en cada competencia clave.")
+    document.add_paragraph("{{imagen:madurez:4.8}}")
 
     # Matriz
     document.add_page_break()
     document.add_heading('Matriz de Talento (9-Box)', level=1)
-    p = document.add_paragraph()
-    p.add_run("Esta matriz ubica al evaluado en función de su Desempeño (Eje Y) y Potencial (Eje X). Permite identificar si el colaborador es un talento clave, requiere desarrollo o está en una posición adecuada a sus capacidades actuales.")
-    if imagenes_bytes.get('matriz'):
-        img_stream = io.BytesIO(imagenes_bytes['matriz'])
-        document.add_picture(img_stream, width=Inches(5.0))
+    document.add_paragraph("Esta matriz ubica al evaluado en función de su Desempeño (Eje Y) y Potencial (Eje X). Permite identificar si el colaborador es un talento clave, requiere desarrollo o está en una posición adecuada a sus capacidades actuales.")
+    document.add_paragraph("{{imagen:matriz:5.0}}")
 
     # Comparación
-    document.add_paragraph()
-    document.add_paragraph()
-    document.add_paragraph()
-    document.add_paragraph()
-    document.add_paragraph()
-    document.add_paragraph()
+    for _ in range(6):
+        document.add_paragraph()
     document.add_heading('Comparativa por Grupo', level=1)
-    p = document.add_paragraph()
-    p.add_run("Este gráfico de barras permite contrastar la autoevaluación con la percepción de otros grupos (Jefe, Colegas, Subordinados), facilitando la identificación de puntos ciegos y áreas de consenso.")
-    if imagenes_bytes.get('comparacion'):
-        img_stream = io.BytesIO(imagenes_bytes['comparacion'])
-        document.add_picture(img_stream, width=Inches(6.5))
+    document.add_paragraph("Este gráfico de barras permite contrastar la autoevaluación con la percepción de otros grupos (Jefe, Colegas, Subordinados), facilitando la identificación de puntos ciegos y áreas de consenso.")
+    document.add_paragraph("{{imagen:comparacion:6.5}}")
 
+    # Detalle por competencia: una fila modelo que se replica por cada par de categorías
     document.add_page_break()
     document.add_heading('Detalle por Competencia', level=1)
-    
-    cats_keys = [k for k in imagenes_bytes.keys() if k.startswith('cat_')]
-    
-    table_cats = document.add_table(rows=(len(cats_keys) + 1) // 2, cols=2)
+    table_cats = document.add_table(rows=1, cols=2)
     table_cats.autofit = False
-    
-    for i, key in enumerate(cats_keys):
-        row = i // 2
-        col = i % 2
-        cell = table_cats.cell(row, col)
-        
+    for cell in table_cats.rows[0].cells:
         p = cell.paragraphs[0]
         p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        p.add_run(key.replace('cat_', '')).bold = True
-        p.add_run(f"\nNivel de dominio alcanzado en {key.replace('cat_', '')}.").font.size = Pt(9)
-        
-        if imagenes_bytes.get(key):
-            img_stream = io.BytesIO(imagenes_bytes[key])
-            run = p.add_run()
-            run.add_break()
-            run.add_picture(img_stream, width=Inches(2.5))
+        p.add_run("{{categoria}}").bold = True
+        p.add_run("\nNivel de dominio alcanzado en {{categoria}}.").font.size = Pt(9)
+        p.add_run("\n{{imagen:categoria:2.5}}")
+
+    return document
+
+def guardar_plantilla_word(ruta):
+    """Exporta la plantilla Word por defecto para personalizarla (REPORTES_PLANTILLA_WORD)."""
+    _construir_plantilla_word().save(ruta)
+
+@lru_cache(maxsize=1)
+def _plantilla_word_bytes():
+    """Plantilla Word serializada; se construye o lee una sola vez por proceso."""
+    if PLANTILLA_WORD:
+        with open(PLANTILLA_WORD, 'rb') as f:
+            return f.read()
+    buffer = io.BytesIO()
+    _construir_plantilla_word().save(buffer)
+    return buffer.getvalue()
+
+def _rellenar_parrafo(parrafo, valores, imagenes_bytes, clave_imagen=None):
+    """Sustituye los marcadores de texto e imagen de un párrafo (cada marcador vive en un solo run)."""
+    from docx.shared import Inches
+    solo_imagen = False
+    for run in parrafo.runs:
+        texto = run.text
+        if '{{' not in texto:
+            continue
+        imagen = _MARCADOR_IMAGEN.search(texto)
+        if imagen:
+            texto = texto.replace(imagen.group(0), '')
+            solo_imagen = not texto.strip() and len(parrafo.runs) == 1
+        run.text = _MARCADOR.sub(lambda m: valores.get(m.group(1), m.group(0)), texto)
+        if imagen:
+            clave = clave_imagen or imagen.group(1)
+            if imagenes_bytes.get(clave):
+                run.add_picture(io.BytesIO(imagenes_bytes[clave]), width=Inches(float(imagen.group(2))))
+            elif solo_imagen:
+                # Sin gráfica: quitar el párrafo reservado para ella
+                parrafo._element.getparent().remove(parrafo._element)
+
+def _rellenar_detalle_categorias(tabla, imagenes_bytes):
+    """Replica la fila modelo de la tabla de detalle con una celda por categoría."""
+    fila_modelo = tabla.rows[0]._tr
+    cats_keys = [k for k in imagenes_bytes.keys() if k.startswith('cat_')]
+    for i in range(0, len(cats_keys), 2):
+        nueva_fila = deepcopy(fila_modelo)
+        fila_modelo.addprevious(nueva_fila)
+        celdas = tabla.rows[i // 2].cells
+        for celda, key in zip(celdas, cats_keys[i:i + 2]):
+            for parrafo in celda.paragraphs:
+                _rellenar_parrafo(parrafo, {'categoria': key.replace('cat_', '')}, imagenes_bytes, clave_imagen=key)
+        if len(cats_keys[i:i + 2]) < 2:
+            for parrafo in celdas[1].paragraphs:
+                for run in parrafo.runs:
+                    run.text = ''
+    fila_modelo.getparent().remove(fila_modelo)
+
+@metricas.FASES.cronometrar(fase='documento_docx')
+def generar_word(datos, imagenes=None):
+    """Genera Word rellenando la plantilla con los datos e imágenes de Matplotlib."""
+    from docx import Document
+    # python-docx solo inserta imágenes raster: las gráficas SVG se regeneran en PNG
+    if imagenes is None or any(es_svg(v) for v in imagenes.values() if v):
+        imagenes = generar_imagenes_matplotlib(datos, formato='png')
+    imagenes_bytes = imagenes
+
+    document = Document(io.BytesIO(_plantilla_word_bytes()))
+    valores = {
+        'evaluado': str(datos['meta']['evaluado']),
+        'fecha': datetime.now().strftime('%d/%m/%Y'),
+        'calificacion': f"{datos['kpis']['calificacion_final']:.2f}",
+        'intervalo_calificacion': texto_intervalo(datos),
+        'cumplimiento': f"{datos['kpis']['nivel_cumplimiento']:.0f}%",
+        'consistencia': f"{datos['kpis']['consistencia']:.1f}",
+        'percentil': f"Top {100 - datos['kpis']['percentil']:.0f}%",
+        'estado_aptitud': datos['textos']['estado_aptitud'],
+        'mensaje_aptitud': datos['textos']['mensaje_aptitud'],
+        'recomendacion_rh': datos['textos']['recomendacion_rh'],
+    }
+
+    for tabla in document.tables:
+        if '{{categoria}}' in tabla.rows[0].cells[0].text:
+            _rellenar_detalle_categorias(tabla, imagenes_bytes)
+        else:
+            for fila in tabla.rows:
+                for celda in fila.cells:
+                    for parrafo in celda.paragraphs:
+                        _rellenar_parrafo(parrafo, valores, imagenes_bytes)
+    for parrafo in list(document.paragraphs):
+        _rellenar_parrafo(parrafo, valores, imagenes_bytes)
 
     buffer = io.BytesIO()
     document.save(buffer)
     buffer.seek(0)
     return buffer
+
+# Formatos de reporte soportados: formato -> (función generadora, extensión)
+FORMATOS_REPORTE = {
+    'pdf': (generar_pdf, 'pdf'),
+    'docx': (generar_word, 'docx'),
+}
+
+def generar_reporte(datos, formato, imagenes=None):
+    """Genera el reporte en el formato indicado ('pdf' o 'docx') y retorna el buffer."""
+    if formato not in FORMATOS_REPORTE:
+        raise ValueError(f"Formato de reporte no soportado: {formato}")
+    generador, _ = FORMATOS_REPORTE[formato]
+    return generador(datos, imagenes=imagenes)
+
+def nombre_archivo_reporte(evaluado, formato):
+    """Nombre de archivo del reporte, sin caracteres inválidos para el sistema de archivos."""
+    _, extension = FORMATOS_REPORTE[formato]
+    nombre = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '_', str(evaluado)).strip() or 'evaluado'
+    return f"Reporte_360_{nombre}.{extension}"